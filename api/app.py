@@ -1,13 +1,42 @@
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from api.models.model_cache import ModelCacheLRU
-import subprocess
+from src.common.audio import PcmJoiner
+from src.common.audio_cache import audio_cache, cache_key
+from src.common.config import tts_segment_crossfade_ms, tts_segment_gap_ms
+from src.common.download_manager import DownloadManager
+from src.common.preload import Readiness, load_profile, preload
+from src.common.runtimes import validate_runtimes
+from src.common.model_store import hf_snapshot
+from src.common.catalog import ModelCatalog, catalog
+from src.common.codecs import (
+    CodecError,
+    CodecUnavailable,
+    encode_buffer,
+    normalize_format,
+    open_encoder,
+    parse_sample_rate,
+    require_encoder,
+    seal_wav,
+    transcode_wav,
+)
+from src.common.metrics import (
+    CONTENT_TYPE,
+    INFLIGHT,
+    MODEL_RESIDENT_BYTES,
+    MODELS_LOADED,
+    REQUEST_SECONDS,
+    REQUESTS,
+    begin_request,
+    metrics,
+)
 # from .routers import rt_parler_tts
 import os
 # from api.models.xtts_v2 import XTTSV2ModelWrapper
 import asyncio
 import importlib
 from datetime import datetime
+import time
 import uuid
 import json
 from pathlib import Path
@@ -15,9 +44,6 @@ from pathlib import Path
 
 app = FastAPI()
 
-MAX_MODELS_IN_MEMORY = 2  # max models to cache in RAM at once
-model_cache = ModelCacheLRU(max_size=MAX_MODELS_IN_MEMORY)
-
 # Store active connections in memory
 connections = {}
 total_connections = 0  # persistent counter
@@ -28,6 +54,8 @@ from threading import Lock
 from dotenv import load_dotenv
 load_dotenv()  # loads .env if present
 
+model_cache = ModelCacheLRU()  # bounded by MODEL_CACHE_MAX_MB of estimated model memory
+
 def get_allowed_tokens():
     """
     A Function to load API_TOKENS from .env file and use it. comma separated
@@ -45,14 +73,14 @@ def token_auth_enabled():
     # No tokens specified = no auth required
     return bool(get_allowed_tokens())
 
+runtimes = {}
+
+
 @app.on_event("startup")
-async def ensure_libraries():
-    # RUN pip install .[huggingface,xtts]
-    try:
-        importlib.import_module("torch")
-    except ImportError:
-        print(f"Library .[huggingface,xtts] missing, installing...")
-        subprocess.check_call(["uv", "pip", "install", ".[huggingface,xtts,parler-tts]"])
+async def validate_environment():
+    # Packages come with the image (pip install .[piper-tts,parler-tts,xtts]); nothing is installed at boot.
+    # Runtimes are only located here; torch/transformers/piper import when a model first loads or is preloaded.
+    runtimes.update(validate_runtimes("api", ("piper", "parler", "xtts")))
 
 
 class ModelManager:
@@ -61,8 +89,12 @@ class ModelManager:
         self.active_model = None
         self.active_model_id = None
         self._lock = Lock()
-        self._downloads = {}  # model_name: asyncio.Task
-        self._download_status = {}
+        # Download jobs run off the event loop and are saved under base_dir so they resume after a restart
+        self.downloads = DownloadManager(state_path=Path(base_dir) / ".downloads-api.json")
+        self.downloads.register("hf-model", self._download_snapshot)
+        self.downloads.register("piper-voices", self._download_piper_voices)
+        # Indexed view of base_dir; lookups do not walk the tree
+        self.catalog = catalog if Path(base_dir) == catalog.root else ModelCatalog(root=Path(base_dir))
 
 
     async def get_active_model(self):
@@ -84,59 +116,29 @@ class ModelManager:
         # Ideally lock to prevent concurrent loading
         pass
 
+    def _download_snapshot(self, repo_id):
+        hf_snapshot(repo_id, Path(self.base_dir) / repo_id)
+        self.catalog.refresh()
+        return {"status": "downloaded", "path": f"{self.base_dir}/{repo_id}"}
+
+    def _download_piper_voices(self, model_name, voice):
+        hf_snapshot("rhasspy/piper-voices", Path(self.base_dir) / model_name, allow_patterns=voice)
+        if not os.path.exists(f"{self.base_dir}/{model_name}/config.json"):
+            filename_object = f"{self.base_dir}/{model_name}/config.json"
+
+            with open(filename_object, 'w') as f:
+                json.dump({}, f, indent=4) # indent for pretty-printing
+        self.catalog.refresh()
+        return {"status": "downloaded", "path": f"{self.base_dir}/{model_name}"}
+
     async def download_model(self, model_name):
-        # Start background task if not already running
-        # if model_name not in self._downloads:
-        #     self._downloads[model_name] = asyncio.create_task(self._really_download(model_name))
-        if model_name in self._downloads and not self._downloads[model_name].done():
-            return  # Already downloading
-
-        loop = asyncio.get_event_loop()
-        async def _do_download():
-            self._download_status[model_name] = "downloading"
-            try:
-                from huggingface_hub import snapshot_download
-                snapshot_download(repo_id=model_name, local_dir=f"{self.base_dir}/{model_name}", resume_download=True)
-                self._download_status[model_name] = "downloaded"
-            except Exception as e:
-                self._download_status[model_name] = f"error: {e}"
-
-        # Directly create and store an asyncio Task in the CURRENT loop
-        self._downloads[model_name] = loop.create_task(_do_download())
-    
+        # Runs on the download worker pool; an identical request in flight gets the same job
+        return self.downloads.submit("hf-model", model_name, repo_id=model_name)
+
     async def download_dataset(self, model_name, **kwargs):
-        print(kwargs)
-        if model_name in self._downloads and not self._downloads[model_name].done():
-            return  # Already downloading
-
-        # input_patterns = ["language", "location", "name", "tone"] 
-        loop = asyncio.get_event_loop()
-        async def _do_download():
-            self._download_status[model_name] = "downloading"
-            try:
-                from huggingface_hub import snapshot_download
-                snapshot_download(
-                    repo_id="rhasspy/piper-voices",
-                    local_dir=f"{self.base_dir}/{model_name}",
-                    allow_patterns=f"{kwargs['voice']}"
-                    # repo_type="dataset"
-                )
-                self._download_status[model_name] = "downloaded"
-
-                if not os.path.exists(f"{self.base_dir}/{model_name}/config.json"):
-                    filename_object = f"{self.base_dir}/{model_name}/config.json"
-
-                    with open(filename_object, 'w') as f:
-                        json.dump({}, f, indent=4) # indent for pretty-printing
-            except Exception as e:
-                self._download_status[model_name] = f"error: {e}"
-
-        # Directly create and store an asyncio Task in the CURRENT loop
-        self._downloads[model_name] = loop.create_task(_do_download())
-
-    async def _really_download(self, model_name):
-        # e.g., call huggingface_hub.snapshot_download to base_dir/model_name
-        pass
+        if not kwargs.get("voice"):
+            raise HTTPException(status_code=400, detail="voice required")
+        return self.downloads.submit("piper-voices", f"{model_name}:{kwargs['voice']}", model_name=model_name, voice=kwargs["voice"])
 
     def list_models(self):
         
@@ -154,25 +156,23 @@ class ModelManager:
         A function to list all piper-tts based voices based on the *.onnx.json file format 
         """
         voice_dirs = []
-        for root, dirs, files in os.walk(self.base_dir):
-            # ✅ Skip HuggingFace cache dirs
-            if ".cache" in root:
+        seen_dirs = set()
+        for entry in self.catalog.entries(engine="piper", under="piper-tts"):
+            voice_path = Path(entry["path"])
+            # only need one match per directory
+            if voice_path.parent in seen_dirs:
                 continue
-            for f in files:
-                # if f.endswith(".onnx.json") or f.endswith(".onnx.json.metadata"):
-                if f.endswith(".onnx"):
-                    # Voice ID = relative path from base_dir without extension
-                    voice_id = Path(root, f).relative_to(f"{self.base_dir}/piper-tts/").as_posix()
-                    # voice_dirs.append(voice_id)
-                    voice_dirs.append({
-                        'id': voice_id,
-                        'name': voice_id.split('/')[2],
-                        'gender': "NEUTRAL",
-                        'language_code': f"{voice_id.split('/')[1]}",
-                        'description': f"{voice_id.split('/')[3]}"
-                    })
-                    break  # only need one match per directory
-                
+            seen_dirs.add(voice_path.parent)
+            # Voice ID = relative path from base_dir
+            voice_id = voice_path.relative_to(f"{self.base_dir}/piper-tts/").as_posix()
+            voice_dirs.append({
+                'id': voice_id,
+                'name': voice_id.split('/')[2],
+                'gender': "NEUTRAL",
+                'language_code': f"{voice_id.split('/')[1]}",
+                'description': f"{voice_id.split('/')[3]}"
+            })
+
         # print(voice_dirs)
         if ('parler-tts' in os.listdir(f"{self.base_dir}")):
 
@@ -198,47 +198,22 @@ class ModelManager:
     
 
     def get_download_status(self, model_name):
-        if model_name not in self._download_status:
-            model_paths = self.find_parler_tts_model_dirs(self.base_dir)
-            for path in model_paths:
-                models_key = path.replace(self.base_dir+'/', '')
-                if model_name == models_key:
-                    return {"status": f"{model_name} is in your local Directory."}
-            return {"status": f"{model_name} not found !!! If you require, please download"}
-
-        # Status (pending, downloading, available, error)
-        if self._download_status[model_name] == "downloading":
-            return {"status": f"{model_name} download in Progress."}
-        elif self._download_status[model_name] == "downloaded":
-            return {"status": f"{model_name} download in complete."}
+        job = self.downloads.latest(model_name)
+        if job is not None:
+            # queued/running/completed/failed/cancelled with byte progress and the last error
+            return job.info()
+
+        model_paths = self.find_parler_tts_model_dirs(self.base_dir)
+        for path in model_paths:
+            models_key = path.replace(self.base_dir+'/', '')
+            if model_name == models_key:
+                return {"status": f"{model_name} is in your local Directory."}
+        return {"status": f"{model_name} not found !!! If you require, please download"}
     
     def find_parler_tts_model_dirs(self, base_dir):
-        # List models available in self.base_dir
-        model_dirs = []
-        for root, dirs, files in os.walk(base_dir):
-            # if "config.json" in files and "pytorch_model.bin" in files:
-            # if ("config.json" in files) or ('*.onnx.json' in files):
-            if ("config.json" in files):
-                model_dirs.append(root)
-        return model_dirs
-
-async def library_check(model_name: str):
-    """
-    A function to Download/Install the required library
-
-    model_name: model that requires the Installation 
-    """
-
-    try:
-        if ("piper" in model_name):
-            subprocess.check_call(["uv", "pip", "install", ".[piper-tts]"])
-            print("Piper-TTS library installation complete !!! ")
+        # List models available in self.base_dir (directories with a config.json)
+        return [entry["path"] for entry in self.catalog.entries() if entry["engine"] in ("parler", "hf")]
 
-    except Exception as e:
-        raise e
-
-    return True
-    
 async def xtts_loader(model_name: str):
     try:
         tts = importlib.import_module("TTS")
@@ -290,6 +265,31 @@ async def track_connections(request: Request, call_next):
 
     return response
 
+
+MODEL_RESIDENT_BYTES.collect(lambda: [({"runtime": k.partition(":")[0], "model": k}, e.size_bytes) for k, e in list(model_cache.cache.items())])
+MODELS_LOADED.collect(lambda: [({"runtime": "api"}, len(model_cache.cache))])
+
+
+@app.middleware("http")
+async def track_metrics(request: Request, call_next):
+    rid = begin_request(request.headers.get("x-request-id"))
+    started = time.perf_counter()
+    INFLIGHT.inc(route="all")
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["x-request-id"] = rid
+        return response
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        INFLIGHT.dec(route="all")
+        route = getattr(request.scope.get("route"), "path", "other")
+        REQUESTS.inc(route=route, status=str(status))
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route)
+
 @app.get("/")
 async def index():
     now = datetime.utcnow().isoformat() + "Z"
@@ -305,16 +305,87 @@ async def index():
     }
     return response
 
+@app.get("/metrics")
+async def metrics_text():
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health():
-    return {
-        "status": "ok",
+    # Not ready (503) until the preload profile has been loaded and warmed up
+    return JSONResponse({
+        "status": "ok" if readiness.ready else "warming",
+        "preload": readiness.info(),
         "models_in_memory": list(model_cache.cache.keys()),
-        "num_models": len(model_cache.cache)
-    }
+        "num_models": len(model_cache.cache),
+        "model_cache": model_cache.stats(),
+        "audio_cache": audio_cache.stats(),
+        "runtimes": runtimes
+    }, status_code=200 if readiness.ready else 503)
 
 model_manager = ModelManager(base_dir=f"{os.getcwd()}/data")
 
+
+@app.on_event("startup")
+async def start_catalog():
+    await asyncio.to_thread(model_manager.catalog.start)
+
+
+def _model_dir(model_id):
+    return f"{os.getcwd()}/data/{model_id}"
+
+
+def _model_key(model_id):
+    # Cache key shared by requests and the preload, so a warmed model is the one requests lease
+    return f"{model_id or 'default'}:{_model_dir(model_id) or 'none'}"
+
+
+DEFAULT_PIPER_VOICE = "en/en_US/amy/medium/en_US-amy-medium.onnx"
+DEFAULT_PARLER_DESCRIPTION = "A female speaker delivers a slightly expressive and animated speech with a moderate speed and pitch."
+
+
+async def _load_piper(item):
+    voice = item.voice or DEFAULT_PIPER_VOICE
+    async with model_cache.lease(_model_key(item.model), lambda: piper_loader(voice=voice, model_dir=_model_dir("piper-tts"))):
+        pass
+
+
+async def _warm_piper(item, text):
+    await router_piper(text=text, voice=item.voice or DEFAULT_PIPER_VOICE, model_cache=model_cache, model_key=_model_key(item.model))
+
+
+async def _load_parler(item):
+    async with model_cache.lease(_model_key(item.model), lambda: parler_loader(model_id=item.model, model_dir=_model_dir(item.model))):
+        pass
+
+
+async def _warm_parler(item, text):
+    description = item.description or item.voice or DEFAULT_PARLER_DESCRIPTION
+    await router_parler(text, item.model, description, model_cache, _model_key(item.model), _model_dir(item.model))
+
+
+PRELOAD_WARMERS = {"piper": (_load_piper, _warm_piper), "parler": (_load_parler, _warm_parler)}
+readiness = Readiness()
+preload_items = load_profile()
+if preload_items:
+    readiness.state = "warming"
+
+
+@app.on_event("startup")
+async def start_preload():
+    if preload_items:
+        app.state.preload = asyncio.create_task(preload(preload_items, PRELOAD_WARMERS, readiness, "api"))
+
+
+@app.on_event("startup")
+async def start_downloads():
+    await asyncio.to_thread(model_manager.downloads.restore)
+
+
+@app.on_event("shutdown")
+async def stop_downloads():
+    model_manager.downloads.shutdown()
+
 # @app.post("/tts")
 # async def tts(text: str):
 #     model = await model_manager.get_active_model()
@@ -330,11 +401,31 @@ async def download_model(name: str, request: Request):
     if ('piper' in name):
         body = await request.json()
         # text = body.get("text", "").strip()
-        await library_check("piper-tts")
-        await model_manager.download_dataset("piper-tts", **body)
+        job = await model_manager.download_dataset("piper-tts", **body)
     else:
-        await model_manager.download_model(name)
-    return {"status": "download started (or already in progress)"}
+        job = await model_manager.download_model(name)
+    return JSONResponse(job.info(), status_code=202, headers={"Location": f"/v1/models/download/{job.id}"})
+
+
+@app.get("/v1/models/downloads")
+async def list_downloads():
+    return {"data": model_manager.downloads.list(), **model_manager.downloads.stats()}
+
+
+@app.get("/v1/models/download/{job_id}")
+async def download_status(job_id: str):
+    job = model_manager.downloads.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown download job")
+    return job.info()
+
+
+@app.delete("/v1/models/download/{job_id}")
+async def cancel_download(job_id: str):
+    job = model_manager.downloads.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown download job")
+    return job.info()
 
 @app.post("/v1/models/switch")
 async def switch_model(name: str):
@@ -353,8 +444,74 @@ async def model_status(name: str):
 async def list_voices(model: Optional[str] = Query(None, description="Optional model name")):
     return model_manager.list_voices()
 
-from api.routers.rt_parler_tts import router_parler
-from api.routers.rt_piper_tts import router_piper
+from api.routers.rt_parler_tts import parler_loader, router_parler, router_parler_stream
+from api.routers.rt_piper_tts import piper_loader, router_piper, router_piper_stream
+
+async def _encode(encoder, fn, *args) -> bytes:
+    # ffmpeg-backed encoders do pipe I/O, which stays off the event loop
+    if encoder.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+async def _stream_segments(segments, key, fmt, sample_rate):
+    """
+    Encode segment PCM as one stream of `fmt`, joined with short fades, yielding
+    (content_type, data); caches the full audio at the end.
+    """
+    joiner = None
+    encoder = None
+    collected = []
+    started = False
+    try:
+        async for rate, pcm in segments:
+            if joiner is None:
+                joiner = PcmJoiner(rate, gap_ms=tts_segment_gap_ms(), crossfade_ms=tts_segment_crossfade_ms())
+                encoder = open_encoder(fmt, rate, target_rate=sample_rate)
+            out = joiner.push(pcm)
+            data = await _encode(encoder, encoder.push, out) if out else b""
+            if data:
+                collected.append(data)
+                started = True
+                yield encoder.content_type, data
+        if joiner is None:
+            return
+        tail = joiner.finish()
+        data = (await _encode(encoder, encoder.push, tail) if tail else b"") + await _encode(encoder, encoder.finish)
+        if data:
+            collected.append(data)
+            yield encoder.content_type, data
+    except Exception as e:
+        if started:
+            # Headers are already sent: re-raising aborts the response, so the client sees a
+            # failed transfer instead of a short body that looks like complete audio
+            print(f"[speech] segmented synthesis failed after audio was sent: {e}")
+        raise
+    finally:
+        if encoder is not None:
+            encoder.close()
+        await segments.aclose()
+    data = b"".join(collected)
+    if encoder.content_type == "audio/wav":
+        data = seal_wav(data)
+    audio_cache.put_background(key, data, encoder.content_type)
+
+
+async def _streaming_response(chunks, headers: dict) -> StreamingResponse:
+    """Wait for the first encoded chunk so its content type (and any early error) sets the response."""
+    try:
+        content_type, first = await chunks.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="No audio generated.")
+    except CodecUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    async def body():
+        yield first
+        async for _content_type, data in chunks:
+            yield data
+
+    return StreamingResponse(body(), media_type=content_type, headers=headers)
 
 @app.post("/v1/audio/speech")
 async def tts_endpoint(request: Request):
@@ -363,7 +520,11 @@ async def tts_endpoint(request: Request):
     {
         "text": "...",
         "model": "parler-tts/parler-tts-mini-v1" or "piper-tts",
-        "voice": (Mike)  |  (en/en_US/amy/medium/en_US-amy-medium.onnx)
+        "voice": (Mike)  |  (en/en_US/amy/medium/en_US-amy-medium.onnx),
+        "stream": false,   # optional: synthesize sentence by sentence and stream audio as segments finish
+        "language": "en",  # optional: segmentation rules for streaming
+        "response_format": "wav",  # optional: wav | pcm | opus | mp3 | flac | aac
+        "sample_rate": 16000       # optional: resample the output (default: the model's rate)
     }
     """
     body = await request.json()
@@ -377,25 +538,61 @@ async def tts_endpoint(request: Request):
     if not voice:
         raise HTTPException(status_code=400, detail="Missing required field: voice")
 
-    model_dir = f"{os.getcwd()}/data/{model_id}"
-    model_key = f"{model_id or 'default'}:{model_dir or 'none'}"
+    model_dir = _model_dir(model_id)
+    model_key = _model_key(model_id)
 
     print(body)
+    stream = bool(body.get("stream"))
+    language = body.get("language")
+    try:
+        fmt = normalize_format(body.get("response_format"))
+        sample_rate = parse_sample_rate(body.get("sample_rate"))
+        require_encoder(fmt, sample_rate)
+    except CodecError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CodecUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    # Segmented audio differs from whole-text synthesis, so it is cached under its own format
+    output_format = fmt + (f"@{sample_rate}" if sample_rate else "") + ("+seg" if stream else "")
     if ("parler" in model_id):
-        audio_buffer = await router_parler(text, model_id, voice, model_cache, model_key, model_dir)
+        key = cache_key(model_id, None, voice, text, output_format)
+
+        async def produce():
+            audio_buffer = await router_parler(text, model_id, voice, model_cache, model_key, model_dir)
+            return await asyncio.to_thread(transcode_wav, audio_buffer.read(), fmt, sample_rate)
+
+        def segments():
+            return router_parler_stream(text, model_id, voice, model_cache, model_key, model_dir, language=language)
     elif ("piper-tts" in model_id):
+        voice = voice or "en/en_US/amy/medium/en_US-amy-medium.onnx"
+        key = cache_key(model_id, os.path.join(f"{os.getcwd()}/data/piper-tts", voice), None, text, output_format)
+
+        async def produce():
+            audio_buffer = await router_piper(
+                text=text,
+                voice=voice,
+                model_cache=model_cache,
+                model_key=model_key
+            )
+            return await asyncio.to_thread(encode_buffer, audio_buffer, fmt, sample_rate)
+
+        def segments():
+            return router_piper_stream(text=text, voice=voice, model_cache=model_cache, model_key=model_key, language=language)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported model: {model_id}")
 
-        audio_buffer = await router_piper(
-            text=text,
-            voice=voice or "en/en_US/amy/medium/en_US-amy-medium.onnx",
-            model_cache=model_cache,
-            model_key=model_key
-        )
+    if stream:
+        cached = await audio_cache.aget(key)
+        if cached is not None:
+            return StreamingResponse(iter([cached[0]]), media_type=cached[1], headers={"X-Cache": "hit"})
+        return await _streaming_response(_stream_segments(segments(), key, fmt, sample_rate), {"X-Cache": "miss"})
+
+    (audio_bytes, content_type), hit = await audio_cache.get_or_create(key, produce)
 
     async def streamer():
-        yield audio_buffer.read()
+        yield audio_bytes
 
-    return StreamingResponse(streamer(), media_type="audio/wav")
+    return StreamingResponse(streamer(), media_type=content_type, headers={"X-Cache": "hit" if hit else "miss"})
 
 # @app.post("/v1/text-to-speech/:voice_id")
 # async def elevanlabs_tts_endpoint(request: Request):
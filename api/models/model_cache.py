@@ -1,47 +1,153 @@
 import asyncio
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import gc
+import sys
+import time
+
+from src.common.config import model_cache_max_bytes, model_load_workers
+from src.common.metrics import cache_event, observe_stage
+from src.streaming.engines.model_registry import estimate_bytes
+
+
+class _Entry:
+    def __init__(self, value, size_bytes: int, load_seconds: float):
+        self.value = value
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.hits = 0
+        self.refs = 0  # requests currently using the model; pinned while > 0
+
 
 class ModelCacheLRU:
-    def __init__(self, max_size=2):
-        self.max_size = max_size
-        self.cache = OrderedDict()  # Dict[str, Any], key=model_key, val=(model_obj, tokenizer_obj)
-        self.lock = asyncio.Lock()
+    """
+    LRU cache of loaded models bounded by estimated bytes.
+
+    Loads are single-flight per key and never hold a cache-wide lock, so hits
+    for other models are served while a large model loads. Synchronous loaders
+    run in a small worker pool off the event loop. Models leased with
+    `lease()` are pinned and skipped by eviction until released.
+    """
+
+    def __init__(self, max_bytes: int = None, load_workers: int = None):
+        # Capacity in estimated resident bytes rather than model count
+        self.max_bytes = max_bytes if max_bytes is not None else model_cache_max_bytes()
+        self.cache = OrderedDict()  # Dict[str, _Entry], key=model_key, value=(model_obj, tokenizer_obj)
+        self._pending = {}  # model_key -> asyncio.Task running the load
+        self._pool = ThreadPoolExecutor(max_workers=max(1, load_workers or model_load_workers()), thread_name_prefix="model-load")
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.load_failures = 0
+        self.evictions = 0
+
+    async def _load(self, model_key: str, loader_func) -> _Entry:
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(loader_func):
+                value = await loader_func()
+            else:
+                value = await asyncio.get_running_loop().run_in_executor(self._pool, loader_func)
+        except BaseException:
+            self.load_failures += 1
+            raise
+        entry = _Entry(value, estimate_bytes(value), time.perf_counter() - started)
+        observe_stage("model_load", entry.load_seconds, model_key)
+        self.cache[model_key] = entry
+        self._evict(keep=model_key)
+        print(f"[model-cache] loaded {model_key} in {entry.load_seconds:.2f}s (~{entry.size_bytes / 2**20:.0f} MiB)")
+        return entry
+
+    async def _acquire(self, model_key: str, loader_func) -> _Entry:
+        entry = self.cache.get(model_key)
+        if entry is not None:
+            # Move to end to mark recently used
+            self.cache.move_to_end(model_key)
+            entry.hits += 1
+            self.hits += 1
+            cache_event("api_model", True)
+            return entry
+        task = self._pending.get(model_key)
+        if task is None:
+            self.misses += 1
+            cache_event("api_model", False)
+            task = asyncio.get_running_loop().create_task(self._load(model_key, loader_func))
+            self._pending[model_key] = task
+            task.add_done_callback(lambda _t: self._pending.pop(model_key, None))
+        else:
+            self.coalesced += 1
+        # A caller that goes away must not cancel the load other callers wait on
+        return await asyncio.shield(task)
 
     async def get(self, model_key: str, loader_func):
         """
         Get the model/tokenizer from cache or load using loader_func.
         - model_key: Unique string key for model (e.g. "parler:parler-tts-mini-v1")
-        - loader_func: Callable that returns (model, tokenizer)
+        - loader_func: Callable that returns (model, tokenizer); a plain function
+          runs in the load pool, a coroutine function is awaited as is
         """
+        entry = await self._acquire(model_key, loader_func)
+        return entry.value
 
-        async with self.lock:
-            if model_key in self.cache:
-                # Move to end to mark recently used
-                self.cache.move_to_end(model_key)
-                return self.cache[model_key]
-
-            # Load model/tokenizer
-            model, tokenizer = await loader_func()
-
-            # Evict if over capacity
-            if len(self.cache) >= self.max_size:
-                await self._evict()
-
-            self.cache[model_key] = (model, tokenizer)
-            return model, tokenizer
-
-    async def _evict(self):
-        import torch
-        # Remove least-recently used (first) model
-        model_key, (model, _) = self.cache.popitem(last=False)
+    @asynccontextmanager
+    async def lease(self, model_key: str, loader_func):
+        """Like `get`, but keeps the model from being evicted until the block exits."""
+        entry = await self._acquire(model_key, loader_func)
+        entry.refs += 1
         try:
-            # Try to free GPU/CPU memory
-            del model
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-            # Run garbage collector to free
-            gc.collect()
-        except Exception:
-            pass
+            yield entry.value
+        finally:
+            entry.refs -= 1
+            if entry.refs == 0:
+                self._evict()
+
+    def _evict(self, keep: str = None):
+        # Remove least-recently used models until within budget, skipping pinned ones
+        total = sum(e.size_bytes for e in self.cache.values())
+        evicted = False
+        for model_key in list(self.cache.keys()):
+            if total <= self.max_bytes:
+                break
+            entry = self.cache[model_key]
+            if model_key == keep or entry.refs > 0:
+                continue
+            del self.cache[model_key]
+            total -= entry.size_bytes
+            self.evictions += 1
+            evicted = True
+            print(f"[model-cache] evicted {model_key}")
+        if evicted:
+            try:
+                # Try to free GPU/CPU memory
+                gc.collect()
+                # Only if a model already imported torch; importing it here would cost seconds
+                torch = sys.modules.get("torch")
+                if torch is not None and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except Exception:
+                pass
 
+    def stats(self) -> dict:
+        return {
+            "models": [
+                {
+                    "key": k,
+                    "size_bytes": e.size_bytes,
+                    "load_seconds": round(e.load_seconds, 3),
+                    "hits": e.hits,
+                    "in_use": e.refs,
+                    "loaded_at": e.loaded_at,
+                }
+                for k, e in self.cache.items()
+            ],
+            "resident_bytes": sum(e.size_bytes for e in self.cache.values()),
+            "max_bytes": self.max_bytes,
+            "loading": list(self._pending.keys()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "load_failures": self.load_failures,
+            "evictions": self.evictions,
+        }
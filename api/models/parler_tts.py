@@ -3,11 +3,21 @@ from transformers import AutoTokenizer
 import torch
 from io import BytesIO
 import soundfile as sf
+import numpy as np
 
 import os
+import asyncio
+
+from api.models.batching import MicroBatcher
+from src.common.config import tts_segment_max_chars
+from src.common.text_segment import segment_text
 
 DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
 
+# Requests for the same model arriving within the window share one generate() call
+BATCH_MAX_SIZE = int(os.getenv("PARLER_BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.getenv("PARLER_BATCH_WINDOW_MS", "25"))
+
 class ParlerTTSModelWrapper:
     def __init__(self, model_id: str, model_dir: str = None):
         """
@@ -18,32 +28,77 @@ class ParlerTTSModelWrapper:
         self.model_dir = model_dir
         self.model = None
         self.tokenizer = None
+        self.batcher = MicroBatcher(self.generate_batch, max_batch_size=BATCH_MAX_SIZE, window_ms=BATCH_WINDOW_MS)
 
-    async def load(self):
+    def load(self):
         # Load model and tokenizer from local path or HuggingFace hub
         model_path = self.model_dir or self.model_id
         self.model = ParlerTTSForConditionalGeneration.from_pretrained(model_path).to(DEVICE)
         self.tokenizer = AutoTokenizer.from_pretrained(model_path)
 
-    async def generate_audio(self, prompt: str, description: str):
-        if self.model is None or self.tokenizer is None:
-            await self.load()
-
-        desc_tokens = self.tokenizer(description, return_tensors="pt")
-        prompt_tokens = self.tokenizer(prompt, return_tensors="pt")
-        input_ids = desc_tokens.input_ids.to(DEVICE)
-        attention_mask = desc_tokens.attention_mask.to(DEVICE)
-        prompt_ids = prompt_tokens.input_ids.to(DEVICE)
+    def generate_batch(self, items):
+        """
+        items: list of (prompt, description) pairs.
+        Returns one float numpy waveform per item, trimmed to its generated length.
+        """
+        prompts = [prompt for prompt, _ in items]
+        descriptions = [description for _, description in items]
+        desc_tokens = self.tokenizer(descriptions, return_tensors="pt", padding=True)
+        prompt_tokens = self.tokenizer(prompts, return_tensors="pt", padding=True)
 
         with torch.no_grad():
             output = self.model.generate(
-                input_ids=input_ids,
-                attention_mask=attention_mask,
-                prompt_input_ids=prompt_ids
+                input_ids=desc_tokens.input_ids.to(DEVICE),
+                attention_mask=desc_tokens.attention_mask.to(DEVICE),
+                prompt_input_ids=prompt_tokens.input_ids.to(DEVICE),
+                prompt_attention_mask=prompt_tokens.attention_mask.to(DEVICE),
+                return_dict_in_generate=True,
             )
-        audio = output.cpu().numpy().squeeze()
+        sequences = output.sequences.cpu()
+        lengths = getattr(output, "audios_length", None)
+        audios = []
+        for i in range(len(items)):
+            audio = sequences[i]
+            if lengths is not None:
+                audio = audio[: int(lengths[i])]
+            audios.append(audio.numpy().squeeze())
+        return audios
+
+    async def generate_audio(self, prompt: str, description: str):
+        if self.model is None or self.tokenizer is None:
+            await asyncio.to_thread(self.load)
+
+        audio = await self.batcher.submit((prompt, description))
 
         buffer = BytesIO()
         sf.write(buffer, audio, self.model.config.sampling_rate, format="WAV")
         buffer.seek(0)
         return buffer
+
+    async def stream_audio(self, prompt: str, description: str, language: str = None):
+        """
+        Yield (sample_rate, int16 PCM bytes) per text segment, in order.
+
+        The first segment is submitted alone so audio starts quickly; the rest
+        are submitted together and the batcher groups them into generate() calls.
+        """
+        if self.model is None or self.tokenizer is None:
+            await asyncio.to_thread(self.load)
+
+        rate = self.model.config.sampling_rate
+        segments = segment_text(prompt, language, max_chars=tts_segment_max_chars())
+        if not segments:
+            return
+        first = await self.batcher.submit((segments[0], description))
+        yield rate, _to_pcm16(first)
+        pending = [asyncio.ensure_future(self.batcher.submit((seg, description))) for seg in segments[1:]]
+        try:
+            for fut in pending:
+                yield rate, _to_pcm16(await fut)
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+
+def _to_pcm16(audio) -> bytes:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
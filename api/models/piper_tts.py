@@ -1,90 +1,73 @@
-from piper import PiperVoice
-import torch
 from io import BytesIO
-import soundfile as sf
 import os
-import numpy as np
+import asyncio
 from typing import AsyncGenerator
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+from src.common.audio import WavBuffer
+from src.common.onnx_sessions import load_piper_voice
+from src.common.config import tts_segment_max_chars
+from src.common.text_segment import segment_text
+
+
+def _use_cuda() -> bool:
+    # Piper runs on onnxruntime; the GPU build exposes the CUDA provider. No torch needed to decide
+    import onnxruntime
+
+    return "CUDAExecutionProvider" in onnxruntime.get_available_providers()
 
 class PiperTTSModelWrapper:
-    def __init__(self, model_path: str, local_cache_dir: str = None, voice: str = None):
+    def __init__(self, model_path: str, voice: str = None):
         """
         model_path: Path to the .onnx model file for Piper
-        local_cache_dir: Directory for on-disk audio cache (optional)
         voice: Piper voice name/variant, if supported by your model
         """
         self.model_path = model_path
-        self.local_cache_dir = local_cache_dir
         self.voice = voice
         self.model = None
 
-        if self.local_cache_dir and not os.path.exists(self.local_cache_dir):
-            os.makedirs(self.local_cache_dir, exist_ok=True)
-
     def load(self):
-        # Load Piper ONNX using memory mapping for efficiency
-        # self.model = PiperVoice.load_onnx(self.model_path, use_memory_mapping=True, device=DEVICE)
-        self.model = PiperVoice.load(self.model_path, self.model_path+".json", use_cuda=True) if DEVICE == "cuda" \
-            else PiperVoice.load(self.model_path, self.model_path+".json")
+        # Thread pool, optimized-graph cache and weight mapping come from the ONNX_* settings
+        self.model = load_piper_voice(self.model_path, self.model_path + ".json", use_cuda=_use_cuda())
 
         # You may set other model options here, such as voice
 
-    def get_cache_path(self, text):
-        """Return local cache filename (optional, improves speed for repeated requests)"""
-        if not self.local_cache_dir:
-            return None
-        import hashlib
-        hash_id = hashlib.sha1(text.encode('utf-8')).hexdigest()
-        return os.path.join(self.local_cache_dir, f"{hash_id}.wav")
-    
-    def synthesize_to_buffer(self, text):
-        audio_int16 = []
-        sample_rate = None
-        sample_width = None
-        sample_channels = None
-
-        # Collect all chunks
+    def synthesize_to_buffer(self, text) -> WavBuffer:
+        """Collect Piper's chunks without joining or re-encoding them; see src.common.audio.WavBuffer."""
+        buffer = None
         for chunk in self.model.synthesize(text):
-            if sample_rate is None:
-                sample_rate = chunk.sample_rate
-                sample_width = chunk.sample_width
-                sample_channels = chunk.sample_channels
-            audio_int16.append(chunk.audio_int16_bytes)
+            if buffer is None:
+                buffer = WavBuffer(chunk.sample_rate, chunk.sample_channels, chunk.sample_width)
+            buffer.append(chunk.audio_int16_bytes)
 
-        if not audio_int16:
+        if buffer is None:
             raise RuntimeError("No audio generated.")
-
-        # Concatenate all the raw bytes
-        all_bytes = b"".join(audio_int16)
-
-        # Convert bytes to numpy array
-        audio_np = np.frombuffer(all_bytes, dtype=np.int16)
-
-        # Reshape for channels if needed
-        if sample_channels > 1:
-            audio_np = audio_np.reshape(-1, sample_channels)
-
-        # Write to in-memory WAV
-        buffer = BytesIO()
-        sf.write(buffer, audio_np, sample_rate, format="WAV", subtype="PCM_16")
-        buffer.seek(0)
         return buffer
 
 
     async def generate_audio(self, text: str):
-        cache_path = self.get_cache_path(text)
-        if cache_path and os.path.isfile(cache_path):
-            # Fast path: serve cached audio
-            with open(cache_path, "rb") as f:
-                return BytesIO(f.read())
-
+        # Repeated prompts are served by the shared audio cache in api/app.py
         if self.model is None:
             self.load()
 
         return self.synthesize_to_buffer(text)
 
+    def _synthesize_pcm(self, text: str):
+        parts = []
+        sample_rate = None
+        for chunk in self.model.synthesize(text):
+            sample_rate = chunk.sample_rate
+            parts.append(chunk.audio_int16_bytes)
+        return sample_rate, b"".join(parts)
+
+    async def stream_audio(self, text: str, language: str = None):
+        """Yield (sample_rate, int16 PCM bytes) per text segment, in order, synthesized off the event loop."""
+        if self.model is None:
+            await asyncio.to_thread(self.load)
+        for segment in segment_text(text, language, max_chars=tts_segment_max_chars()):
+            sample_rate, pcm = await asyncio.to_thread(self._synthesize_pcm, segment)
+            if pcm:
+                yield sample_rate, pcm
+
     async def pipersynth_stream(self, text: str) -> AsyncGenerator[bytes, None]:
         """Stream Piper TTS output, chunk by chunk, formatted as WAV stream."""
         # We will collect PCM chunks, but stream as they come as raw PCM inside WAV container.
@@ -7,17 +7,30 @@ async def router_parler(text, model_id, description, model_cache, model_key, mod
     if not model_id:
             model_id = "parler-tts/parler-tts-mini-v1"
 
-    async def loader():
-        return await parler_loader(model_id=model_id, model_dir=model_dir)
+    def loader():
+        # Runs in the model cache's load pool, off the event loop
+        return parler_loader(model_id=model_id, model_dir=model_dir)
 
     try:
-        model_wrapper, _ = await model_cache.get(model_key, loader)
-        audio_buffer = await model_wrapper.generate_audio(prompt=text, description=description)
+        async with model_cache.lease(model_key, loader) as (model_wrapper, _):
+            audio_buffer = await model_wrapper.generate_audio(prompt=text, description=description)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating Parler-TTS audio: {e}")
     return audio_buffer
 
-async def parler_loader(model_id: str, model_dir: str = None):
+async def router_parler_stream(text, model_id, description, model_cache, model_key, model_dir=None, language=None):
+    """Segmented Parler synthesis; yields (sample_rate, pcm) and keeps the model leased until done."""
+    if not model_id:
+        model_id = "parler-tts/parler-tts-mini-v1"
+
+    def loader():
+        return parler_loader(model_id=model_id, model_dir=model_dir)
+
+    async with model_cache.lease(model_key, loader) as (model_wrapper, _):
+        async for item in model_wrapper.stream_audio(prompt=text, description=description, language=language):
+            yield item
+
+def parler_loader(model_id: str, model_dir: str = None):
     try:
         parler_module = importlib.import_module("parler_tts")
         torch = importlib.import_module("torch")
@@ -31,7 +44,7 @@ async def parler_loader(model_id: str, model_dir: str = None):
     ParlerTTSModelWrapper = importlib.import_module("api.models.parler_tts").ParlerTTSModelWrapper
     
     wrapper = ParlerTTSModelWrapper(model_id=model_id, model_dir=model_dir)
-    await wrapper.load()
+    wrapper.load()
     return wrapper, wrapper.tokenizer  # tokenizer only used internally by wrapper
 
 
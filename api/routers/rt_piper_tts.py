@@ -10,26 +10,38 @@ async def router_piper(text, voice, model_cache, model_key, model_dir=f"{os.getc
     if not voice:
         voice = "en/en_US/amy/medium/en_US-amy-medium.onnx"  # Update as needed
 
-    async def loader():
-        return await piper_loader(voice=voice, model_dir=model_dir)
+    def loader():
+        # Runs in the model cache's load pool, off the event loop
+        return piper_loader(voice=voice, model_dir=model_dir)
 
     try:
-        model_wrapper, _ = await model_cache.get(model_key, loader)
-        # Piper does not use description parameter (can ignore or repurpose)
-        audio_buffer = await model_wrapper.generate_audio(text=text)
+        async with model_cache.lease(model_key, loader) as (model_wrapper, _):
+            # Piper does not use description parameter (can ignore or repurpose)
+            audio_buffer = await model_wrapper.generate_audio(text=text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating Piper-TTS audio: {e}")
 
     return audio_buffer
 
-async def piper_loader(voice: str, model_dir: str = None):
+async def router_piper_stream(text, voice, model_cache, model_key, model_dir=f"{os.getcwd()}/data/piper-tts", language=None):
+    """Segmented Piper synthesis; yields (sample_rate, pcm) and keeps the voice leased until done."""
+    if not voice:
+        voice = "en/en_US/amy/medium/en_US-amy-medium.onnx"
+
+    def loader():
+        return piper_loader(voice=voice, model_dir=model_dir)
+
+    async with model_cache.lease(model_key, loader) as (model_wrapper, _):
+        async for item in model_wrapper.stream_audio(text=text, language=language):
+            yield item
+
+def piper_loader(voice: str, model_dir: str = None):
     try:
         piper_module = importlib.import_module("piper")
-        soundfile = importlib.import_module("soundfile")
     except ImportError:
         raise HTTPException(
             status_code=500,
-            detail="Piper-TTS not installed. Please install with 'pip install piper-tts soundfile'"
+            detail="Piper-TTS not installed. Please install with 'pip install .[piper-tts]'"
         )
     # Import your Piper wrapper
     PiperTTSModelWrapper = importlib.import_module("api.models.piper_tts").PiperTTSModelWrapper
@@ -42,8 +54,8 @@ async def piper_loader(voice: str, model_dir: str = None):
         print(model_path)
 
     wrapper = PiperTTSModelWrapper(model_path=model_path)
-    # LAZY LOAD: don't load in constructor – let generate_audio/load() do it
-    # (if your wrapper auto-loads, call wrapper.load() here if needed)
+    # Load here, in the loader thread, so the first request does not load on the event loop
+    wrapper.load()
     return wrapper, None  # Second value, for consistency; not used
 
 
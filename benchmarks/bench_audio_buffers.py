@@ -0,0 +1,152 @@
+"""
+Memory cost per response of assembling synthesized audio, before and after WavBuffer.
+
+    python -m benchmarks.bench_audio_buffers
+    python -m benchmarks.bench_audio_buffers --seconds 30 --requests 200
+
+Feeds the same simulated Piper output (one int16 chunk per sentence, as
+PiperVoice.synthesize yields them) through the old and new assembly code and
+reports, per request, the peak of traced Python allocations (tracemalloc)
+in KiB and as a multiple of the PCM payload, wall time, and the process RSS
+growth over the run. Each pipeline runs in a fresh interpreter so RSS numbers do not mix.
+
+  api-legacy     join -> numpy.frombuffer -> soundfile.write(BytesIO) -> read()
+                 (wave instead of numpy/soundfile when those are missing)
+  api-buffer     WavBuffer -> encode_buffer(wav)
+  engine-legacy  wave.writeframes per chunk into BytesIO -> getvalue()
+  engine-buffer  WavBuffer.tobytes()
+"""
+import argparse
+import io
+import json
+import math
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import wave
+from array import array
+
+from src.common.audio import WavBuffer
+from src.common.codecs import encode_buffer
+
+PIPELINES = ("api-legacy", "api-buffer", "engine-legacy", "engine-buffer")
+
+
+def _chunks(seconds: float, sentence_seconds: float, rate: int) -> list[bytes]:
+    tone = array("h", (int(6000 * math.sin(2 * math.pi * 220 * i / rate)) for i in range(int(rate * sentence_seconds)))).tobytes()
+    return [tone] * max(1, int(seconds / sentence_seconds))
+
+
+def _api_legacy(chunks: list[bytes], rate: int) -> bytes:
+    all_bytes = b"".join(chunks)
+    buffer = io.BytesIO()
+    try:
+        import numpy as np
+        import soundfile as sf
+
+        sf.write(buffer, np.frombuffer(all_bytes, dtype=np.int16), rate, format="WAV", subtype="PCM_16")
+    except ImportError:
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(all_bytes)
+    buffer.seek(0)
+    return buffer.read()
+
+
+def _api_buffer(chunks: list[bytes], rate: int) -> bytes:
+    buf = WavBuffer(rate)
+    for chunk in chunks:
+        buf.append(chunk)
+    return encode_buffer(buf, "wav")[0]
+
+
+def _engine_legacy(chunks: list[bytes], rate: int) -> bytes:
+    buffer = io.BytesIO()
+    wav = wave.open(buffer, "wb")
+    wav.setnchannels(1)
+    wav.setsampwidth(2)
+    wav.setframerate(rate)
+    for chunk in chunks:
+        wav.writeframes(chunk)
+    wav.close()
+    return buffer.getvalue()
+
+
+def _engine_buffer(chunks: list[bytes], rate: int) -> bytes:
+    buf = WavBuffer(rate)
+    for chunk in chunks:
+        buf.append(chunk)
+    return buf.tobytes()
+
+
+FUNCS = {"api-legacy": _api_legacy, "api-buffer": _api_buffer, "engine-legacy": _engine_legacy, "engine-buffer": _engine_buffer}
+
+
+def _rss_kib() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def _child(args) -> dict:
+    fn = FUNCS[args.child]
+    # Chunks are produced per request in a real server; here they are shared so only assembly is measured
+    chunks = _chunks(args.seconds, args.sentence_seconds, args.rate)
+    payload = sum(len(c) for c in chunks)
+    fn(chunks, args.rate)  # warm imports and allocator pools
+    rss_before = _rss_kib()
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        fn(chunks, args.rate)
+    elapsed = time.perf_counter() - started
+    rss_after = _rss_kib()
+
+    peaks = []
+    for _ in range(min(args.requests, 20)):
+        tracemalloc.start()
+        out = fn(chunks, args.rate)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        del out
+    return {
+        "pipeline": args.child,
+        "payload_kib": payload / 1024,
+        "peak_kib": sum(peaks) / len(peaks) / 1024,
+        "peak_x_payload": sum(peaks) / len(peaks) / payload,
+        "ms_per_request": elapsed / args.requests * 1000,
+        "rss_growth_kib": rss_after - rss_before,
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=12.0, help="audio per response")
+    parser.add_argument("--sentence-seconds", type=float, default=2.0, help="audio per synthesized chunk")
+    parser.add_argument("--rate", type=int, default=22050)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument("--child", choices=PIPELINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(_child(args)))
+        return
+
+    print(f"{args.seconds:.0f}s of {args.rate} Hz audio per response, {args.requests} requests per pipeline")
+    print(f"{'pipeline':<15} {'peak KiB':>10} {'x payload':>10} {'ms/req':>8} {'RSS +KiB':>9} {'max RSS KiB':>12}")
+    for name in args.pipelines:
+        cmd = [sys.executable, "-m", "benchmarks.bench_audio_buffers", "--child", name, "--seconds", str(args.seconds),
+               "--sentence-seconds", str(args.sentence_seconds), "--rate", str(args.rate), "--requests", str(args.requests)]
+        r = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1])
+        print(
+            f"{name:<15} {r['peak_kib']:>10.0f} {r['peak_x_payload']:>10.2f} {r['ms_per_request']:>8.2f} "
+            f"{r['rss_growth_kib']:>9} {r['max_rss_kib']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Request distribution of the gateway's EngineBalancer over local engines.
+
+    python -m benchmarks.bench_gateway_balancing --engines 3 --requests 600
+    python -m benchmarks.bench_gateway_balancing --engines 3 --policy ewma --kill 1
+
+Starts `--engines` engine processes on consecutive ports (needs quic_cert.pem /
+quic_key.pem in the working directory), then sends `--requests` GET /health
+requests with `--concurrency` in flight, each tagged with one of `--models`
+model names (`--models 0` sends none, so only the policy decides). Reports
+per-backend share, EWMA latency and circuit state, and how often a model
+stayed on its preferred backend. With `--kill N` engine N is
+terminated halfway through to show ejection and redistribution.
+"""
+import argparse
+import asyncio
+import collections
+import os
+import signal
+import ssl
+import subprocess
+import sys
+import time
+
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+
+from src.gateway.balancer import EngineBalancer
+from src.gateway.quic_pool import QuicConnectionPool
+
+
+def _start_engines(count: int, base_port: int) -> list[subprocess.Popen]:
+    procs = []
+    for i in range(count):
+        cmd = [sys.executable, "-m", "src.streaming.h3_server", "--host", "127.0.0.1", "--port", str(base_port + i), "--workers", "1"]
+        procs.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, "ENGINE_DRAIN_SECONDS": "0"}))
+    return procs
+
+
+async def _run(args) -> None:
+    cfg = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN)
+    cfg.verify_mode = ssl.CERT_NONE
+    bases = [f"https://127.0.0.1:{args.port + i}" for i in range(args.engines)]
+
+    def _pool(base: str) -> QuicConnectionPool:
+        return QuicConnectionPool("127.0.0.1", int(base.rsplit(":", 1)[1]), configuration=cfg, size=2, keepalive_seconds=0)
+
+    balancer = EngineBalancer(bases, _pool, policy=args.policy, health_interval=1.0, failure_threshold=2, open_seconds=5.0)
+    counts: dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+    failures = 0
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        model = f"model-{i % args.models}" if args.models else None
+        async with sem:
+            try:
+                lease = await balancer.request("GET", "/health", model=model)
+            except ConnectionError:
+                failures += 1
+                return
+            try:
+                await lease.resp.wait_headers(timeout=10)
+                await lease.resp.read(timeout=10)
+                balancer.headers_received(lease)
+                balancer.release(lease)
+                counts[lease.backend.base][model or "-"] += 1
+            except Exception:
+                lease.cancel()
+                balancer.release(lease, failed=True)
+                failures += 1
+
+    started = time.perf_counter()
+    half = args.requests // 2
+    await asyncio.gather(*(one(i) for i in range(half)))
+    if args.kill is not None:
+        print(f"killing engine {args.kill} ({bases[args.kill]})")
+        args.procs[args.kill].send_signal(signal.SIGKILL)
+    await asyncio.gather(*(one(i) for i in range(half, args.requests)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(sum(c.values()) for c in counts.values())
+    print(f"{total} ok, {failures} failed in {elapsed:.2f}s ({total / elapsed:.0f} req/s), policy={args.policy}")
+    for backend in balancer.backends:
+        c = counts.get(backend.base, collections.Counter())
+        n = sum(c.values())
+        print(
+            f"  {backend.base}: {n:5d} ({100 * n / max(1, total):5.1f}%) models={len(c)} "
+            f"ewma={backend.ewma_ms or 0:.1f}ms state={backend.state} ejections={backend.ejections}"
+        )
+    stats = balancer.stats()
+    print(f"affinity hits={stats['affinity_hits']} spills={stats['affinity_spills']} retries={stats['retries']}")
+    await balancer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", type=int, default=3)
+    parser.add_argument("--port", type=int, default=19543)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--models", type=int, default=8)
+    parser.add_argument("--policy", choices=["least_outstanding", "ewma"], default="least_outstanding")
+    parser.add_argument("--kill", type=int, default=None, help="engine index to kill halfway through")
+    args = parser.parse_args()
+    args.procs = _start_engines(args.engines, args.port)
+    try:
+        time.sleep(4)  # engines index the catalog before listening
+        asyncio.run(_run(args))
+    finally:
+        for proc in args.procs:
+            proc.terminate()
+        for proc in args.procs:
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
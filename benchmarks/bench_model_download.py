@@ -0,0 +1,170 @@
+"""
+Model download throughput against a local Hugging Face stand-in.
+
+    python -m benchmarks.bench_model_download
+    python -m benchmarks.bench_model_download --size-mb 256 --mbps 40 --connections 1 4 8
+
+Serves a random file from an in-process HTTP server that behaves like the
+Hub for download purposes: HEAD answers with a redirect carrying
+X-Linked-Etag (the sha256) and X-Linked-Size, GET honours Range requests,
+and every connection is throttled to --mbps so that, as with a real CDN,
+one stream cannot use the whole link. For each connection count it reports
+wall time and MiB/s of `fetch`, including sha256 verification. It then
+checks that a corrupted stand-in is rejected and that an interrupted download
+resumes from its saved ranges instead of starting over.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.common.download_manager import ChecksumError, DownloadCancelled, DownloadJob, _current_job, fetch
+
+
+class _StandIn:
+    def __init__(self, payload: bytes, bytes_per_second: float):
+        self.payload = payload
+        self.sha256 = hashlib.sha256(payload).hexdigest()
+        self.rate = bytes_per_second
+        self.corrupt = False
+        self.served = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                if self.path.startswith("/resolve/"):
+                    # The Hub redirects to its CDN and puts file metadata on the redirect
+                    self.send_response(302)
+                    self.send_header("Location", "/cdn/" + self.path.rsplit("/", 1)[-1])
+                    self.send_header("X-Linked-Etag", f'"{stand_in.sha256}"')
+                    self.send_header("X-Linked-Size", str(len(stand_in.payload)))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(stand_in.payload)))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path.startswith("/resolve/"):
+                    self.send_response(302)
+                    self.send_header("Location", "/cdn/" + self.path.rsplit("/", 1)[-1])
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = stand_in.payload
+                if stand_in.corrupt:
+                    data = bytes([data[0] ^ 0xFF]) + data[1:]
+                start, end = 0, len(data) - 1
+                header = self.headers.get("Range")
+                if header:
+                    first, _, last = header.removeprefix("bytes=").partition("-")
+                    start, end = int(first), int(last) if last else len(data) - 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                view = memoryview(data)[start : end + 1]
+                block = 64 * 1024
+                began = time.perf_counter()
+                sent = 0
+                try:
+                    for offset in range(0, len(view), block):
+                        self.wfile.write(view[offset : offset + block])
+                        sent += len(view[offset : offset + block])
+                        stand_in.served += len(view[offset : offset + block])
+                        ahead = sent / stand_in.rate - (time.perf_counter() - began)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/resolve/main/model.bin"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _resume_check(stand_in: _StandIn, dest: Path, connections: int) -> tuple[int, int]:
+    """Cancel a download halfway, then resume it; return (bytes before the cancel, bytes served to finish)."""
+    job = DownloadJob("model", "resume", {})
+    token = _current_job.set(job)
+
+    def _cancel_halfway():
+        while sum(f["bytes_done"] for f in job.files.values()) < len(stand_in.payload) // 2:
+            time.sleep(0.01)
+        job.cancel_event.set()
+
+    threading.Thread(target=_cancel_halfway, daemon=True).start()
+    try:
+        fetch(stand_in.url, dest, connections=connections)
+        raise SystemExit("resume check: download finished before it could be cancelled")
+    except DownloadCancelled:
+        pass
+    finally:
+        _current_job.reset(token)
+    before = stand_in.served
+    fetch(stand_in.url, dest, connections=connections)
+    return before, stand_in.served - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=96, help="size of the served file")
+    parser.add_argument("--mbps", type=float, default=24.0, help="MiB/s per connection")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--part-mb", type=int, default=4, help="MODEL_DOWNLOAD_PART_MB for the run")
+    args = parser.parse_args()
+    os.environ["MODEL_DOWNLOAD_PART_MB"] = str(args.part_mb)
+
+    stand_in = _StandIn(os.urandom(args.size_mb * 2**20), args.mbps * 2**20)
+    workdir = Path(tempfile.mkdtemp(prefix="bench-download-"))
+    try:
+        print(f"{args.size_mb} MiB file, {args.mbps:.0f} MiB/s per connection")
+        print(f"{'connections':>11} {'seconds':>8} {'MiB/s':>8}")
+        for n in args.connections:
+            dest = workdir / f"model-{n}.bin"
+            started = time.perf_counter()
+            fetch(stand_in.url, dest, connections=n)
+            elapsed = time.perf_counter() - started
+            print(f"{n:>11} {elapsed:>8.2f} {args.size_mb / elapsed:>8.1f}")
+            dest.unlink()
+
+        stand_in.corrupt = True
+        try:
+            fetch(stand_in.url, workdir / "corrupt.bin", connections=max(args.connections))
+            print("checksum: corrupted download was NOT rejected")
+        except ChecksumError:
+            leftovers = sorted(p.name for p in workdir.iterdir())
+            print(f"checksum: corrupted download rejected, leftovers: {leftovers or 'none'}")
+        stand_in.corrupt = False
+
+        stand_in.served = 0
+        before, after = _resume_check(stand_in, workdir / "resume.bin", max(args.connections))
+        total = len(stand_in.payload)
+        print(f"resume: {before / 2**20:.1f} MiB before cancel, {after / 2**20:.1f} MiB to finish ({(before + after) / total:.2f}x file size)")
+    finally:
+        stand_in.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
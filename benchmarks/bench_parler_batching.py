@@ -0,0 +1,94 @@
+"""
+Requests/s of Parler-TTS generation vs. micro-batch window.
+
+    python -m benchmarks.bench_parler_batching --model-dir data/parler-tts/parler-tts-mini-v1
+    python -m benchmarks.bench_parler_batching --stub        # offline, simulated model cost
+
+Each run sends `--requests` syntheses through MicroBatcher with Poisson
+arrivals at `--rate` req/s and reports throughput, mean batch size and
+latency percentiles per window.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from api.models.batching import MicroBatcher
+
+PROMPTS = [
+    "Welcome to our support line.",
+    "Please hold while we connect your call.",
+    "Your balance is four hundred and twelve rupees.",
+    "Press one for English.",
+]
+DESCRIPTION = "A female speaker delivers her words clearly at a moderate pace."
+
+
+def _stub_batch_fn(base_s: float, per_item_s: float):
+    # Batched generation amortizes the fixed per-call cost (decoder setup, audio codec)
+    def _fn(items):
+        time.sleep(base_s + per_item_s * len(items))
+        return [None] * len(items)
+
+    return _fn
+
+
+async def _run_once(batch_fn, window_ms: float, max_batch: int, requests: int, rate: float) -> dict:
+    batcher = MicroBatcher(batch_fn, max_batch_size=max_batch, window_ms=window_ms)
+    latencies = []
+
+    async def one(i: int):
+        started = time.perf_counter()
+        await batcher.submit((PROMPTS[i % len(PROMPTS)], DESCRIPTION))
+        latencies.append(time.perf_counter() - started)
+
+    rng = random.Random(0)
+    started = time.perf_counter()
+    tasks = []
+    for i in range(requests):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "window_ms": window_ms,
+        "req_per_s": requests / elapsed,
+        "mean_batch": batcher.stats()["mean_batch_size"],
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", help="Local Parler-TTS snapshot (omit with --stub)")
+    parser.add_argument("--stub", action="store_true", help="Simulate model cost instead of loading Parler")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=8.0, help="Mean arrival rate in requests/s")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--windows", default="0,10,25,50,100", help="Comma-separated batch windows in ms")
+    args = parser.parse_args()
+
+    if args.stub:
+        batch_fn = _stub_batch_fn(base_s=0.25, per_item_s=0.05)
+    else:
+        if not args.model_dir:
+            parser.error("--model-dir is required unless --stub is given")
+        from api.models.parler_tts import ParlerTTSModelWrapper
+
+        wrapper = ParlerTTSModelWrapper(model_id=args.model_dir, model_dir=args.model_dir)
+        asyncio.run(wrapper.load())
+        batch_fn = wrapper.generate_batch
+
+    print(f"{'window_ms':>9} {'req/s':>8} {'batch':>6} {'p50_ms':>9} {'p99_ms':>9}")
+    # First row is the unbatched baseline (one prompt per generate call)
+    runs = [("off", 0.0, 1)] + [(w, float(w), args.max_batch) for w in args.windows.split(",") if w.strip()]
+    for label, window, max_batch in runs:
+        row = asyncio.run(_run_once(batch_fn, window, max_batch, args.requests, args.rate))
+        print(f"{label:>9} {row['req_per_s']:>8.2f} {row['mean_batch']:>6.2f} {row['p50_ms']:>9.0f} {row['p99_ms']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
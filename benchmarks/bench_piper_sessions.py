@@ -0,0 +1,180 @@
+"""
+Per-voice memory and latency of Piper ONNX Runtime sessions.
+
+    python -m benchmarks.bench_piper_sessions data/piper-tts/en/en_US/amy/medium/en_US-amy-medium.onnx
+    python -m benchmarks.bench_piper_sessions voices/*.onnx --workers 4 --concurrency 8 --modes default tuned
+
+Each mode runs in --workers fresh processes at once, as the engine does with
+several workers on one host. Every process loads all voices, reports its
+memory after each load, then synthesizes --text --runs times per voice from
+--concurrency threads. Modes:
+
+  default       PiperVoice.load: one session per voice with ORT's default thread
+                pools and in-process graph optimization (the previous behaviour)
+  tuned         src.common.onnx_sessions with the current ONNX_* settings:
+                shared thread pool, cached optimized graph, mapped weights
+  tuned-nommap  as tuned, with the weights inside the cached model (ONNX_MMAP_WEIGHTS=0)
+
+Memory comes from /proc/self/smaps_rollup. RSS counts every resident page;
+PSS divides pages shared between the workers by the number of sharers, so
+PSS below RSS per voice is memory the workers no longer duplicate. The
+optimized-graph cache is filled before a tuned mode is measured, so its load
+times are those of a restarted worker; the cold optimization time is printed
+separately.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TEXT = "The quick brown fox jumps over the lazy dog. It was the best of times, it was the worst of times."
+
+MODES = {
+    "default": {},
+    "tuned": {"ONNX_MMAP_WEIGHTS": "1"},
+    "tuned-nommap": {"ONNX_MMAP_WEIGHTS": "0"},
+}
+
+
+def _memory_mb() -> dict:
+    out = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                out[key] = int(value.split()[0]) / 1024
+    return {"rss": out.get("Rss", 0.0), "pss": out.get("Pss", 0.0), "private": out.get("Private_Clean", 0.0) + out.get("Private_Dirty", 0.0)}
+
+
+def _child(args) -> None:
+    """One worker process: load the voices, wait for the others, then measure."""
+    if args.mode == "default":
+        from piper import PiperVoice
+
+        def load(path):
+            return PiperVoice.load(path, config_path=f"{path}.json")
+
+    else:
+        from src.common.onnx_sessions import load_piper_voice
+
+        def load(path):
+            return load_piper_voice(path)
+
+    base = _memory_mb()
+    voices, loads = [], []
+    for path in args.voices:
+        started = time.perf_counter()
+        voices.append(load(path))
+        loads.append({"voice": os.path.basename(path), "load_ms": (time.perf_counter() - started) * 1000, "memory": _memory_mb()})
+    if args.prepare:
+        print(json.dumps({"loads": loads}), flush=True)
+        return
+    print("loaded", flush=True)
+    sys.stdin.readline()
+    # Every worker has its voices mapped now, so shared pages are split in PSS
+    loaded = _memory_mb()
+
+    latencies = {os.path.basename(p): [] for p in args.voices}
+    lock = threading.Lock()
+
+    def synth(index: int) -> None:
+        voice = voices[index % len(voices)]
+        started = time.perf_counter()
+        for _ in voice.synthesize(args.text):
+            pass
+        with lock:
+            latencies[os.path.basename(args.voices[index % len(voices)])].append((time.perf_counter() - started) * 1000)
+
+    for i in range(len(voices)):
+        synth(i)  # first run allocates buffers; not measured
+    for values in latencies.values():
+        values.clear()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(synth, range(len(voices) * args.runs)))
+    wall = time.perf_counter() - started
+    print(json.dumps({"base": base, "loads": loads, "loaded": loaded, "latencies": latencies, "wall": wall, "threads": len(os.listdir("/proc/self/task"))}), flush=True)
+
+
+def _spawn(args, mode: str, env: dict, prepare: bool = False) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "benchmarks.bench_piper_sessions", "--child", "--mode", mode, "--text", args.text, "--runs", str(args.runs), "--concurrency", str(args.concurrency), *args.voices]
+    if prepare:
+        cmd.append("--prepare")
+    return subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+
+def _run_mode(args, mode: str, cache_dir: str) -> list[dict]:
+    env = dict(os.environ, ONNX_OPTIMIZED_CACHE=os.path.join(cache_dir, mode), **MODES[mode])
+    if mode != "default":
+        prep = _spawn(args, mode, env, prepare=True)
+        out, _ = prep.communicate()
+        cold = json.loads(out.strip().splitlines()[-1])["loads"]
+        print(f"  {mode}: first load (optimize and cache): " + ", ".join(f"{l['voice']} {l['load_ms']:.0f} ms" for l in cold))
+    procs = [_spawn(args, mode, env) for _ in range(args.workers)]
+    for proc in procs:
+        while proc.stdout.readline().strip() != "loaded":
+            if proc.poll() is not None:
+                raise SystemExit(f"{mode}: worker exited with {proc.returncode}")
+    for proc in procs:
+        proc.stdin.write("go\n")
+        proc.stdin.flush()
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def _report(mode: str, results: list[dict], voices: int) -> None:
+    first = results[0]
+    print(f"\n{mode} ({len(results)} worker(s), {first['threads']} threads each)")
+    print(f"  {'voice':<32} {'load ms':>8} {'+RSS MiB':>9}")
+    previous = first["base"]
+    for load in first["loads"]:
+        print(f"  {load['voice']:<32} {load['load_ms']:>8.0f} {load['memory']['rss'] - previous['rss']:>9.1f}")
+        previous = load["memory"]
+    rss = statistics.mean(r["loaded"]["rss"] - r["base"]["rss"] for r in results)
+    pss = statistics.mean(r["loaded"]["pss"] - r["base"]["pss"] for r in results)
+    private = statistics.mean(r["loaded"]["private"] - r["base"]["private"] for r in results)
+    print(f"  per worker for {voices} voice(s): RSS {rss:.1f} MiB, PSS {pss:.1f} MiB, private {private:.1f} MiB; host total PSS {pss * len(results):.1f} MiB")
+    samples = [v for r in results for values in r["latencies"].values() for v in values]
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    synth_per_s = sum(len(values) for r in results for values in r["latencies"].values()) / max(r["wall"] for r in results)
+    print(f"  synthesis: p50 {statistics.median(samples):.0f} ms, p95 {p95:.0f} ms, {synth_per_s:.1f} requests/s across workers")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("voices", nargs="+", help="Piper .onnx voices (config next to each as <voice>.onnx.json)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--workers", type=int, default=2, help="processes per mode, run at the same time")
+    parser.add_argument("--concurrency", type=int, default=4, help="synthesis threads per worker")
+    parser.add_argument("--runs", type=int, default=5, help="measured syntheses per voice per worker")
+    parser.add_argument("--text", default=DEFAULT_TEXT)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="tuned", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args)
+        return
+
+    cache_dir = tempfile.mkdtemp(prefix="bench-onnx-")
+    try:
+        print(f"{len(args.voices)} voice(s), {args.workers} worker(s), {args.concurrency} synthesis thread(s) each, {os.cpu_count()} cores")
+        for mode in args.modes:
+            _report(mode, _run_mode(args, mode, cache_dir), len(args.voices))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
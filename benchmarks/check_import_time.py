@@ -0,0 +1,118 @@
+"""
+Import-time budgets for the service entry points.
+
+    python -m benchmarks.check_import_time
+    python -m benchmarks.check_import_time --check            # exit 1 on a violation (for CI)
+    python -m benchmarks.check_import_time --budget api.app=1500 --repeat 7
+
+Imports each entry module in a fresh interpreter with `python -X importtime`
+and reports its cumulative import time (the best of --repeat runs, so disk
+cache noise does not count) and the slowest imports under it. Two things
+count as violations:
+
+  heavy    the import graph contains an ML runtime (torch, transformers,
+           parler_tts, piper, onnxruntime, ...). These must load when their
+           engine is first used or preloaded, never when a service starts.
+           A heavy module that is not installed still counts when the entry
+           module fails on it.
+  budget   the cumulative time exceeds the module's budget in milliseconds.
+  import   the entry module fails to import, for instance because one of its
+           (light) dependencies is not installed, so nothing was measured.
+
+tests/test_import_time.py runs the same checks under pytest, skipping (and
+saying so) entry modules whose declared dependencies are not installed.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+BUDGETS_MS = {
+    "src.streaming.h3_server": 600,
+    "src.gateway.main": 1000,
+    "api.app": 1200,
+    "src.bench.runner": 400,
+}
+
+HEAVY = ("torch", "torchaudio", "transformers", "parler_tts", "piper", "onnxruntime", "TTS", "numpy", "soundfile", "librosa", "huggingface_hub")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+_MISSING = re.compile(r"ModuleNotFoundError: No module named '([^']+)'")
+
+
+def measure(module: str) -> dict:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            imports.append({"name": m.group(4), "self_us": int(m.group(1)), "cumulative_us": int(m.group(2)), "depth": len(m.group(3)) // 2})
+    missing = _MISSING.search(proc.stderr)
+    top = next((i for i in imports if i["name"] == module and i["depth"] == 0), None)
+    return {
+        "ok": proc.returncode == 0,
+        "missing": missing.group(1) if missing else None,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode and proc.stderr.strip() else None,
+        "ms": top["cumulative_us"] / 1000 if top else None,
+        "imports": imports,
+    }
+
+
+def _heavy(name: str) -> bool:
+    return name.split(".")[0] in HEAVY
+
+
+def best_of(module: str, repeat: int) -> dict:
+    """The fastest of `repeat` measurements, so disk cache noise does not count."""
+    runs = [measure(module) for _ in range(max(1, repeat))]
+    return min((r for r in runs if r["ms"] is not None), key=lambda r: r["ms"], default=runs[0])
+
+
+def heavy_imports(result: dict) -> list[str]:
+    """ML runtimes in a measured import graph, counting a missing one the import failed on."""
+    heavy = sorted({i["name"].split(".")[0] for i in result["imports"] if _heavy(i["name"])})
+    if result["missing"] and _heavy(result["missing"]) and result["missing"].split(".")[0] not in heavy:
+        heavy.append(result["missing"].split(".")[0])
+    return heavy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help="entry modules (default: all with a budget)")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="override or add a budget")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="slowest nested imports to list per module")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any module fails to import, breaks its budget or imports a heavy runtime")
+    args = parser.parse_args()
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        name, _, ms = item.partition("=")
+        budgets[name] = float(ms)
+
+    violations = []
+    for module in args.modules or list(budgets):
+        result = best_of(module, args.repeat)
+        heavy = heavy_imports(result)
+        if heavy:
+            violations.append(f"{module}: imports {', '.join(heavy)} at startup")
+        if not result["ok"]:
+            print(f"{module:<28} not measured: {result['error']}")
+            violations.append(f"{module}: import failed, not measured ({result['error']})")
+            continue
+        budget = budgets.get(module)
+        over = budget is not None and result["ms"] > budget
+        if over:
+            violations.append(f"{module}: {result['ms']:.0f} ms > budget {budget:.0f} ms")
+        print(f"{module:<28} {result['ms']:>8.1f} ms  budget {budget if budget is not None else '-':>6}  {'OVER' if over else 'ok'}")
+        nested = sorted((i for i in result["imports"] if i["depth"] > 0), key=lambda i: i["cumulative_us"], reverse=True)
+        for item in nested[: args.top]:
+            print(f"    {item['cumulative_us'] / 1000:>8.1f} ms  {'  ' * (item['depth'] - 1)}{item['name']}")
+
+    for violation in violations:
+        print(f"[import-time] {violation}")
+    if args.check and violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
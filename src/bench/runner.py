@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import collections
+import json
+import platform
+import random
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src.bench.targets import EngineTarget, HttpTarget, Sample, StubTarget
+from src.bench.workload import BenchRequest, load_workload, schedule
+
+DEFAULT_URLS = {"api": "http://localhost:8000", "gateway": "http://localhost:8000", "engine": "https://localhost:9443"}
+
+# Metrics compared against a baseline: (path in the summary, True if higher is better)
+COMPARED = [
+    ("throughput_rps", True),
+    ("rtf", True),
+    ("error_rate", False),
+    ("ttfb_ms.p50", False),
+    ("ttfb_ms.p99", False),
+    ("latency_ms.p50", False),
+    ("latency_ms.p99", False),
+]
+
+
+async def closed_loop(target, requests: Iterator[BenchRequest], concurrency: int, deadline: Optional[float], origin: float) -> list[Sample]:
+    """`concurrency` clients, each sending its next request as soon as the previous one finishes."""
+    samples: list[Sample] = []
+
+    async def client() -> None:
+        while deadline is None or time.perf_counter() < deadline:
+            req = next(requests, None)
+            if req is None:
+                return
+            samples.append(await target.send(req, origin))
+
+    await asyncio.gather(*(client() for _ in range(max(1, concurrency))))
+    return samples
+
+
+async def open_loop(target, requests: Iterator[BenchRequest], rate: float, deadline: Optional[float], origin: float, seed: int) -> list[Sample]:
+    """
+    Poisson arrivals at `rate` requests/s, independent of how fast responses
+    come back, so queueing delay under overload shows up in the latencies
+    instead of silently lowering the offered load.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    next_at = time.perf_counter()
+    for req in requests:
+        next_at += rng.expovariate(rate)
+        if deadline is not None and next_at >= deadline:
+            break
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(target.send(req, origin)))
+    return list(await asyncio.gather(*tasks))
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def _pct(p: float) -> float:
+        idx = min(len(values) - 1, int(round(p * (len(values) - 1))))
+        return round(values[idx] * 1000, 2)
+
+    return {
+        "p50": _pct(0.50),
+        "p90": _pct(0.90),
+        "p99": _pct(0.99),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(values[-1] * 1000, 2),
+    }
+
+
+def summarize(samples: list[Sample], wall_seconds: float) -> dict:
+    ok = [s for s in samples if s.ok]
+    audio = sum(s.audio_seconds for s in ok)
+    errors = collections.Counter(s.error for s in samples if not s.ok)
+    out = {
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+        "errors_by_type": dict(errors),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(ok) / wall_seconds, 3) if wall_seconds else 0.0,
+        "ttfb_ms": _percentiles([s.ttfb_s for s in ok]),
+        "latency_ms": _percentiles([s.total_s for s in ok]),
+        "audio_seconds": round(audio, 3),
+        # Audio seconds produced (or transcribed) per wall-clock second across all clients
+        "rtf": round(audio / wall_seconds, 3) if wall_seconds else 0.0,
+        "bytes": sum(s.bytes for s in ok),
+    }
+    per_request = sorted(s.audio_seconds / s.total_s for s in ok if s.audio_seconds and s.total_s)
+    if per_request:
+        out["request_rtf_p50"] = round(per_request[len(per_request) // 2], 3)
+    kinds = sorted({s.kind for s in samples})
+    if len(kinds) > 1:
+        out["by_kind"] = {k: summarize([s for s in samples if s.kind == k], wall_seconds) for k in kinds}
+    return out
+
+
+def _lookup(summary: dict, path: str):
+    value = summary
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Print metric deltas against a baseline result; return the metrics that regressed beyond `max_regression` %."""
+    regressed = []
+    print(f"{'metric':<16} {'baseline':>12} {'current':>12} {'change':>9}")
+    for path, higher_is_better in COMPARED:
+        old, new = _lookup(baseline["summary"], path), _lookup(current["summary"], path)
+        if old is None or new is None:
+            continue
+        change = ((new - old) / old * 100) if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > max_regression:
+            flag = "  REGRESSED"
+            regressed.append(path)
+        print(f"{path:<16} {old:>12} {new:>12} {change:>+8.1f}%{flag}")
+    return regressed
+
+
+def _build_target(args):
+    if args.target == "stub":
+        return StubTarget(
+            ttfb_ms=args.stub_ttfb_ms, rtf=args.stub_rtf, capacity=args.stub_capacity, error_rate=args.stub_error_rate, seed=args.seed
+        )
+    url = args.url or DEFAULT_URLS[args.target]
+    if args.target == "engine":
+        return EngineTarget(url, insecure=not args.verify_tls)
+    return HttpTarget(url, token=args.token)
+
+
+async def _main(args) -> dict:
+    defaults = {"tts_model": args.tts_model, "voice": args.voice, "stt_model": args.stt_model, "stream": args.stream}
+    workload = load_workload(args.workload, defaults, max_text_chars=args.max_text_chars)
+    count = args.requests or (len(workload) if args.duration is None else None)
+    target = _build_target(args)
+    try:
+        for req in schedule(workload, args.warmup, shuffle=args.shuffle, seed=args.seed):
+            await target.send(req, time.perf_counter())
+        requests = schedule(workload, count, shuffle=args.shuffle, seed=args.seed)
+        origin = time.perf_counter()
+        deadline = origin + args.duration if args.duration else None
+        if args.mode == "open":
+            samples = await open_loop(target, requests, args.rate, deadline, origin, args.seed)
+        else:
+            samples = await closed_loop(target, requests, args.concurrency, deadline, origin)
+        wall = time.perf_counter() - origin
+    finally:
+        await target.close()
+    result = {
+        "config": {
+            "workload": str(args.workload),
+            "target": args.target,
+            "url": args.url or DEFAULT_URLS.get(args.target),
+            "mode": args.mode,
+            "concurrency": args.concurrency if args.mode == "closed" else None,
+            "rate": args.rate if args.mode == "open" else None,
+            "requests": len(samples),
+            "duration": args.duration,
+            "stream": args.stream,
+            "seed": args.seed,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "time": time.time()},
+        "summary": summarize(samples, wall),
+    }
+    if args.per_request:
+        result["samples"] = [asdict(s) for s in samples]
+    return result
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        prog="shabda-bench",
+        description="Replay a JSONL request file against the API, the gateway or the QUIC engine and report latency and throughput.",
+    )
+    parser.add_argument("workload", type=Path, nargs="?", default=Path("benchmarks/workload.jsonl"), help="JSONL request file")
+    parser.add_argument("--target", choices=["api", "gateway", "engine", "stub"], default="gateway")
+    parser.add_argument("--url", help="base URL (defaults: api/gateway http://localhost:8000, engine https://localhost:9443)")
+    parser.add_argument("--token", help="bearer token for the API/gateway")
+    parser.add_argument("--verify-tls", action="store_true", help="verify the engine's certificate")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="closed: fixed concurrency; open: Poisson arrivals")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="open-loop arrival rate, requests/s")
+    parser.add_argument("--requests", type=int, default=0, help="requests to send (default: one pass over the workload)")
+    parser.add_argument("--duration", type=float, default=None, help="stop sending after this many seconds")
+    parser.add_argument("--warmup", type=int, default=0, help="requests sent before measuring")
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stream", action="store_true", help="ask for segmented streaming speech")
+    parser.add_argument("--tts-model", default="piper-tts", help="model for speech lines that name none")
+    parser.add_argument("--voice", default=None, help="voice for speech lines that name none")
+    parser.add_argument("--stt-model", default="whisper-1", help="model for transcription lines that name none")
+    parser.add_argument("--max-text-chars", type=int, default=0, help="truncate speech texts (0: no limit)")
+    parser.add_argument("--output", type=Path, help="write the result JSON here")
+    parser.add_argument("--per-request", action="store_true", help="include every request's timings in the JSON")
+    parser.add_argument("--compare", type=Path, help="baseline result JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="percent change that counts as a regression")
+    parser.add_argument("--stub-ttfb-ms", type=float, default=80.0)
+    parser.add_argument("--stub-rtf", type=float, default=20.0, help="stub audio seconds per second of work")
+    parser.add_argument("--stub-capacity", type=int, default=4, help="requests the stub serves at once")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.mode == "open" and args.rate <= 0:
+        parser.error("--rate must be positive in open mode")
+
+    result = asyncio.run(_main(args))
+    summary = result["summary"]
+    text = json.dumps(result, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text)
+        print(f"[bench] wrote {args.output}")
+    print(json.dumps(summary, indent=2))
+    if args.compare:
+        regressed = compare(result, json.loads(args.compare.read_text()), args.max_regression)
+        if regressed:
+            print(f"[bench] regressions: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src.bench.workload import BenchRequest, wav_layout
+from src.common.audio import wav_header
+
+
+@dataclass
+class Sample:
+    """Outcome of one request."""
+
+    id: str
+    kind: str
+    ok: bool
+    status: int
+    started: float  # seconds since the run started
+    ttfb_s: float
+    total_s: float
+    audio_seconds: float
+    bytes: int
+    error: str = ""
+
+
+def audio_seconds(content_type: str, head: bytes, total: int) -> float:
+    """Seconds of audio in a speech response from its content type, first bytes and length."""
+    ctype = (content_type or "").lower()
+    if ctype.startswith("audio/l16"):
+        rate = re.search(r"rate=(\d+)", ctype)
+        channels = re.search(r"channels=(\d+)", ctype)
+        byte_rate = int(rate.group(1) if rate else 16000) * int(channels.group(1) if channels else 1) * 2
+        return total / byte_rate
+    byte_rate, offset, _ = wav_layout(head)
+    if byte_rate and offset:
+        return max(0, total - offset) / byte_rate
+    return 0.0
+
+
+class _Timer:
+    def __init__(self, origin: float):
+        self.origin = origin
+        self.t0 = time.perf_counter()
+        self.first: Optional[float] = None
+        self.head = bytearray()
+        self.total = 0
+
+    def chunk(self, data: bytes) -> None:
+        if self.first is None and data:
+            self.first = time.perf_counter()
+        if len(self.head) < 256:
+            self.head.extend(data[: 256 - len(self.head)])
+        self.total += len(data)
+
+    def sample(self, req: BenchRequest, status: int, content_type: str, error: str = "") -> Sample:
+        end = time.perf_counter()
+        ok = 200 <= status < 300 and not error
+        if req.kind == "transcription":
+            seconds = req.audio_seconds if ok else 0.0
+        else:
+            seconds = audio_seconds(content_type, bytes(self.head), self.total) if ok else 0.0
+        return Sample(
+            id=req.id,
+            kind=req.kind,
+            ok=ok,
+            status=status,
+            started=self.t0 - self.origin,
+            ttfb_s=((self.first or end) - self.t0),
+            total_s=end - self.t0,
+            audio_seconds=seconds,
+            bytes=self.total,
+            error=error or ("" if ok else f"http {status}"),
+        )
+
+
+class HttpTarget:
+    """The FastAPI app (api/app.py) or the gateway, over HTTP/1.1."""
+
+    def __init__(self, base_url: str, token: Optional[str] = None, timeout: float = 300.0):
+        import httpx
+
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+        self.client = httpx.AsyncClient(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout, limits=limits)
+
+    async def send(self, req: BenchRequest, origin: float) -> Sample:
+        timer = _Timer(origin)
+        try:
+            if req.kind == "transcription":
+                data = {k: v for k, v in req.body.items() if v}
+                files = {"file": ("audio.wav", req.audio or b"", "audio/wav")}
+                stream = self.client.stream("POST", "/v1/audio/transcriptions", data=data, files=files)
+            else:
+                stream = self.client.stream("POST", "/v1/audio/speech", json=req.body)
+            async with stream as resp:
+                async for chunk in resp.aiter_bytes():
+                    timer.chunk(chunk)
+                return timer.sample(req, resp.status_code, resp.headers.get("content-type", ""))
+        except Exception as exc:
+            return timer.sample(req, 0, "", error=type(exc).__name__)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class EngineTarget:
+    """The QUIC engine directly, over pooled HTTP/3 connections."""
+
+    def __init__(self, base_url: str, insecure: bool = True, connections: int = 4):
+        import ssl
+
+        from aioquic.h3.connection import H3_ALPN
+        from aioquic.quic.configuration import QuicConfiguration
+
+        from src.gateway.quic_pool import QuicConnectionPool
+
+        host_port = base_url.split("://", 1)[-1].split("/", 1)[0]
+        host, _, port = host_port.rpartition(":") if ":" in host_port else (host_port, "", "443")
+        cfg = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN)
+        if insecure:
+            cfg.verify_mode = ssl.CERT_NONE
+        self.pool = QuicConnectionPool(host, int(port), configuration=cfg, size=connections, keepalive_seconds=0)
+
+    async def send(self, req: BenchRequest, origin: float) -> Sample:
+        timer = _Timer(origin)
+        if req.kind == "transcription":
+            path = "/v1/stream/audio/transcriptions"
+            headers = [(b"content-type", b"audio/wav"), (b"x-model", str(req.body.get("model") or "whisper-1").encode())]
+            if req.body.get("language"):
+                headers.append((b"x-language", str(req.body["language"]).encode()))
+            body = req.audio or b""
+        else:
+            path = "/v1/stream/audio/speech"
+            headers = [(b"content-type", b"application/json")]
+            body = json.dumps(req.body).encode()
+        try:
+            slot, stream_id, resp = await self.pool.request("POST", path, headers=headers, body=body)
+        except ConnectionError as exc:
+            return timer.sample(req, 0, "", error=type(exc).__name__)
+        try:
+            await resp.wait_headers(timeout=300)
+            async for chunk in resp.iter_body(timeout=300):
+                timer.chunk(chunk)
+            ctype = (resp.header(b"content-type") or b"").decode()
+            return timer.sample(req, resp.status, ctype)
+        except Exception as exc:
+            if slot.proto is not None:
+                slot.proto.cancel(stream_id)
+            return timer.sample(req, resp.status, "", error=type(exc).__name__)
+        finally:
+            self.pool.release(slot)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+class StubTarget:
+    """
+    Offline stand-in for an engine: `capacity` requests are served at once,
+    speech produces `chars_per_second` characters of text per second of audio
+    at real-time factor `rtf`, and `error_rate` of requests fail. Lets the
+    harness (and its reports) run without models, binaries or a network.
+    """
+
+    def __init__(self, ttfb_ms: float = 80.0, rtf: float = 20.0, capacity: int = 4, error_rate: float = 0.0,
+                 chars_per_second: float = 15.0, sample_rate: int = 22050, seed: int = 0):
+        self.ttfb = ttfb_ms / 1000
+        self.rtf = max(0.01, rtf)
+        self.slots = asyncio.Semaphore(max(1, capacity))
+        self.error_rate = error_rate
+        self.chars_per_second = chars_per_second
+        self.sample_rate = sample_rate
+        self.rng = random.Random(seed)
+
+    async def send(self, req: BenchRequest, origin: float) -> Sample:
+        timer = _Timer(origin)
+        async with self.slots:
+            if req.kind == "transcription":
+                seconds = req.audio_seconds or 5.0
+                await asyncio.sleep(self.ttfb + seconds / self.rtf)
+                timer.chunk(json.dumps({"text": "stub"}).encode())
+                ctype = "application/json"
+            else:
+                seconds = len(str(req.body.get("text", ""))) / self.chars_per_second
+                work = seconds / self.rtf
+                pcm_bytes = int(self.sample_rate * seconds) * 2
+                if req.body.get("stream"):
+                    # Segments are sent as they finish: first audio after roughly the first sentence
+                    first = min(work, 0.1 * work + 0.02)
+                    await asyncio.sleep(self.ttfb + first)
+                    timer.chunk(wav_header(self.sample_rate) + b"\x00" * (pcm_bytes // 20 * 2))
+                    await asyncio.sleep(work - first)
+                    timer.chunk(b"\x00" * (pcm_bytes - pcm_bytes // 20 * 2))
+                else:
+                    await asyncio.sleep(self.ttfb + work)
+                    timer.chunk(wav_header(self.sample_rate, data_bytes=pcm_bytes) + b"\x00" * pcm_bytes)
+                ctype = "audio/wav"
+            if self.rng.random() < self.error_rate:
+                return timer.sample(req, 503, ctype)
+            return timer.sample(req, 200, ctype)
+
+    async def close(self) -> None:
+        return None
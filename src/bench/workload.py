@@ -0,0 +1,114 @@
+import base64
+import itertools
+import json
+import random
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+@dataclass
+class BenchRequest:
+    """One replayable request: a speech synthesis (`text`) or a transcription (`audio`)."""
+
+    kind: str  # "speech" | "transcription"
+    body: dict = field(default_factory=dict)
+    audio: Optional[bytes] = None
+    audio_seconds: float = 0.0  # duration of the uploaded audio, for transcription RTF
+    id: str = ""
+
+
+def wav_layout(head: bytes) -> tuple[int, int, int]:
+    """(byte_rate, offset of the first sample, declared data size) of a WAV stream; zeros if it is not one."""
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return 0, 0, 0
+    pos, byte_rate = 12, 0
+    while pos + 8 <= len(head):
+        chunk, size = head[pos:pos + 4], struct.unpack_from("<I", head, pos + 4)[0]
+        if chunk == b"fmt " and pos + 20 <= len(head):
+            byte_rate = struct.unpack_from("<I", head, pos + 16)[0]
+        elif chunk == b"data":
+            return byte_rate, pos + 8, size
+        pos += 8 + size + (size & 1)
+    return byte_rate, 0, 0
+
+
+def wav_seconds(blob: bytes) -> float:
+    byte_rate, offset, size = wav_layout(blob)
+    if not byte_rate or not offset:
+        return 0.0
+    return min(size, len(blob) - offset) / byte_rate
+
+
+def _from_line(obj: dict, line_no: int, defaults: dict, base_dir: Path) -> Optional[BenchRequest]:
+    kind = obj.get("kind")
+    req_id = str(obj.get("id") or obj.get("request_id") or f"line-{line_no}")
+    if kind == "transcription":
+        if obj.get("audio_b64"):
+            audio = base64.b64decode(obj["audio_b64"])
+        elif obj.get("audio"):
+            path = Path(obj["audio"])
+            audio = (path if path.is_absolute() else base_dir / path).read_bytes()
+        else:
+            raise ValueError(f"line {line_no}: transcription needs 'audio' (path) or 'audio_b64'")
+        body = {"model": obj.get("model") or defaults.get("stt_model"), "language": obj.get("language")}
+        return BenchRequest("transcription", body, audio, wav_seconds(audio), req_id)
+    if kind in (None, "speech"):
+        body = dict(obj.get("body") if isinstance(obj.get("body"), dict) else {})
+        if "text" in obj:
+            body["text"] = obj["text"]
+        elif kind is None and isinstance(obj.get("body"), str):
+            # Free-form records (e.g. a backlog of titled notes) become speech prompts
+            body["text"] = " ".join(str(obj.get(k, "")) for k in ("title", "body")).strip()
+        if not str(body.get("text", "")).strip():
+            return None
+        for key in ("model", "voice", "stream", "response_format", "language", "description"):
+            if key in obj:
+                body[key] = obj[key]
+        body.setdefault("model", defaults.get("tts_model"))
+        if defaults.get("voice") and "voice" not in body:
+            body["voice"] = defaults["voice"]
+        if defaults.get("stream") and "stream" not in body:
+            body["stream"] = True
+        return BenchRequest("speech", body, id=req_id)
+    raise ValueError(f"line {line_no}: unknown kind {kind!r}")
+
+
+def load_workload(path: Path, defaults: Optional[dict] = None, max_text_chars: int = 0) -> list[BenchRequest]:
+    """
+    Read a JSONL request file. Each line is one of:
+
+      {"kind": "speech", "text": "...", "model": "...", "voice": "...", "stream": true}
+      {"kind": "speech", "body": {...}}            # body sent as is
+      {"kind": "transcription", "audio": "clip.wav", "model": "ggml-base.en.bin"}
+      {"title": "...", "body": "..."}              # any record with text: spoken as is
+
+    A `"weight": n` field repeats the line n times. Relative audio paths resolve
+    against the workload file. Missing model/voice fields take `defaults`.
+    """
+    defaults = defaults or {}
+    path = Path(path)
+    out: list[BenchRequest] = []
+    for line_no, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        obj = json.loads(line)
+        req = _from_line(obj, line_no, defaults, path.parent)
+        if req is None:
+            continue
+        if max_text_chars and "text" in req.body:
+            req.body["text"] = req.body["text"][:max_text_chars]
+        out.extend([req] * max(1, int(obj.get("weight", 1))))
+    if not out:
+        raise ValueError(f"{path}: no requests")
+    return out
+
+
+def schedule(requests: list[BenchRequest], count: Optional[int], shuffle: bool, seed: int) -> Iterator[BenchRequest]:
+    """`count` requests (endless with None) cycling through the workload, optionally shuffled reproducibly."""
+    order = list(requests)
+    if shuffle:
+        random.Random(seed).shuffle(order)
+    return itertools.islice(itertools.cycle(order), count)
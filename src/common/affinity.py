@@ -0,0 +1,30 @@
+import hashlib
+from typing import Sequence
+
+
+def _score(key: str, node: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{node}|{key}".encode(), digest_size=8).digest(), "big")
+
+
+def rendezvous_order(key: str, nodes: Sequence[str]) -> list[str]:
+    """
+    Nodes ordered by preference for `key` (highest-random-weight hashing).
+
+    Every caller that sees the same node names agrees on the order, and removing
+    a node only moves the keys that preferred it, so a model keeps landing on the
+    process (or backend) that already has it loaded.
+    """
+    return sorted(nodes, key=lambda node: _score(key, node), reverse=True)
+
+
+def rendezvous_pick(key: str, nodes: Sequence[str]) -> str:
+    if not nodes:
+        raise ValueError("no nodes to pick from")
+    return max(nodes, key=lambda node: _score(key, node))
+
+
+def worker_for(model: str, workers: int) -> int:
+    """Index of the engine worker process that owns `model` among `workers` processes."""
+    if workers <= 1:
+        return 0
+    return int(rendezvous_pick(model, [str(i) for i in range(workers)]))
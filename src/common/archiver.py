@@ -0,0 +1,219 @@
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+from .config import (
+    audio_archive_enabled,
+    audio_archive_max_bytes,
+    audio_archive_queue_size,
+    audio_archive_retention_seconds,
+    audio_archive_sample_rate,
+    audio_root,
+)
+
+# file suffix (e.g. ".wav", ".txt") -> content, or a file to take over
+ArchiveFiles = dict[str, Union[bytes, str, Path]]
+
+
+class AudioArchiver:
+    """
+    Background archival of request audio under `audio_root()/<kind>/`.
+
+    `submit` never touches the disk for content: records go on a bounded queue
+    and a daemon writer thread persists them, dropping records when the queue
+    is full rather than slowing requests down. File inputs are hard-linked into
+    a staging directory at submit time so the caller may delete its copy.
+    Every record gets a unique id; rotation removes files older than the
+    retention period and the oldest files once the archive exceeds its byte budget.
+    """
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        enabled: bool | None = None,
+        sample_rate: float | None = None,
+        queue_size: int | None = None,
+        retention_seconds: int | None = None,
+        max_bytes: int | None = None,
+        rotate_every: float = 60.0,
+    ):
+        self._root = root
+        self.enabled = audio_archive_enabled() if enabled is None else enabled
+        self.sample_rate = audio_archive_sample_rate() if sample_rate is None else sample_rate
+        self.retention_seconds = audio_archive_retention_seconds() if retention_seconds is None else retention_seconds
+        self.max_bytes = audio_archive_max_bytes() if max_bytes is None else max_bytes
+        self.rotate_every = rotate_every
+        self._queue: "queue.Queue[Optional[tuple[str, str, ArchiveFiles]]]" = queue.Queue(
+            maxsize=queue_size or audio_archive_queue_size()
+        )
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_rotate = 0.0
+        self.submitted = 0
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rotated = 0
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = audio_root()
+        return self._root
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audio-archiver", daemon=True)
+                self._thread.start()
+
+    def _stage(self, path: Path) -> Optional[Path]:
+        # A hard link is a metadata-only operation; it keeps the data alive after the caller unlinks it
+        staging = self.root / ".staging"
+        staging.mkdir(parents=True, exist_ok=True)
+        staged = staging / uuid.uuid4().hex
+        try:
+            os.link(path, staged)
+        except OSError:
+            return None
+        return staged
+
+    def submit(self, kind: str, files: ArchiveFiles) -> Optional[str]:
+        """Queue files for archival; returns the record id, or None if the record was not kept."""
+        if not self.enabled:
+            return None
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return None
+        record_id = f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:12]}"
+        staged: ArchiveFiles = {}
+        for suffix, content in files.items():
+            if isinstance(content, Path):
+                linked = self._stage(content)
+                if linked is None:
+                    continue  # spool on another filesystem; copying here would block the request
+                staged[suffix] = linked
+            else:
+                staged[suffix] = content
+        if not staged:
+            self.dropped += 1
+            return None
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((kind, record_id, staged))
+        except queue.Full:
+            self.dropped += 1
+            self._discard(staged)
+            return None
+        self.submitted += 1
+        return record_id
+
+    @staticmethod
+    def _discard(files: ArchiveFiles) -> None:
+        for content in files.values():
+            if isinstance(content, Path):
+                content.unlink(missing_ok=True)
+
+    def _write(self, kind: str, record_id: str, files: ArchiveFiles) -> None:
+        out_dir = self.root / kind
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for suffix, content in files.items():
+            dest = out_dir / f"{kind}_{record_id}{suffix}"
+            if isinstance(content, Path):
+                os.replace(content, dest)
+            elif isinstance(content, str):
+                dest.write_text(content, encoding="utf-8")
+            else:
+                dest.write_bytes(content)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.rotate_every)
+            except queue.Empty:
+                item = False
+            if item is None:
+                self._queue.task_done()
+                return
+            if item:
+                kind, record_id, files = item
+                try:
+                    self._write(kind, record_id, files)
+                    self.written += 1
+                except Exception as exc:
+                    self.failed += 1
+                    self._discard(files)
+                    print(f"[archive] write failed for {kind}_{record_id}: {exc}")
+                finally:
+                    self._queue.task_done()
+            if time.monotonic() - self._last_rotate >= self.rotate_every:
+                self._last_rotate = time.monotonic()
+                try:
+                    self.rotate()
+                except Exception as exc:
+                    print(f"[archive] rotation failed: {exc}")
+
+    def rotate(self) -> None:
+        """Apply the retention period and byte budget across all archive kinds."""
+        now = time.time()
+        entries = []
+        total = 0
+        for kind_dir in self.root.iterdir():
+            if not kind_dir.is_dir() or kind_dir.name.startswith("."):
+                continue
+            if kind_dir.name == "cache":
+                continue  # owned by the audio cache
+            for path in kind_dir.rglob("*"):
+                if not path.is_file():
+                    continue
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                if self.retention_seconds and now - st.st_mtime > self.retention_seconds:
+                    path.unlink(missing_ok=True)
+                    self.rotated += 1
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if self.max_bytes and total > self.max_bytes:
+            entries.sort()
+            for _mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                self.rotated += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush queued records (up to `timeout`) and stop the writer."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "rotated": self.rotated,
+        }
+
+
+archiver = AudioArchiver()
@@ -0,0 +1,180 @@
+from array import array
+import struct
+from typing import Iterator, Union
+
+# Data size used when the total length is unknown (streaming); most players read until EOF
+STREAMING_WAV_SIZE = 0xFFFFFFFF
+
+
+def wav_header(sample_rate: int, channels: int = 1, sample_width: int = 2, data_bytes: int | None = None) -> bytes:
+    """
+    Return a 44-byte PCM WAV header.
+
+    Pass `data_bytes=None` for a streaming header whose RIFF/data sizes are
+    set to the 0xFFFFFFFF "unknown length" sentinel.
+    """
+    if data_bytes is None:
+        riff_size = STREAMING_WAV_SIZE
+        data_size = STREAMING_WAV_SIZE
+    else:
+        riff_size = 36 + data_bytes
+        data_size = data_bytes
+    byte_rate = sample_rate * channels * sample_width
+    block_align = channels * sample_width
+    return b"".join(
+        [
+            b"RIFF",
+            struct.pack("<I", riff_size),
+            b"WAVE",
+            b"fmt ",
+            struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, sample_width * 8),
+            b"data",
+            struct.pack("<I", data_size),
+        ]
+    )
+
+
+def parse_wav(blob: Union[bytes, bytearray, memoryview]) -> tuple[int, int, int, memoryview]:
+    """
+    (sample_rate, sample_width, channels, pcm) of a PCM WAV; `pcm` is a view
+    into `blob`, not a copy. Streaming sizes (0xFFFFFFFF) mean "to the end".
+    """
+    view = memoryview(blob)
+    if len(view) < 12 or view[:4] != b"RIFF" or view[8:12] != b"WAVE":
+        raise ValueError("not a RIFF/WAVE stream")
+    pos, fmt = 12, None
+    while pos + 8 <= len(view):
+        chunk, size = bytes(view[pos:pos + 4]), struct.unpack_from("<I", view, pos + 4)[0]
+        if chunk == b"fmt ":
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", view, pos + 8)
+            if tag not in (1, 0xFFFE):
+                raise ValueError(f"unsupported WAV encoding {tag}")
+            fmt = (rate, bits // 8, channels)
+        elif chunk == b"data":
+            if fmt is None:
+                raise ValueError("WAV data before fmt chunk")
+            end = len(view) if size == STREAMING_WAV_SIZE else min(len(view), pos + 8 + size)
+            return fmt[0], fmt[1], fmt[2], view[pos + 8:end]
+        pos += 8 + size + (size & 1)
+    raise ValueError("WAV without data chunk")
+
+
+class WavBuffer:
+    """
+    PCM chunks kept as produced (referenced, not copied) behind one WAV header.
+
+    `views()` hands the header and chunks out as memoryviews for sending as
+    they are; `tobytes()` copies everything exactly once into a buffer sized
+    up front. Replaces join → numpy → soundfile → BytesIO → read pipelines.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, sample_width: int = 2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.chunks: list[memoryview] = []
+        self.nbytes = 0
+
+    def append(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        if data:
+            view = memoryview(data).cast("B")
+            self.chunks.append(view)
+            self.nbytes += len(view)
+
+    def __len__(self) -> int:
+        return self.nbytes
+
+    @property
+    def duration(self) -> float:
+        return self.nbytes / (self.sample_rate * self.channels * self.sample_width)
+
+    def header(self) -> bytes:
+        return wav_header(self.sample_rate, self.channels, self.sample_width, self.nbytes)
+
+    def views(self) -> Iterator[memoryview]:
+        yield memoryview(self.header())
+        yield from self.chunks
+
+    def tobytes(self) -> bytes:
+        # bytes.join sizes its result from the parts first: one allocation, one copy per chunk
+        return b"".join(self.views())
+
+
+def pcm_content_type(sample_rate: int, channels: int = 1) -> str:
+    # Piper emits little-endian samples; audio/L16 defaults to big-endian, so say so
+    return f"audio/L16; rate={sample_rate}; channels={channels}; endianness=little-endian"
+
+
+def silence(sample_rate: int, ms: float, channels: int = 1, sample_width: int = 2) -> bytes:
+    return b"\x00" * (int(sample_rate * ms / 1000) * channels * sample_width)
+
+
+class PcmJoiner:
+    """
+    Join independently synthesized s16le segments without clicks.
+
+    Each segment gets short linear fades at its edges; with `crossfade_ms` the
+    tail of one segment overlaps the head of the next, otherwise `gap_ms` of
+    silence separates them. `push` returns the bytes that can be emitted now
+    (a crossfade tail is held back until the next segment or `finish`).
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, gap_ms: float = 0.0, crossfade_ms: float = 0.0, fade_ms: float = 5.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame = 2 * channels
+        self.gap = silence(sample_rate, gap_ms, channels)
+        self.overlap = int(sample_rate * crossfade_ms / 1000)
+        self.fade = int(sample_rate * fade_ms / 1000)
+        self._tail: bytes = b""
+        self._first = True
+
+    def _faded(self, pcm: bytes, fade_in: bool, fade_out: bool) -> bytes:
+        samples = array("h", pcm)
+        frames = len(samples) // self.channels
+        n = min(self.fade, frames // 2)
+        if n <= 0:
+            return pcm
+        for i in range(n):
+            gain = i / n
+            for c in range(self.channels):
+                if fade_in:
+                    samples[i * self.channels + c] = int(samples[i * self.channels + c] * gain)
+                if fade_out:
+                    j = (frames - 1 - i) * self.channels + c
+                    samples[j] = int(samples[j] * gain)
+        return samples.tobytes()
+
+    def _mix(self, tail: bytes, head: bytes) -> bytes:
+        a, b = array("h", tail), array("h", head)
+        n = min(len(a), len(b))
+        frames = max(1, n // self.channels)
+        out = array("h", bytes(n * 2))
+        for i in range(n):
+            w = (i // self.channels) / frames
+            out[i] = max(-32768, min(32767, int(a[i] * (1 - w) + b[i] * w)))
+        return out.tobytes()
+
+    def push(self, pcm: bytes) -> bytes:
+        pcm = pcm[: len(pcm) - len(pcm) % self.frame]
+        if not pcm:
+            return b""
+        if self.overlap <= 0:
+            out = pcm if self.fade <= 0 else self._faded(pcm, fade_in=not self._first, fade_out=True)
+            if not self._first:
+                out = self.gap + out
+            self._first = False
+            return out
+        split = max(0, len(pcm) - self.overlap * self.frame)
+        head_len = min(len(self._tail), len(pcm))
+        if self._tail:
+            body = self._mix(self._tail, pcm[:head_len]) + pcm[head_len:split]
+        else:
+            body = pcm[:split]
+        self._tail = pcm[max(split, head_len):]
+        self._first = False
+        return body
+
+    def finish(self) -> bytes:
+        tail, self._tail = self._tail, b""
+        return tail
@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from .config import (
+    audio_cache_disk_bytes,
+    audio_cache_enabled,
+    audio_cache_memory_bytes,
+    audio_cache_ttl_seconds,
+    audio_root,
+)
+from .metrics import cache_event
+
+# (audio bytes, content type)
+CachedAudio = tuple[bytes, str]
+
+
+class _LeaderGone(Exception):
+    """The request producing a coalesced entry was cancelled; a waiter should produce it."""
+
+
+def cache_key(model: str, voice_path: str | None, description: str | None, text: str, output_format: str) -> str:
+    """Content address for a synthesis request; every input that changes the audio is part of it."""
+    material = json.dumps(
+        [model or "", voice_path or "", description or "", text, output_format or "wav"],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Two-tier cache for synthesized audio.
+
+    Tier 1 is an in-memory LRU bounded by bytes. Tier 2 is a sharded on-disk
+    store (`<root>/ab/cd/<key>`) bounded by bytes and TTL; disk hits are
+    promoted to memory. `get_or_create` collapses concurrent identical
+    requests into one synthesis.
+    """
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        memory_bytes: int | None = None,
+        disk_bytes: int | None = None,
+        ttl_seconds: int | None = None,
+        enabled: bool | None = None,
+    ):
+        self._root = root
+        self.memory_bytes = memory_bytes if memory_bytes is not None else audio_cache_memory_bytes()
+        self.disk_bytes = disk_bytes if disk_bytes is not None else audio_cache_disk_bytes()
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else audio_cache_ttl_seconds()
+        self.enabled = audio_cache_enabled() if enabled is None else enabled
+        # key -> (item, stored at); the stamp is the original store time, also for promoted disk hits
+        self._memory: "OrderedDict[str, tuple[CachedAudio, float]]" = OrderedDict()
+        self._memory_used = 0
+        # key -> (size, stored at) in LRU order; built lazily from the disk tree
+        self._disk_index: "OrderedDict[str, tuple[int, float]] | None" = None
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Background disk writes, referenced until done
+        self._writes: set[asyncio.Task] = set()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "expired": 0,
+        }
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = audio_root() / "cache"
+        return self._root
+
+    # ---------------- memory tier ----------------
+
+    def _expired(self, stamp: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - stamp > self.ttl_seconds
+
+    def _memory_get(self, key: str) -> Optional[CachedAudio]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            item, stamp = entry
+            if self._expired(stamp):
+                del self._memory[key]
+                self._memory_used -= len(item[0])
+                self.counters["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return item
+
+    def _memory_put(self, key: str, item: CachedAudio, stamp: Optional[float] = None) -> None:
+        size = len(item[0])
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old[0][0])
+            self._memory[key] = (item, time.time() if stamp is None else stamp)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, (evicted, _stamp) = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted[0])
+                self.counters["memory_evictions"] += 1
+
+    # ---------------- disk tier ----------------
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    def _load_index(self) -> "OrderedDict[str, tuple[int, float]]":
+        if self._disk_index is not None:
+            return self._disk_index
+        entries = []
+        if self.root.exists():
+            for shard in self.root.iterdir():
+                if not shard.is_dir():
+                    continue
+                for sub in shard.iterdir():
+                    if not sub.is_dir():
+                        continue
+                    for entry in os.scandir(sub):
+                        if entry.is_file() and not entry.name.endswith(".tmp"):
+                            st = entry.stat()
+                            entries.append((entry.name, st.st_size, st.st_mtime))
+        entries.sort(key=lambda e: e[2])
+        self._disk_index = OrderedDict((name, (size, mtime)) for name, size, mtime in entries)
+        self._disk_used = sum(size for size, _ in self._disk_index.values())
+        return self._disk_index
+
+    def _disk_remove_locked(self, key: str) -> None:
+        index = self._load_index()
+        size, _ = index.pop(key, (0, 0.0))
+        self._disk_used -= size
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _disk_get(self, key: str) -> Optional[tuple[CachedAudio, float]]:
+        """The stored item and when it was stored."""
+        with self._lock:
+            index = self._load_index()
+            if key not in index:
+                return None
+            _, stamp = index[key]
+            if self._expired(stamp):
+                self._disk_remove_locked(key)
+                self.counters["expired"] += 1
+                return None
+        path = self._path(key)
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_remove_locked(key)
+            return None
+        content_type, _, data = raw.partition(b"\n")
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index.move_to_end(key)
+        return (data, content_type.decode()), stamp
+
+    def _disk_put(self, key: str, item: CachedAudio) -> None:
+        data, content_type = item
+        payload_size = len(data) + len(content_type) + 1
+        if payload_size > self.disk_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(content_type.encode() + b"\n")
+            f.write(data)
+        tmp.replace(path)
+        with self._lock:
+            index = self._load_index()
+            old = index.pop(key, None)
+            if old is not None:
+                self._disk_used -= old[0]
+            index[key] = (payload_size, time.time())
+            self._disk_used += payload_size
+            while self._disk_used > self.disk_bytes and index:
+                oldest = next(iter(index))
+                self._disk_remove_locked(oldest)
+                self.counters["disk_evictions"] += 1
+
+    # ---------------- public API ----------------
+
+    def get(self, key: str) -> Optional[CachedAudio]:
+        """Blocking lookup through both tiers."""
+        if not self.enabled:
+            return None
+        item = self._memory_get(key)
+        if item is not None:
+            self.counters["memory_hits"] += 1
+            cache_event("audio", True)
+            return item
+        found = self._disk_get(key)
+        if found is not None:
+            item, stamp = found
+            self.counters["disk_hits"] += 1
+            cache_event("audio", True)
+            # Promoted with its disk stamp, so it expires when the disk copy would
+            self._memory_put(key, item, stamp)
+            return item
+        cache_event("audio", False)
+        return None
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        """Blocking store into both tiers."""
+        if not self.enabled or not data:
+            return
+        item = (bytes(data), content_type)
+        self._memory_put(key, item)
+        try:
+            self._disk_put(key, item)
+        except OSError as exc:
+            print(f"[audio-cache] disk write failed for {key[:12]}: {exc}")
+
+    async def aget(self, key: str) -> Optional[CachedAudio]:
+        if not self.enabled:
+            return None
+        item = self._memory_get(key)
+        if item is not None:
+            self.counters["memory_hits"] += 1
+            cache_event("audio", True)
+            return item
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, data: bytes, content_type: str) -> None:
+        if self.enabled and data:
+            await asyncio.to_thread(self.put, key, data, content_type)
+
+    def put_background(self, key: str, data: bytes, content_type: str) -> None:
+        """Memory tier now, disk tier off the response path."""
+        if not self.enabled or not data:
+            return
+        item = (bytes(data), content_type)
+        self._memory_put(key, item)
+
+        def _disk():
+            try:
+                self._disk_put(key, item)
+            except OSError as exc:
+                print(f"[audio-cache] disk write failed for {key[:12]}: {exc}")
+
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(_disk))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def get_or_create(self, key: str, producer: Callable[[], Awaitable[CachedAudio]]) -> tuple[CachedAudio, bool]:
+        """
+        Return ((audio, content_type), hit). On a miss only the first caller
+        runs `producer`; identical concurrent requests await its result. If
+        that caller is cancelled (its client went away), one of the waiters
+        takes over and runs `producer` itself.
+        """
+        if not self.enabled:
+            return await producer(), False
+        item = await self.aget(key)
+        if item is not None:
+            return item, True
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending), True
+            except _LeaderGone:
+                continue
+        self.counters["misses"] += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            item = await producer()
+        except asyncio.CancelledError:
+            # Not future.cancel(): waiters would see that as their own cancellation
+            future.set_exception(_LeaderGone())
+            future.exception()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(item)
+            self.put_background(key, item[0], item[1])
+            return item, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "memory_limit_bytes": self.memory_bytes,
+                "disk_entries": len(self._disk_index) if self._disk_index is not None else None,
+                "disk_bytes": self._disk_used if self._disk_index is not None else None,
+                "disk_limit_bytes": self.disk_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                **self.counters,
+            }
+
+
+audio_cache = AudioCache()
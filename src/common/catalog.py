@@ -0,0 +1,313 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import catalog_poll_seconds, data_root, models_root
+
+# Top-level data directories that never contain models
+_SKIP_DIRS = {".cache", "audio", "tmp"}
+_INDEX_VERSION = 1
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def _piper_entry(onnx: Path) -> dict:
+    cfg = Path(str(onnx) + ".json")
+    meta = _read_json(cfg) if cfg.exists() else {}
+    language = meta.get("language") or {}
+    return {
+        "engine": "piper",
+        "path": str(onnx),
+        "config": str(cfg) if cfg.exists() else None,
+        "sample_rate": (meta.get("audio") or {}).get("sample_rate"),
+        "language": language.get("code") if isinstance(language, dict) else language,
+    }
+
+
+def _whisper_entry(model_file: Path) -> dict:
+    stem = model_file.stem
+    return {
+        "engine": "whisper_cpp",
+        "path": str(model_file),
+        "config": None,
+        "sample_rate": 16000,
+        "language": "en" if stem.endswith(".en") else None,
+    }
+
+
+def _hf_entry(model_dir: Path) -> dict:
+    cfg = _read_json(model_dir / "config.json")
+    model_type = str(cfg.get("model_type", ""))
+    is_parler = "parler" in model_type or "parler" in model_dir.as_posix().lower()
+    return {
+        "engine": "parler" if is_parler else "hf",
+        "path": str(model_dir),
+        "config": str(model_dir / "config.json"),
+        "sample_rate": (cfg.get("audio_encoder") or {}).get("sampling_rate") or cfg.get("sampling_rate"),
+        "language": None,
+    }
+
+
+def _scan_files(path: Path, files: list[str]) -> list[dict]:
+    names = set(files)
+    if "config.json" in names and (
+        "pytorch_model.bin" in names or any(f.endswith(".safetensors") for f in files) or "generation_config.json" in names
+    ):
+        # A Hugging Face snapshot; its weight files are not standalone models
+        return [_hf_entry(path)]
+    entries = []
+    for name in sorted(files):
+        if name.endswith(".onnx"):
+            entries.append(_piper_entry(path / name))
+        elif name.endswith(".gguf") or (name.endswith(".bin") and name.startswith("ggml")):
+            entries.append(_whisper_entry(path / name))
+    if not entries and "config.json" in names:
+        entries.append(_hf_entry(path))
+    return entries
+
+
+class ModelCatalog:
+    """
+    Index of every model and voice under the data directory.
+
+    The tree is scanned once, then refreshed by comparing directory mtimes:
+    only directories whose listing changed are re-read, so a refresh costs one
+    stat per directory. The index is persisted to `<data>/.cache/catalog.json`,
+    inside a directory the scan skips, so saving it never looks like a change;
+    a restart only re-checks mtimes. Lookups are dict hits against the in-memory
+    index; a miss triggers at most one rate-limited refresh so freshly
+    downloaded voices are found without waiting for the next poll. Hot paths
+    that only probe for a model pass `refresh_on_miss=False` and rely on the
+    poller instead.
+    """
+
+    def __init__(self, root: Path | None = None, index_path: Path | None = None, poll_seconds: int | None = None):
+        self._root = root
+        self._index_path = index_path
+        self.poll_seconds = catalog_poll_seconds() if poll_seconds is None else poll_seconds
+        self._lock = threading.Lock()
+        self._nodes: dict[str, dict] = {}
+        self._entries: list[dict] = []
+        self._by_path: dict[str, dict] = {}
+        self._by_name: dict[str, list[dict]] = {}
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.refreshes = 0
+        self.dirs_rescanned = 0
+        # mtimes moved without a listing change (e.g. a temp file came and went): persist, no reindex
+        self._dirty = False
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            self._root = data_root()
+        return self._root
+
+    @property
+    def index_path(self) -> Path:
+        if self._index_path is None:
+            self._index_path = self.root / ".cache" / "catalog.json"
+        return self._index_path
+
+    # ---- index maintenance ----
+
+    def _load(self) -> None:
+        raw = _read_json(self.index_path) if self.index_path.exists() else {}
+        if raw.get("version") == _INDEX_VERSION and raw.get("root") == str(self.root):
+            self._nodes = raw.get("dirs", {})
+
+    def _save(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        payload = {"version": _INDEX_VERSION, "root": str(self.root), "dirs": self._nodes}
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def _walk(self, path: Path, old: dict[str, dict], new: dict[str, dict], depth: int = 0) -> bool:
+        """Refresh `path` and its subtree into `new`; returns True if anything changed."""
+        key = str(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return key in old
+        node = old.get(key)
+        changed = False
+        if node is None or node.get("mtime") != mtime:
+            subdirs, files = [], []
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=True):
+                        if depth == 0 and entry.name in _SKIP_DIRS:
+                            continue
+                        subdirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=True):
+                        files.append(entry.name)
+            fresh = {"mtime": mtime, "subdirs": sorted(subdirs), "entries": _scan_files(path, files)}
+            self.dirs_rescanned += 1
+            changed = node is None or fresh["subdirs"] != node["subdirs"] or fresh["entries"] != node["entries"]
+            self._dirty = True
+            node = fresh
+        new[key] = node
+        for name in node["subdirs"]:
+            changed = self._walk(path / name, old, new, depth + 1) or changed
+        return changed
+
+    def _reindex(self) -> None:
+        entries, by_path, by_name = [], {}, {}
+        root = self.root
+        for node in self._nodes.values():
+            for entry in node["entries"]:
+                entry = dict(entry)
+                path = Path(entry["path"])
+                entry["id"] = path.relative_to(root).as_posix()
+                entries.append(entry)
+                by_path[entry["id"]] = entry
+                by_name.setdefault(path.name, []).append(entry)
+        entries.sort(key=lambda e: e["id"])
+        for bucket in by_name.values():
+            bucket.sort(key=lambda e: e["id"])
+        self._entries, self._by_path, self._by_name = entries, by_path, by_name
+
+    def refresh(self) -> bool:
+        """Bring the index up to date with the filesystem; returns True if it changed."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+                self._reindex()
+            new: dict[str, dict] = {}
+            changed = self._walk(self.root, self._nodes, new)
+            changed = changed or set(new) != set(self._nodes)
+            self._nodes = new
+            self._last_refresh = time.monotonic()
+            self.refreshes += 1
+            if changed:
+                self._reindex()
+            if changed or self._dirty or not self.index_path.exists():
+                try:
+                    self._save()
+                    self._dirty = False
+                except OSError as exc:
+                    print(f"[catalog] could not persist index: {exc}")
+            return changed
+
+    def _ensure(self) -> None:
+        if not self._loaded:
+            self.refresh()
+
+    def _refresh_on_miss(self, min_interval: float = 1.0) -> bool:
+        if time.monotonic() - self._last_refresh < min_interval:
+            return False
+        return self.refresh()
+
+    def start(self) -> None:
+        """Build the index and keep it fresh with a background poller."""
+        self.refresh()
+        if self.poll_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        def _poll():
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    self.refresh()
+                except Exception as exc:
+                    print(f"[catalog] refresh failed: {exc}")
+
+        self._thread = threading.Thread(target=_poll, name="model-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ---- lookups ----
+
+    def _lookup(self, fn, refresh_on_miss: bool = True):
+        self._ensure()
+        found = fn()
+        if found is None and refresh_on_miss and self._refresh_on_miss():
+            found = fn()
+        return found
+
+    def entries(self, engine: str | None = None, under: str | None = None) -> list[dict]:
+        self._ensure()
+        prefix = f"{under.rstrip('/')}/" if under else ""
+        return [
+            e for e in self._entries
+            if (engine is None or e["engine"] == engine) and e["id"].startswith(prefix)
+        ]
+
+    def entry(self, rel_path: str) -> Optional[dict]:
+        return self._lookup(lambda: self._by_path.get(rel_path.strip("/")))
+
+    def model_engine(self, name: str, refresh_on_miss: bool = True) -> Optional[str]:
+        """Engine of the model placed under models/<name>/, if any."""
+        entries = self.model_entries(name, refresh_on_miss)
+        return entries[0]["engine"] if entries else None
+
+    def model_entries(self, name: str, refresh_on_miss: bool = True) -> list[dict]:
+        """Entries directly inside models/<name>/ (manual placement)."""
+        try:
+            rel = (models_root() / name).relative_to(self.root).as_posix()
+        except ValueError:
+            return []
+        found = self._lookup(lambda: self._dir_entries(rel) or None, refresh_on_miss)
+        return found or []
+
+    def _dir_entries(self, rel_dir: str) -> list[dict]:
+        node = self._nodes.get(str(self.root / rel_dir))
+        if node is None:
+            return []
+        found = (self._by_path.get(Path(e["path"]).relative_to(self.root).as_posix()) for e in node["entries"])
+        return [e for e in found if e is not None]
+
+    def piper_voice(self, pattern: str, under: str = "piper-tts") -> Optional[dict]:
+        """
+        Resolve a Piper voice by relative path (with or without `.onnx`), file
+        name, or file-name suffix such as `en_US-amy-medium`.
+        """
+        target = pattern if pattern.endswith(".onnx") else f"{pattern}.onnx"
+        prefix = f"{under}/"
+
+        def _find():
+            for rel in (pattern, target):
+                e = self._by_path.get(f"{prefix}{rel.strip('/')}")
+                if e is not None and e["engine"] == "piper":
+                    return e
+            for e in self._by_name.get(target, []):
+                if e["engine"] == "piper" and e["id"].startswith(prefix):
+                    return e
+            for name, bucket in self._by_name.items():
+                if name.endswith(target):
+                    for e in bucket:
+                        if e["engine"] == "piper" and e["id"].startswith(prefix):
+                            return e
+            return None
+
+        return self._lookup(_find)
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        for e in self._entries:
+            counts[e["engine"]] = counts.get(e["engine"], 0) + 1
+        return {
+            "entries": counts,
+            "dirs": len(self._nodes),
+            "refreshes": self.refreshes,
+            "dirs_rescanned": self.dirs_rescanned,
+            "poll_seconds": self.poll_seconds,
+        }
+
+
+catalog = ModelCatalog()
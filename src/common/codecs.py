@@ -0,0 +1,331 @@
+import shutil
+import subprocess
+import threading
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from .audio import WavBuffer, parse_wav, pcm_content_type, wav_header
+from .config import codec_bitrate_kbps, ffmpeg_bin_path
+from .metrics import stage
+
+# OpenAI-compatible `response_format` values
+FORMATS = ("wav", "pcm", "opus", "mp3", "flac", "aac")
+
+CONTENT_TYPES = {
+    "wav": "audio/wav",
+    "opus": "audio/ogg; codecs=opus",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "aac": "audio/aac",
+}
+
+# ffmpeg codec and container per compressed format; containers chosen so output can be streamed
+_FFMPEG = {
+    "opus": (["-c:a", "libopus", "-application", "voip"], "ogg"),
+    "mp3": (["-c:a", "libmp3lame", "-write_xing", "0"], "mp3"),
+    "flac": (["-c:a", "flac"], "flac"),
+    "aac": (["-c:a", "aac"], "adts"),
+}
+_LOSSY = ("opus", "mp3", "aac")
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 192000
+
+
+class CodecError(ValueError):
+    """Unknown response format or unusable sample rate; maps to HTTP 400."""
+
+
+class CodecUnavailable(RuntimeError):
+    """The encoder for a format is not installed; maps to HTTP 501."""
+
+
+def normalize_format(value: Optional[str]) -> str:
+    fmt = str(value or "wav").strip().lower()
+    if fmt not in FORMATS:
+        raise CodecError(f"Unsupported response_format: {value!r} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
+
+def parse_sample_rate(value) -> Optional[int]:
+    """Requested output rate, or None to keep the model's native rate."""
+    if value in (None, "", 0):
+        return None
+    try:
+        rate = int(value)
+    except (TypeError, ValueError):
+        raise CodecError(f"Invalid sample_rate: {value!r}")
+    if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+        raise CodecError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}")
+    return rate
+
+
+def content_type(fmt: str, sample_rate: int, channels: int = 1) -> str:
+    if fmt == "pcm":
+        return pcm_content_type(sample_rate, channels)
+    return CONTENT_TYPES[fmt]
+
+
+def _ffmpeg() -> Optional[str]:
+    return ffmpeg_bin_path() or shutil.which("ffmpeg")
+
+
+def require_encoder(fmt: str, sample_rate: Optional[int] = None) -> None:
+    """Fail before synthesis starts if `fmt` cannot be encoded here at `sample_rate`."""
+    if fmt == "opus" and sample_rate and sample_rate not in OPUS_RATES:
+        raise CodecError(f"opus supports sample_rate {', '.join(map(str, OPUS_RATES))}")
+    if fmt in _FFMPEG and not _ffmpeg():
+        raise CodecUnavailable(f"{fmt} output needs ffmpeg; install it or set FFMPEG_BIN")
+
+
+class Resampler:
+    """
+    Incremental s16le sample rate converter.
+
+    Upsampling interpolates linearly; downsampling averages the input frames
+    each output frame covers, which keeps aliasing down enough for speech.
+    Input may be split anywhere, including mid-frame.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, channels: int = 1):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.step = src_rate / dst_rate
+        self.channels = channels
+        self._buf = array("h")
+        self._partial = b""
+        # Output frame n sits at input frame n * src / dst; exact integers keep chunked and one-shot output identical
+        self._n = 0
+        self._base = 0  # input frame index of _buf[0]
+
+    def _frame(self, i: int, frac: float, c: int, frames: int) -> int:
+        buf, ch = self._buf, self.channels
+        if self.step <= 1.0:
+            a = buf[i * ch + c]
+            b = buf[min(i + 1, frames - 1) * ch + c]
+            return int(a + (b - a) * frac)
+        end = min(frames, max(i + 1, int(i + frac + self.step)))
+        return sum(buf[j * ch + c] for j in range(i, end)) // (end - i)
+
+    def _run(self, final: bool) -> bytes:
+        ch = self.channels
+        frames = len(self._buf) // ch
+        # Without more input, a frame is only final once everything it reads is buffered
+        lookahead = 0 if final else int(self.step) + 1
+        out = array("h")
+        while True:
+            whole, rem = divmod(self._n * self.src_rate, self.dst_rate)
+            i = whole - self._base
+            if i >= frames - lookahead:
+                break
+            frac = rem / self.dst_rate
+            for c in range(ch):
+                out.append(self._frame(i, frac, c, frames))
+            self._n += 1
+        drop = max(0, min(i, frames))
+        del self._buf[: drop * ch]
+        self._base += drop
+        return out.tobytes()
+
+    def push(self, pcm: bytes) -> bytes:
+        data = self._partial + pcm
+        cut = len(data) - len(data) % (2 * self.channels)
+        self._partial = data[cut:]
+        self._buf.frombytes(data[:cut])
+        return self._run(final=False)
+
+    def finish(self) -> bytes:
+        out = self._run(final=True)
+        self._buf, self._partial, self._n, self._base = array("h"), b"", 0, 0
+        return out
+
+
+class Encoder:
+    """
+    Incremental encoder for s16le PCM: `push` returns the encoded bytes that
+    are ready, `finish` flushes the rest. `blocking` encoders talk to a
+    subprocess and should be driven off the event loop.
+    """
+
+    blocking = False
+
+    def __init__(self, fmt: str, sample_rate: int, channels: int = 1, target_rate: Optional[int] = None):
+        self.fmt = fmt
+        self.channels = channels
+        self.input_rate = sample_rate
+        self.sample_rate = target_rate or sample_rate
+
+    @property
+    def content_type(self) -> str:
+        return content_type(self.fmt, self.sample_rate, self.channels)
+
+    def push(self, pcm: bytes) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return None
+
+
+class PcmEncoder(Encoder):
+    """Raw PCM (`pcm`) and streaming WAV (`wav`): a header, then samples, resampled in Python if asked."""
+
+    def __init__(self, fmt: str, sample_rate: int, channels: int = 1, target_rate: Optional[int] = None):
+        super().__init__(fmt, sample_rate, channels, target_rate)
+        self._resampler = Resampler(sample_rate, target_rate, channels) if target_rate and target_rate != sample_rate else None
+        self._header = wav_header(self.sample_rate, channels) if fmt == "wav" else b""
+
+    def _emit(self, pcm: bytes) -> bytes:
+        header, self._header = self._header, b""
+        return header + pcm
+
+    def push(self, pcm: bytes) -> bytes:
+        if self._resampler is not None:
+            pcm = self._resampler.push(pcm)
+        return self._emit(pcm)
+
+    def finish(self) -> bytes:
+        return self._emit(self._resampler.finish() if self._resampler is not None else b"")
+
+
+class FfmpegEncoder(Encoder):
+    """Compressed formats through one ffmpeg process per response, fed on stdin and read on a thread."""
+
+    blocking = True
+
+    def __init__(self, fmt: str, sample_rate: int, channels: int = 1, target_rate: Optional[int] = None):
+        super().__init__(fmt, sample_rate, channels, target_rate)
+        ffmpeg = _ffmpeg()
+        if not ffmpeg:
+            raise CodecUnavailable(f"{fmt} output needs ffmpeg; install it or set FFMPEG_BIN")
+        codec, container = _FFMPEG[fmt]
+        cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0"]
+        cmd += codec
+        if fmt in _LOSSY:
+            cmd += ["-b:a", f"{codec_bitrate_kbps(fmt)}k"]
+        if target_rate:
+            cmd += ["-ar", str(target_rate)]
+        cmd += ["-flush_packets", "1", "-f", container, "pipe:1"]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._out: list[bytes] = []
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, name=f"encode-{fmt}", daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        assert self._proc.stdout is not None
+        while True:
+            data = self._proc.stdout.read1(65536)
+            if not data:
+                return
+            with self._lock:
+                self._out.append(data)
+
+    def _drain(self) -> bytes:
+        with self._lock:
+            out, self._out = b"".join(self._out), []
+        return out
+
+    def push(self, pcm: bytes) -> bytes:
+        assert self._proc.stdin is not None
+        if pcm:
+            self._proc.stdin.write(pcm)
+            self._proc.stdin.flush()
+        return self._drain()
+
+    def finish(self) -> bytes:
+        assert self._proc.stdin is not None and self._proc.stderr is not None
+        self._proc.stdin.close()
+        self._reader.join()
+        rc = self._proc.wait()
+        if rc != 0:
+            err = self._proc.stderr.read().decode(errors="ignore").strip()
+            raise RuntimeError(f"ffmpeg {self.fmt} encoding failed ({rc}): {err[-300:]}")
+        return self._drain()
+
+    def close(self) -> None:
+        if self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+
+
+def open_encoder(fmt: str, sample_rate: int, channels: int = 1, target_rate: Optional[int] = None) -> Encoder:
+    fmt = normalize_format(fmt)
+    if fmt in _FFMPEG:
+        return FfmpegEncoder(fmt, sample_rate, channels, target_rate)
+    return PcmEncoder(fmt, sample_rate, channels, target_rate)
+
+
+def encode_stream(chunks: Iterable[tuple[int, int, int, bytes]], fmt: str, target_rate: Optional[int] = None) -> Iterator[tuple[str, bytes]]:
+    """
+    Encode (sample_rate, sample_width, channels, pcm) chunks as they arrive and
+    yield (content_type, data) for each non-empty piece of output. Blocking
+    generator; the engine runs it on the same pool as the synthesis it wraps.
+    """
+    encoder: Optional[Encoder] = None
+    try:
+        for rate, width, channels, pcm in chunks:
+            if width != 2:
+                raise CodecError(f"expected 16-bit PCM, got {width * 8}-bit")
+            if encoder is None:
+                encoder = open_encoder(fmt, rate, channels, target_rate)
+            with stage("encoding"):
+                out = encoder.push(pcm)
+            if out:
+                yield encoder.content_type, out
+        if encoder is None:
+            return
+        with stage("encoding"):
+            out = encoder.finish()
+        if out:
+            yield encoder.content_type, out
+    finally:
+        if encoder is not None:
+            encoder.close()
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _encode_all(chunks: Iterable, fmt: str, rate: int, channels: int, target_rate: Optional[int]) -> tuple[bytes, str]:
+    encoder = open_encoder(fmt, rate, channels, target_rate)
+    try:
+        with stage("encoding"):
+            parts = [encoder.push(pcm) for pcm in chunks]
+            parts.append(encoder.finish())
+    finally:
+        encoder.close()
+    data = b"".join(parts)
+    if fmt == "wav":
+        data = seal_wav(data)
+    return data, encoder.content_type
+
+
+def transcode_wav(blob: bytes, fmt: str, target_rate: Optional[int] = None) -> tuple[bytes, str]:
+    """Re-encode a complete 16-bit WAV as `fmt` at `target_rate`; (bytes, content_type)."""
+    if fmt == "wav" and not target_rate:
+        return blob, CONTENT_TYPES["wav"]
+    rate, width, channels, pcm = parse_wav(blob)
+    if width != 2:
+        raise CodecError(f"expected 16-bit PCM, got {width * 8}-bit")
+    return _encode_all([pcm], fmt, rate, channels, target_rate)
+
+
+def encode_buffer(buf: WavBuffer, fmt: str, target_rate: Optional[int] = None) -> tuple[bytes, str]:
+    """Encode buffered synthesis output, feeding its chunks to the encoder without joining them first."""
+    if fmt == "wav" and not target_rate:
+        return buf.tobytes(), CONTENT_TYPES["wav"]
+    if buf.sample_width != 2:
+        raise CodecError(f"expected 16-bit PCM, got {buf.sample_width * 8}-bit")
+    return _encode_all(buf.chunks, fmt, buf.sample_rate, buf.channels, target_rate)
+
+
+def seal_wav(blob: bytes) -> bytes:
+    """Replace the streaming "unknown length" sizes of a 44-byte-header WAV with the real ones."""
+    if len(blob) < 44 or blob[:4] != b"RIFF":
+        return blob
+    size = len(blob) - 44
+    return blob[:4] + (36 + size).to_bytes(4, "little") + blob[8:40] + size.to_bytes(4, "little") + blob[44:]
@@ -43,6 +43,13 @@ def quic_base_url() -> str | None:
     return get_env("STREAM_ENGINE_BASE", None)
 
 
+def quic_base_urls() -> list[str]:
+    # Engine backends the gateway balances across: STREAM_ENGINE_BASES (comma-separated),
+    # else the single STREAM_ENGINE_BASE
+    raw = get_env("STREAM_ENGINE_BASES") or quic_base_url() or ""
+    return [item.strip().rstrip("/") for item in raw.split(",") if item.strip()]
+
+
 def quic_cert_paths() -> tuple[Path | None, Path | None]:
     cert = get_env("QUIC_CLIENT_CERT")
     key = get_env("QUIC_CLIENT_KEY")
@@ -61,3 +68,358 @@ def whisper_cpp_bin_path() -> str | None:
     return get_env("WHISPER_CPP_BIN", None)
 
 
+def ffmpeg_bin_path() -> str | None:
+    return get_env("FFMPEG_BIN", None)
+
+
+def hf_endpoint() -> str:
+    # Hugging Face host for model downloads (same variable as huggingface_hub); point at a mirror or a local stand-in
+    return (get_env("HF_ENDPOINT") or "https://huggingface.co").rstrip("/")
+
+
+def hf_token() -> str | None:
+    return get_env("HUGGINGFACE_TOKEN") or get_env("HF_TOKEN")
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = get_env(name)
+    if raw is None or str(raw).strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = get_env(name)
+    if raw is None or str(raw).strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def piper_pool_max_bytes() -> int:
+    # Memory budget for resident Piper voices in the engine (MiB in env)
+    return _env_int("PIPER_POOL_MAX_MB", 2048) * 1024 * 1024
+
+
+def piper_voice_concurrency() -> int:
+    # Concurrent synthesis calls allowed per resident voice
+    return max(1, _env_int("PIPER_VOICE_CONCURRENCY", 2))
+
+
+def onnx_intra_op_threads() -> int:
+    # Threads one ONNX Runtime operator may use (0 = automatic, see src/common/onnx_sessions.py)
+    return max(0, _env_int("ONNX_INTRA_OP_THREADS", 0))
+
+
+def onnx_inter_op_threads() -> int:
+    # Threads for running independent graph nodes in parallel (0 = ORT default)
+    return max(0, _env_int("ONNX_INTER_OP_THREADS", 1))
+
+
+def onnx_shared_threads() -> bool:
+    # One process-wide ORT thread pool for all voices instead of a pool per session
+    return get_env("ONNX_SHARED_THREADS", "1") not in (None, "0", "false", "False")
+
+
+def onnx_graph_optimization() -> str:
+    # disable, basic, extended or all; "all" adds hardware-specific layout changes
+    return (get_env("ONNX_GRAPH_OPTIMIZATION", "extended") or "extended").strip().lower()
+
+
+def onnx_optimized_cache_dir() -> Path | None:
+    # Optimized voice graphs are serialized here and reused by every worker; "off" disables
+    raw = get_env("ONNX_OPTIMIZED_CACHE")
+    if raw is not None and raw.strip().lower() in ("", "0", "off", "false"):
+        return None
+    return Path(raw).expanduser() if raw else data_root() / "onnx-cache"
+
+
+def onnx_mmap_weights() -> bool:
+    # Keep cached voice weights in a separate file that ORT maps instead of copying
+    return get_env("ONNX_MMAP_WEIGHTS", "1") not in (None, "0", "false", "False")
+
+
+def engine_model_cache_bytes() -> int:
+    # Memory budget for Parler/HF Whisper models resident in the engine (MiB in env)
+    return _env_int("ENGINE_MODEL_CACHE_MB", 8192) * 1024 * 1024
+
+
+def model_cache_max_bytes() -> int:
+    # Memory budget for models cached by the API process (MiB in env)
+    return _env_int("MODEL_CACHE_MAX_MB", 8192) * 1024 * 1024
+
+
+def model_load_workers() -> int:
+    # Threads the API process loads models on
+    return max(1, _env_int("MODEL_LOAD_WORKERS", 2))
+
+
+def engine_warm_models() -> list[str]:
+    # Comma-separated "<runtime>:<model>" entries loaded at engine startup,
+    # e.g. "parler:parler-tts/parler-tts-mini-v1,whisper:openai/whisper-small"
+    raw = get_env("ENGINE_WARM_MODELS", "") or ""
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+def required_runtimes() -> list[str]:
+    # Runtimes (piper, parler, hf_whisper, xtts) that must be installed or startup fails; others are optional
+    raw = get_env("REQUIRED_RUNTIMES", "") or ""
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+def preload_profile_path() -> Path | None:
+    # JSON preload profile (models/voices to load and warm up at startup); see src/common/preload.py
+    raw = get_env("PRELOAD_PROFILE")
+    return Path(raw).expanduser() if raw else None
+
+
+def preload_models() -> list[str]:
+    # Inline preload entries, comma-separated "<runtime>:<model>[@<voice>]"
+    raw = get_env("PRELOAD_MODELS", "") or ""
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+def engine_workers(kind: str) -> int:
+    # Worker threads per engine kind: ENGINE_WORKERS_<KIND>, then ENGINE_WORKERS
+    defaults = {"piper": os.cpu_count() or 2}
+    specific = _env_int(f"ENGINE_WORKERS_{kind.upper()}", 0)
+    if specific > 0:
+        return specific
+    return max(1, _env_int("ENGINE_WORKERS", defaults.get(kind, 1)))
+
+
+def engine_max_queue() -> int:
+    # Requests allowed to wait per engine kind before answering 503
+    return max(0, _env_int("ENGINE_MAX_QUEUE", 16))
+
+
+def model_download_connections() -> int:
+    # Parallel HTTP range requests per downloaded file
+    return max(1, _env_int("MODEL_DOWNLOAD_CONNECTIONS", 4))
+
+
+def model_download_part_bytes() -> int:
+    # Smallest range worth its own connection; smaller files download in one stream
+    return max(1, _env_int("MODEL_DOWNLOAD_PART_MB", 16)) * 1024 * 1024
+
+
+def model_download_jobs() -> int:
+    # Download jobs running at once; further jobs wait in the queue
+    return max(1, _env_int("MODEL_DOWNLOAD_JOBS", 2))
+
+
+def model_download_retries() -> int:
+    # Further attempts for a download job after a network error or checksum mismatch
+    return max(0, _env_int("MODEL_DOWNLOAD_RETRIES", 3))
+
+
+def engine_processes() -> int:
+    # Engine worker processes sharing the UDP port via SO_REUSEPORT; 1 runs in-process
+    return max(1, _env_int("ENGINE_PROCESSES", 1))
+
+
+def engine_affinity_ports() -> bool:
+    # With several processes, worker i also listens alone on port+1+i for model-affine routing
+    return get_env("ENGINE_AFFINITY_PORTS", "1") not in (None, "0", "false", "False")
+
+
+def engine_drain_seconds() -> int:
+    # How long a worker keeps serving in-flight requests after SIGTERM
+    return max(0, _env_int("ENGINE_DRAIN_SECONDS", 30))
+
+
+def quic_pool_size() -> int:
+    # Persistent QUIC connections the gateway keeps to each engine
+    return max(1, _env_int("QUIC_POOL_SIZE", 2))
+
+
+def quic_keepalive_seconds() -> int:
+    return max(0, _env_int("QUIC_KEEPALIVE_SECONDS", 15))
+
+
+def quic_early_data() -> bool:
+    # 0-RTT requests on resumed connections; replayable, so opt-in
+    return get_env("QUIC_EARLY_DATA", "0") not in (None, "0", "false", "False")
+
+
+def engine_lb_policy() -> str:
+    # least_outstanding, or ewma (latency-weighted) for backends of unequal speed
+    return (get_env("ENGINE_LB_POLICY", "least_outstanding") or "least_outstanding").strip().lower()
+
+
+def engine_model_affinity() -> bool:
+    # Send each model to the same backend (rendezvous hash) while it is healthy and not overloaded
+    return get_env("ENGINE_MODEL_AFFINITY", "1") not in (None, "0", "false", "False")
+
+
+def engine_affinity_load_factor() -> float:
+    # A model's preferred backend is skipped once it has this many times the average outstanding requests
+    return max(1.0, _env_float("ENGINE_AFFINITY_LOAD_FACTOR", 2.0))
+
+
+def engine_health_interval_seconds() -> float:
+    return max(0.5, _env_float("ENGINE_HEALTH_INTERVAL_SECONDS", 5.0))
+
+
+def engine_circuit_failures() -> int:
+    # Consecutive failures (requests or health checks) that eject a backend
+    return max(1, _env_int("ENGINE_CIRCUIT_FAILURES", 3))
+
+
+def engine_circuit_open_seconds() -> float:
+    return max(1.0, _env_float("ENGINE_CIRCUIT_OPEN_SECONDS", 10.0))
+
+
+def audio_cache_enabled() -> bool:
+    return get_env("AUDIO_CACHE_ENABLED", "1") not in (None, "0", "false", "False")
+
+
+def audio_cache_memory_bytes() -> int:
+    return _env_int("AUDIO_CACHE_MEMORY_MB", 64) * 1024 * 1024
+
+
+def audio_cache_disk_bytes() -> int:
+    return _env_int("AUDIO_CACHE_DISK_MB", 1024) * 1024 * 1024
+
+
+def audio_cache_ttl_seconds() -> int:
+    # 0 disables expiry; entries are still bounded by AUDIO_CACHE_DISK_MB
+    return max(0, _env_int("AUDIO_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+
+def whisper_server_procs() -> int:
+    # Resident whisper.cpp server processes per STT model
+    return max(1, _env_int("WHISPER_SERVER_PROCS", 1))
+
+
+def live_stt_segment_seconds() -> float:
+    # Longest audio span the live STT endpoint buffers before emitting a partial
+    return max(1, _env_int("LIVE_STT_SEGMENT_SECONDS", 8))
+
+
+def live_stt_buffer_seconds() -> int:
+    # Audio a live session may receive ahead of transcription before the engine stops reading it
+    return max(1, _env_int("LIVE_STT_BUFFER_SECONDS", 30))
+
+
+def whisper_server_enabled() -> bool:
+    # Keep whisper.cpp models resident in whisper-server processes when the binary exists
+    return get_env("WHISPER_SERVER", "1") not in (None, "0", "false", "False")
+
+
+def audio_archive_enabled() -> bool:
+    return get_env("AUDIO_ARCHIVE", "1") not in (None, "0", "false", "False")
+
+
+def audio_archive_sample_rate() -> float:
+    # Fraction of requests whose audio is archived, 0.0-1.0
+    return min(1.0, max(0.0, _env_float("AUDIO_ARCHIVE_SAMPLE_RATE", 1.0)))
+
+
+def audio_archive_queue_size() -> int:
+    return max(1, _env_int("AUDIO_ARCHIVE_QUEUE", 256))
+
+
+def audio_archive_retention_seconds() -> int:
+    # 0 keeps files until AUDIO_ARCHIVE_MAX_MB forces rotation
+    return max(0, _env_int("AUDIO_ARCHIVE_RETENTION_DAYS", 30)) * 24 * 3600
+
+
+def audio_archive_max_bytes() -> int:
+    return _env_int("AUDIO_ARCHIVE_MAX_MB", 10240) * 1024 * 1024
+
+
+def catalog_poll_seconds() -> int:
+    # How often the model/voice catalog re-checks directory mtimes; 0 disables polling
+    return max(0, _env_int("CATALOG_POLL_SECONDS", 30))
+
+
+def tts_segment_max_chars() -> int:
+    # Longest text segment synthesized in one model call in segmented (streaming) mode
+    return max(40, _env_int("TTS_SEGMENT_MAX_CHARS", 250))
+
+
+def tts_segment_gap_ms() -> float:
+    # Silence inserted between segments; ignored when a crossfade is configured
+    return max(0.0, _env_float("TTS_SEGMENT_GAP_MS", 60.0))
+
+
+def tts_segment_crossfade_ms() -> float:
+    return max(0.0, _env_float("TTS_SEGMENT_CROSSFADE_MS", 0.0))
+
+
+def parler_segment_batch() -> int:
+    # Segments generated together per Parler call after the first (which runs alone for a fast first chunk)
+    return max(1, _env_int("PARLER_SEGMENT_BATCH", 4))
+
+
+_DEFAULT_CODEC_BITRATES = {"opus": 32, "mp3": 64, "aac": 64}
+
+
+def codec_bitrate_kbps(fmt: str) -> int:
+    # Target bitrate of the lossy speech encoders, e.g. CODEC_BITRATE_OPUS=24
+    return max(6, _env_int(f"CODEC_BITRATE_{fmt.upper()}", _DEFAULT_CODEC_BITRATES.get(fmt, 64)))
+
+
+def rate_limit_backend() -> str:
+    # memory (per process), shm (all workers on one host) or redis (any Redis-protocol store)
+    return (get_env("RATE_LIMIT_BACKEND", "memory") or "memory").strip().lower()
+
+
+def rate_limit_requests() -> int:
+    return max(1, _env_int("RATE_LIMIT_REQUESTS", 120))
+
+
+def rate_limit_window_seconds() -> int:
+    return max(1, _env_int("RATE_LIMIT_WINDOW_SECONDS", 60))
+
+
+def rate_limit_redis_url() -> str:
+    return get_env("RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/0") or "redis://127.0.0.1:6379/0"
+
+
+def rate_limit_shm_path() -> Path:
+    raw = get_env("RATE_LIMIT_SHM_PATH")
+    if raw:
+        return Path(raw)
+    shm = Path("/dev/shm")
+    return (shm if shm.is_dir() else tmp_root()) / "shabdabhav-ratelimit"
+
+
+def rate_limit_shm_slots() -> int:
+    return max(1024, _env_int("RATE_LIMIT_SHM_SLOTS", 65536))
+
+
+def rate_limit_trust_proxy() -> bool:
+    # Only honour X-Forwarded-For behind a proxy that sets it
+    return get_env("RATE_LIMIT_TRUST_PROXY", "0") not in (None, "0", "false", "False")
+
+
+_DEFAULT_ROUTE_COSTS = (
+    "/=0.1,/health=0.1,/metrics=0.1,/v1/models=0.5,/v1/models/*=1,/v1/models/download/*=0.1,"
+    "/v1/audio/speech=4,/v1/audio/transcriptions=4,/v1/chat/completions=2"
+)
+
+
+def rate_limit_route_costs() -> dict[str, float]:
+    # "path=cost" pairs; a trailing * matches by prefix. Unlisted routes cost 1
+    costs: dict[str, float] = {}
+    for item in (get_env("RATE_LIMIT_ROUTE_COSTS", _DEFAULT_ROUTE_COSTS) or "").split(","):
+        path, _, cost = item.strip().partition("=")
+        if not path or not cost:
+            continue
+        try:
+            costs[path] = float(cost)
+        except ValueError:
+            continue
+    return costs
+
+
+def rate_limit_tts_chars_per_unit() -> int:
+    # Speech requests are also charged one unit per this many characters (~1 unit per second of audio); 0 disables
+    return max(0, _env_int("RATE_LIMIT_TTS_CHARS_PER_UNIT", 15))
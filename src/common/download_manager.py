@@ -0,0 +1,566 @@
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .config import (
+    hf_token,
+    model_download_connections,
+    model_download_jobs,
+    model_download_part_bytes,
+    model_download_retries,
+)
+
+CHUNK_BYTES = 1024 * 1024
+RANGE_RETRIES = 3
+STATE_SAVE_SECONDS = 2.0
+FINISHED_JOBS_KEPT = 100
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+class ChecksumError(DownloadError):
+    pass
+
+
+class DownloadCancelled(DownloadError):
+    pass
+
+
+def request_headers(extra: Optional[dict] = None) -> dict[str, str]:
+    headers = {"User-Agent": "shabdabhav/1.0", "Accept": "application/octet-stream, */*"}
+    # Optional: Hugging Face token for authenticated downloads
+    token = hf_token()
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    headers.update(extra or {})
+    return headers
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Hugging Face puts file metadata (X-Linked-*) on the redirect to its CDN, so stop there to read it
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_no_redirect = urllib.request.build_opener(_NoRedirect)
+
+
+@dataclass
+class RemoteFile:
+    url: str
+    size: Optional[int]
+    ranges: bool
+    sha256: Optional[str]
+
+
+def _sha256_from_etag(value: Optional[str]) -> Optional[str]:
+    # LFS files carry their sha256 as the (linked) ETag; regular files carry a git blob id
+    etag = (value or "").strip().removeprefix("W/").strip('"').lower()
+    return etag if _SHA256.fullmatch(etag) else None
+
+
+def probe(url: str, timeout: float = 30.0) -> RemoteFile:
+    """Size, range support and published sha256 (from Hugging Face metadata headers) of a remote file."""
+    try:
+        with _no_redirect.open(urllib.request.Request(url, headers=request_headers(), method="HEAD"), timeout=timeout) as resp:
+            meta = resp.headers
+    except urllib.error.HTTPError as exc:
+        # A redirect lands here; any other status leaves the GET below to report it
+        meta = exc.headers
+    sha256 = _sha256_from_etag(meta.get("X-Linked-Etag") or meta.get("ETag"))
+    size = int(meta["X-Linked-Size"]) if (meta.get("X-Linked-Size") or "").isdigit() else None
+
+    # A one-byte range request (following redirects) tells whether the final host serves ranges
+    with urllib.request.urlopen(urllib.request.Request(url, headers=request_headers({"Range": "bytes=0-0"})), timeout=timeout) as resp:
+        content_range = resp.headers.get("Content-Range", "")
+        if resp.status == 206 and "/" in content_range and not content_range.endswith("/*"):
+            return RemoteFile(url, int(content_range.rsplit("/", 1)[1]), True, sha256)
+        length = resp.headers.get("Content-Length")
+        return RemoteFile(url, int(length) if length else size, False, sha256)
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(CHUNK_BYTES)
+            if not block:
+                return digest.hexdigest()
+            digest.update(block)
+
+
+class _Progress:
+    """Bytes written so far for one file, shared by its range workers."""
+
+    def __init__(self, name: str, total: Optional[int], done: int = 0):
+        self.name = name
+        self.total = total
+        self.done = done
+        self.resumed = 0
+        self.lock = threading.Lock()
+
+    def add(self, n: int) -> None:
+        with self.lock:
+            self.done += n
+        job = _current_job.get()
+        if job is not None:
+            job.report(self.name, self.done, self.total)
+
+
+def _check_cancelled() -> None:
+    job = _current_job.get()
+    if job is not None and job.cancel_event.is_set():
+        raise DownloadCancelled("download cancelled")
+
+
+def _fetch_ranges(remote: RemoteFile, part: Path, state_path: Path, connections: int, progress: _Progress) -> None:
+    """
+    Download `remote` into `part` with parallel range requests, each writing at
+    its own offset. Completed bytes per range are saved to `state_path`, so an
+    interrupted download resumes where every range stopped.
+    """
+    size = remote.size or 0
+    ranges = None
+    if state_path.exists() and part.exists():
+        try:
+            state = json.loads(state_path.read_text())
+            if state.get("url") == remote.url and state.get("size") == size and part.stat().st_size == size:
+                ranges = state["ranges"]
+        except (ValueError, KeyError, OSError):
+            ranges = None
+    if ranges is None:
+        count = max(1, min(connections, size // model_download_part_bytes()))
+        step = -(-size // count)
+        ranges = [[start, min(size, start + step), 0] for start in range(0, size, step)]
+        with open(part, "wb") as f:
+            f.truncate(size)  # sparse file; every range writes into its own slice
+    progress.done = progress.resumed = sum(r[2] for r in ranges)
+    lock = threading.Lock()
+    last_save = [time.monotonic()]
+
+    def _save(force: bool = False) -> None:
+        with lock:
+            if not force and time.monotonic() - last_save[0] < STATE_SAVE_SECONDS:
+                return
+            last_save[0] = time.monotonic()
+            state_path.write_text(json.dumps({"url": remote.url, "size": size, "ranges": ranges}))
+
+    fd = os.open(part, os.O_WRONLY)
+    failed = threading.Event()
+
+    def _worker(r: list) -> None:
+        attempt = 0
+        while r[0] + r[2] < r[1] and not failed.is_set():
+            _check_cancelled()
+            start = r[0] + r[2]
+            req = urllib.request.Request(remote.url, headers=request_headers({"Range": f"bytes={start}-{r[1] - 1}"}))
+            try:
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    if resp.status != 206:
+                        raise DownloadError(f"{remote.url}: server ignored the range request (HTTP {resp.status})")
+                    while r[0] + r[2] < r[1] and not failed.is_set():
+                        _check_cancelled()
+                        block = resp.read(min(CHUNK_BYTES, r[1] - r[0] - r[2]))
+                        if not block:
+                            break
+                        os.pwrite(fd, block, r[0] + r[2])
+                        r[2] += len(block)
+                        progress.add(len(block))
+                        _save()
+            except (OSError, urllib.error.URLError) as exc:
+                attempt += 1
+                if attempt > RANGE_RETRIES:
+                    raise DownloadError(f"{remote.url}: range {r[0]}-{r[1] - 1} failed: {exc}") from exc
+                time.sleep(min(8.0, 0.5 * 2 ** attempt))
+
+    try:
+        pending = [r for r in ranges if r[0] + r[2] < r[1]]
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="model-range") as pool:
+                ctx = contextvars.copy_context()
+                futures = [pool.submit(ctx.copy().run, _worker, r) for r in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    failed.set()  # stop the other ranges; what they wrote stays saved for a resume
+                    raise
+    finally:
+        os.close(fd)
+        _save(force=True)
+
+
+def _fetch_stream(remote: RemoteFile, part: Path, progress: _Progress) -> None:
+    # One connection; appends to an existing partial file when the server honours the range
+    existing = part.stat().st_size if remote.ranges and part.exists() else 0
+    if remote.size is not None and existing >= remote.size:
+        if existing == remote.size:
+            progress.done = progress.resumed = existing
+            return
+        existing = 0  # longer than the file, so not a prefix of it
+    headers = {"Range": f"bytes={existing}-"} if existing else {}
+    req = urllib.request.Request(remote.url, headers=request_headers(headers))
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        if existing and resp.status != 206:
+            # The whole file came back; appending it to the partial one would corrupt the download
+            print(f"[download] {progress.name}: server ignored the range request (HTTP {resp.status}), restarting from zero")
+            existing = 0
+        progress.done = progress.resumed = existing
+        with open(part, "ab" if existing else "wb") as f:
+            while True:
+                _check_cancelled()
+                block = resp.read(CHUNK_BYTES)
+                if not block:
+                    return
+                f.write(block)
+                progress.add(len(block))
+
+
+def fetch(
+    url: str, dest_path: Path, sha256: Optional[str] = None, connections: Optional[int] = None, label: Optional[str] = None
+) -> Path:
+    """
+    Download `url` to `dest_path` through `dest_path.part`, with parallel range
+    requests when the server allows them, resuming earlier partial downloads.
+    The result is checked against `sha256`, else against the sha256 the server
+    publishes (Hugging Face LFS metadata); a mismatch discards the download.
+    Progress is reported to the current job under `label` (the file name by default).
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    _check_cancelled()
+    remote = probe(url)
+    expected = (sha256 or remote.sha256 or "").lower() or None
+    progress = _Progress(label or dest_path.name, remote.size)
+    if dest_path.exists() and expected and sha256_file(dest_path) == expected:
+        progress.add(dest_path.stat().st_size)
+        return dest_path
+
+    part = dest_path.with_suffix(dest_path.suffix + ".part")
+    state_path = dest_path.with_suffix(dest_path.suffix + ".part.json")
+    connections = connections or model_download_connections()
+    started = time.perf_counter()
+    if remote.ranges and remote.size and connections > 1 and remote.size >= 2 * model_download_part_bytes():
+        _fetch_ranges(remote, part, state_path, connections, progress)
+    else:
+        if state_path.exists():
+            # A ranged partial file is preallocated with holes; it cannot be appended to
+            part.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+        _fetch_stream(remote, part, progress)
+
+    if remote.size is not None and part.stat().st_size != remote.size:
+        raise DownloadError(f"{url}: got {part.stat().st_size} bytes, expected {remote.size}")
+    if expected:
+        actual = sha256_file(part)
+        if actual != expected:
+            part.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            raise ChecksumError(f"{dest_path.name}: sha256 {actual} does not match {expected}")
+    part.replace(dest_path)
+    state_path.unlink(missing_ok=True)
+    elapsed = time.perf_counter() - started
+    fetched_mb = (progress.done - progress.resumed) / 2**20
+    resumed = f", resumed at {progress.resumed / 2**20:.1f} MiB" if progress.resumed else ""
+    print(
+        f"[download] {progress.name}: {fetched_mb:.1f} MiB in {elapsed:.1f}s ({fetched_mb / max(elapsed, 1e-6):.1f} MiB/s{resumed})"
+        f"{', sha256 ok' if expected else ''}"
+    )
+    return dest_path
+
+
+# -------------------- background jobs --------------------
+
+
+class DownloadJob:
+    def __init__(self, kind: str, name: str, params: dict, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.params = params
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.files: dict[str, dict] = {}
+        self.attempts = 0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self.on_progress: Optional[Callable[["DownloadJob"], None]] = None
+
+    def expect(self, file: str, total: Optional[int]) -> None:
+        """Announce a file before it downloads, so the job's total is known up front."""
+        self.files.setdefault(file, {"bytes_done": 0, "bytes_total": total})
+
+    def report(self, file: str, done: int, total: Optional[int]) -> None:
+        self.files[file] = {"bytes_done": done, "bytes_total": total}
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def info(self) -> dict:
+        files = dict(self.files)
+        done = sum(f["bytes_done"] for f in files.values())
+        totals = [f["bytes_total"] for f in files.values()]
+        total = sum(totals) if totals and None not in totals else None
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "status": self.status,
+            "bytes_done": done,
+            "bytes_total": total,
+            "progress": round(done / total, 4) if total else None,
+            "bytes_per_second": round(done / elapsed) if elapsed > 0 else None,
+            "attempts": self.attempts,
+            "files": files,
+            "error": self.error,
+            "result": self.result,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    def state(self) -> dict:
+        out = {k: v for k, v in self.info().items() if k in ("id", "kind", "name", "status", "attempts", "files", "error", "result")}
+        out.update(params=self.params, created=self.created, started=self.started, finished=self.finished)
+        return out
+
+    @classmethod
+    def from_state(cls, raw: dict) -> "DownloadJob":
+        job = cls(raw["kind"], raw["name"], raw.get("params") or {}, job_id=raw["id"])
+        job.status = raw.get("status", "queued")
+        job.error = raw.get("error")
+        job.result = raw.get("result")
+        job.files = raw.get("files") or {}
+        job.attempts = raw.get("attempts", 0)
+        job.created = raw.get("created") or job.created
+        job.started = raw.get("started")
+        job.finished = raw.get("finished")
+        return job
+
+
+_current_job: contextvars.ContextVar[Optional[DownloadJob]] = contextvars.ContextVar("_current_job", default=None)
+
+
+def current_job() -> Optional[DownloadJob]:
+    """The job whose handler is running in this thread, if any."""
+    return _current_job.get()
+
+
+def _retryable(exc: BaseException) -> bool:
+    # Network trouble and corrupt transfers are worth another attempt; a missing file or a bad request is not
+    if isinstance(exc, DownloadCancelled):
+        return False
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code in (408, 429) or exc.code >= 500
+    return isinstance(exc, (DownloadError, OSError))
+
+
+class DownloadManager:
+    """
+    Runs model downloads as background jobs on a thread pool, at most
+    MODEL_DOWNLOAD_JOBS at once, so nothing blocks the event loop.
+
+    A job names a registered kind and its keyword parameters. Jobs report
+    byte progress while `fetch` runs inside them, are retried with backoff
+    on network errors (MODEL_DOWNLOAD_RETRIES), and can be cancelled between
+    blocks. A second request for a job that is already queued or running gets
+    that job. With a `state_path`, jobs are saved there and `restore` requeues
+    the unfinished ones after a restart; `fetch` resumes their partial files.
+    """
+
+    def __init__(self, state_path: Optional[Path] = None, max_jobs: Optional[int] = None, retries: Optional[int] = None):
+        self.state_path = Path(state_path) if state_path else None
+        self.max_jobs = max_jobs or model_download_jobs()
+        self.retries = model_download_retries() if retries is None else retries
+        self._handlers: dict[str, Callable[..., Any]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, DownloadJob]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_save = 0.0
+        self._stopping = False
+
+    def register(self, kind: str, fn: Callable[..., Any]) -> None:
+        self._handlers[kind] = fn
+
+    def submit(self, kind: str, name: str, **params) -> DownloadJob:
+        if kind not in self._handlers:
+            raise ValueError(f"unknown download kind: {kind}")
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.name == name and job.active:
+                    return job
+            job = DownloadJob(kind, name, params)
+            self._jobs[job.id] = job
+            self._prune()
+            self._schedule(job)
+            self._save(force=True)
+        return job
+
+    def _schedule(self, job: DownloadJob) -> None:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="model-download")
+        job.on_progress = lambda _job: self._save()
+        job.future = self._pool.submit(self._run, job)
+
+    def _run(self, job: DownloadJob) -> Any:
+        if job.cancel_event.is_set():
+            if not self._stopping:
+                job.status = "cancelled"
+                job.finished = time.time()
+                self._save(force=True)
+            raise DownloadCancelled("download cancelled")
+        job.status = "running"
+        job.started = time.time()
+        job.error = None
+        self._save(force=True)
+        token = _current_job.set(job)
+        try:
+            while True:
+                job.attempts += 1
+                try:
+                    job.result = self._handlers[job.kind](**job.params)
+                    job.status = "completed"
+                    job.error = None
+                    return job.result
+                except Exception as exc:
+                    if not _retryable(exc) or job.attempts > self.retries:
+                        raise
+                    delay = min(60.0, 2.0 * 2 ** (job.attempts - 1))
+                    job.error = str(exc)
+                    print(f"[download] {job.name} attempt {job.attempts} failed ({exc}); retrying in {delay:.0f}s")
+                    if job.cancel_event.wait(delay):
+                        raise DownloadCancelled("download cancelled")
+        except DownloadCancelled:
+            # Interrupted by shutdown: leave it queued in the saved state so `restore` picks it up again
+            job.status = "queued" if self._stopping else "cancelled"
+            raise
+        except Exception as exc:
+            job.status = "failed"
+            job.error = str(exc)
+            print(f"[download] {job.name} failed: {exc}")
+            raise
+        finally:
+            job.finished = time.time() if not job.active else None
+            _current_job.reset(token)
+            self._save(force=True)
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in finished[: max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            self._jobs.pop(job.id, None)
+
+    def _save(self, force: bool = False) -> None:
+        if self.state_path is None or self._stopping:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < STATE_SAVE_SECONDS:
+                return
+            self._last_save = now
+            payload = {"jobs": [job.state() for job in list(self._jobs.values())]}
+            try:
+                self.state_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.state_path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(payload), encoding="utf-8")
+                os.replace(tmp, self.state_path)
+            except OSError as exc:
+                print(f"[download] saving job state failed: {exc}")
+
+    def restore(self) -> int:
+        """Load saved jobs and requeue the ones a previous run did not finish; returns how many were requeued."""
+        if self.state_path is None or not self.state_path.exists():
+            return 0
+        try:
+            saved = json.loads(self.state_path.read_text(encoding="utf-8")).get("jobs", [])
+        except (OSError, ValueError) as exc:
+            print(f"[download] ignoring unreadable job state {self.state_path}: {exc}")
+            return 0
+        requeued = 0
+        with self._lock:
+            for raw in saved:
+                try:
+                    job = DownloadJob.from_state(raw)
+                except (KeyError, TypeError):
+                    continue
+                if job.id in self._jobs:
+                    continue
+                self._jobs[job.id] = job
+                if not job.active:
+                    continue
+                if job.kind not in self._handlers:
+                    job.status = "failed"
+                    job.error = f"unknown download kind: {job.kind}"
+                    continue
+                job.status = "queued"
+                self._schedule(job)
+                requeued += 1
+            self._save(force=True)
+        if requeued:
+            print(f"[download] resuming {requeued} unfinished download job(s)")
+        return requeued
+
+    def get(self, job_id: str) -> Optional[DownloadJob]:
+        return self._jobs.get(job_id)
+
+    def latest(self, name: str) -> Optional[DownloadJob]:
+        """Most recent job for `name` (or for one of its parts, e.g. `piper-tts:<voice>`)."""
+        for job in reversed(list(self._jobs.values())):
+            if job.name == name or job.name.startswith(name + ":"):
+                return job
+        return None
+
+    def list(self) -> list[dict]:
+        return [job.info() for job in reversed(list(self._jobs.values()))]
+
+    def cancel(self, job_id: str) -> Optional[DownloadJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job.cancel_event.set()
+            if job.future is not None and job.future.cancel():
+                # Never started; the worker will not run it to record the cancellation itself
+                job.status = "cancelled"
+                job.finished = time.time()
+                self._save(force=True)
+        return job
+
+    def stats(self) -> dict:
+        jobs = list(self._jobs.values())
+        return {
+            "max_jobs": self.max_jobs,
+            "queued": sum(j.status == "queued" for j in jobs),
+            "running": sum(j.status == "running" for j in jobs),
+            "failed": sum(j.status == "failed" for j in jobs),
+        }
+
+    def shutdown(self) -> None:
+        # Save first: interrupted jobs stay queued on disk and resume on the next start
+        self._save(force=True)
+        self._stopping = True
+        for job in self._jobs.values():
+            job.cancel_event.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,287 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+# Seconds; covers sub-millisecond cache hits up to multi-minute model loads
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_request_model: contextvars.ContextVar[str] = contextvars.ContextVar("request_model", default="")
+_request_stages: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_stages", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_num(value)}"
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; `collect` replaces all series with a callback's output at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._collect: Optional[Callable[[], Iterable[tuple[dict, float]]]] = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self, fn: Callable[[], Iterable[tuple[dict, float]]]) -> None:
+        self._collect = fn
+
+    def _samples(self) -> Iterator[str]:
+        if self._collect is not None:
+            try:
+                fresh = {self._key(labels): float(value) for labels, value in self._collect()}
+            except Exception as exc:
+                print(f"[metrics] collecting {self.name} failed: {exc}")
+                fresh = {}
+            with self._lock:
+                self._values = fresh
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_num(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%s"' % _num(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text format; no client library needed."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labelnames: Iterable[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "shabda_stage_seconds",
+    "Time spent per request stage (queue_wait, model_load, warmup, tokenization, preprocess, inference, encoding, transport, upstream, relay)",
+    ("stage", "model"),
+)
+REQUESTS = metrics.counter("shabda_requests_total", "Requests served, by route and status", ("route", "status"))
+REQUEST_SECONDS = metrics.histogram("shabda_request_seconds", "End-to-end request latency", ("route",))
+INFLIGHT = metrics.gauge("shabda_inflight_requests", "Requests currently being served", ("route",))
+CACHE_EVENTS = metrics.counter("shabda_cache_events_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+MODELS_LOADED = metrics.gauge("shabda_models_loaded", "Models resident in memory", ("runtime",))
+MODEL_RESIDENT_BYTES = metrics.gauge("shabda_model_resident_bytes", "Estimated resident memory per loaded model", ("runtime", "model"))
+
+
+# ----- per-request context -----
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def begin_request(request_id: Optional[str] = None, model: str = "") -> str:
+    """Start tracking stages for the current task; returns the (possibly new) request id."""
+    rid = (request_id or "").strip()[:128] or new_request_id()
+    _request_id.set(rid)
+    _request_model.set(model)
+    _request_stages.set({})
+    return rid
+
+
+def set_request_model(model: str) -> None:
+    _request_model.set(model)
+
+
+# Model names become label values only once something vouches for them, and never more than this many
+MAX_MODEL_LABELS = 256
+_known_models: set[str] = set()
+_known_lock = threading.Lock()
+
+
+def mark_model_known(model: str) -> None:
+    """Record a model name as real (resolved, loaded, or served by an engine) so it gets its own label."""
+    if not model:
+        return
+    with _known_lock:
+        if len(_known_models) < MAX_MODEL_LABELS:
+            _known_models.add(model)
+
+
+def model_label(model: str, resolve: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Label value for a client-supplied model name. Clients pick the name, so it
+    is used only when it was marked known or `resolve` confirms it; anything
+    else is "other", keeping the number of series bounded.
+    """
+    if not model or model in _known_models:
+        return model
+    if resolve is not None and resolve(model):
+        mark_model_known(model)
+        if model in _known_models:
+            return model
+    return "other"
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def request_stages() -> dict:
+    """Milliseconds per stage recorded so far for the current request."""
+    return {k: round(v * 1000, 1) for k, v in (_request_stages.get() or {}).items()}
+
+
+def observe_stage(stage: str, seconds: float, model: Optional[str] = None) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage, model=model if model is not None else _request_model.get())
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str, model: Optional[str] = None) -> Iterator[None]:
+    """Time a block as one stage of the current request (and in the stage histogram)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started, model)
+
+
+def timed_iter(iterable: Iterable[T], name: str, model: Optional[str] = None) -> Iterator[T]:
+    """Yield from `iterable`, recording only the time spent producing items (not the consumer's) as one stage."""
+    it = iter(iterable)
+    total = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter() - started
+            yield item
+    finally:
+        observe_stage(name, total, model)
+
+
+def cache_event(cache: str, hit: bool) -> None:
+    CACHE_EVENTS.inc(cache=cache, result="hit" if hit else "miss")
@@ -1,11 +1,13 @@
 import json
-import os
-import shutil
+import re
+import urllib.parse
 import urllib.request
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional, Union
 
-from .config import models_root, data_root
+from .config import data_root, hf_endpoint, models_root
+from .download_manager import current_job, fetch, request_headers
 
 
 def ensure_model_dir(name: str) -> Path:
@@ -28,69 +30,128 @@ def _filename_from_url(url: str) -> str:
     return base.split("/")[-1]
 
 
-def download_file(url: str, dest_path: Path, resume: bool = True) -> Path:
-    dest_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = dest_path.with_suffix(dest_path.suffix + ".part")
-
-    headers: dict[str, str] = {
-        "User-Agent": "shabdabhav/1.0",
-        "Accept": "application/octet-stream, */*",
-    }
-    # Optional: Hugging Face token for authenticated downloads
-    hf_token = os.getenv("HUGGINGFACE_TOKEN")
-    if hf_token:
-        headers["Authorization"] = f"Bearer {hf_token}"
-    mode = "wb"
-    if resume and tmp_path.exists():
-        existing = tmp_path.stat().st_size
-        headers["Range"] = f"bytes={existing}-"
-        mode = "ab"
-
-    req = urllib.request.Request(url, headers=headers)
-    with urllib.request.urlopen(req) as resp, open(tmp_path, mode) as f:
-        shutil.copyfileobj(resp, f, length=1024 * 1024)
-
-    tmp_path.replace(dest_path)
-    return dest_path
+def download_file(url: str, dest_path: Path, resume: bool = True, sha256: Optional[str] = None) -> Path:
+    """
+    Fetch `url` to `dest_path` with parallel range requests, verifying the
+    sha256 Hugging Face publishes for the file (or the one given). Partial
+    downloads resume unless `resume` is False.
+    """
+    if not resume:
+        for suffix in (".part", ".part.json"):
+            dest_path.with_suffix(dest_path.suffix + suffix).unlink(missing_ok=True)
+    return fetch(url, dest_path, sha256=sha256)
 
 
-def download_model(name: str, url: str, format_hint: Optional[str] = None) -> dict:
+def download_model(name: str, url: str, format_hint: Optional[str] = None, sha256: Optional[str] = None) -> dict:
     base = ensure_model_dir(name)
     filename = _filename_from_url(url)
     if format_hint and not filename.endswith(f".{format_hint}"):
         # keep remote filename but record hint
         pass
     target = base / filename
-    path = download_file(url, target, resume=True)
+    path = download_file(url, target, resume=True, sha256=sha256)
     meta = {"name": name, "file": path.name, "url": url, "format": format_hint}
     (base / "model.json").write_text(json.dumps(meta, indent=2))
     return {"status": "downloaded", "path": str(path)}
 
 
+# -------------------- Hugging Face repositories --------------------
+
+_NEXT_LINK = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+
+def hf_repo_files(repo_id: str, revision: str = "main", repo_type: str = "model") -> list[dict]:
+    """Files of a Hub repository with their sizes and, for LFS files, sha256 (from the Hub's tree API)."""
+    url = f"{hf_endpoint()}/api/{repo_type}s/{repo_id}/tree/{revision}?recursive=true"
+    files: list[dict] = []
+    while url:
+        req = urllib.request.Request(url, headers=request_headers({"Accept": "application/json"}))
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            entries = json.load(resp)
+            # Large repositories are paged; the next page is in the Link header
+            link = _NEXT_LINK.search(resp.headers.get("Link") or "")
+        url = urllib.parse.urljoin(url, link.group(1)) if link else None
+        for entry in entries:
+            if entry.get("type") == "file":
+                lfs = entry.get("lfs") or {}
+                files.append({"path": entry["path"], "size": entry.get("size"), "sha256": lfs.get("oid")})
+    return files
+
+
+def hf_snapshot(
+    repo_id: str,
+    local_dir: Path,
+    allow_patterns: Union[str, Iterable[str], None] = None,
+    revision: str = "main",
+    repo_type: str = "model",
+) -> list[str]:
+    """
+    Download the files of a Hub repository (those matching `allow_patterns`)
+    into `local_dir` with `fetch`: parallel ranges, resume and sha256 checks
+    for LFS files. Byte progress for every file goes to the current download job.
+    """
+    patterns = [allow_patterns] if isinstance(allow_patterns, str) else list(allow_patterns or [])
+    files = hf_repo_files(repo_id, revision, repo_type)
+    if patterns:
+        files = [f for f in files if any(fnmatch(f["path"], p) for p in patterns)]
+    if not files:
+        raise ValueError(f"{repo_id}: no files match {patterns}")
+    job = current_job()
+    if job is not None:
+        for f in files:
+            job.expect(f["path"], f["size"])
+
+    prefix = "" if repo_type == "model" else f"{repo_type}s/"
+    for f in files:
+        dest = Path(local_dir) / f["path"]
+        # Small non-LFS files (configs) carry no sha256; an existing file of the right size is kept
+        if not f["sha256"] and dest.exists() and dest.stat().st_size == f["size"]:
+            if job is not None:
+                job.report(f["path"], f["size"], f["size"])
+            continue
+        url = f"{hf_endpoint()}/{prefix}{repo_id}/resolve/{revision}/{urllib.parse.quote(f['path'])}"
+        fetch(url, dest, sha256=f["sha256"], label=f["path"])
+    return [f["path"] for f in files]
+
+
 # -------------------- Whisper GGUF/BIN helpers --------------------
 
-_WHISPER_MAP: dict[str, str] = {
-    # canonical names -> direct URLs on HF
-    "ggml-base.en.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-base.en.bin",
-    "ggml-base.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-base.bin",
-    "ggml-small.en.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-small.en.bin",
-    "ggml-small.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-small.bin",
-    "ggml-medium.en.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-medium.en.bin",
-    "ggml-medium.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-medium.bin",
-    "ggml-large.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large.bin",
-    "ggml-large-v2.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v2.bin",
-    "ggml-large-v3.bin": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v3.bin",
-}
+_WHISPER_FILES = (
+    "ggml-base.en.bin",
+    "ggml-base.bin",
+    "ggml-small.en.bin",
+    "ggml-small.bin",
+    "ggml-medium.en.bin",
+    "ggml-medium.bin",
+    "ggml-large.bin",
+    "ggml-large-v2.bin",
+    "ggml-large-v3.bin",
+)
+
+
+def _whisper_url(filename: str) -> Optional[str]:
+    # canonical names -> direct URLs on HF (or the HF_ENDPOINT mirror)
+    if filename not in _WHISPER_FILES:
+        return None
+    return f"{hf_endpoint()}/ggerganov/whisper.cpp/resolve/main/{filename}"
+
+
+def _whisper_filename(name_or_file: str) -> str:
+    # If alias without extension, prefer .bin mapping if present
+    if name_or_file.endswith(".bin") or name_or_file.endswith(".gguf"):
+        return name_or_file
+    return f"{name_or_file}.bin"
+
+
+def whisper_known(name_or_file: str) -> bool:
+    return _whisper_url(_whisper_filename(name_or_file)) is not None
 
 
 def download_whisper(name_or_file: str, url: Optional[str] = None) -> dict:
     # Name may be a canonical file name or an alias (e.g. ggml-large-v3)
-    filename = name_or_file
-    if not (filename.endswith(".bin") or filename.endswith(".gguf")):
-        # If alias without extension, prefer .bin mapping if present
-        filename = f"{name_or_file}.bin"
+    filename = _whisper_filename(name_or_file)
     if url is None:
-        url = _WHISPER_MAP.get(filename)
+        url = _whisper_url(filename)
     if not url:
         raise ValueError("Unknown whisper model name; provide a direct url")
     # Use directory name without extension for clarity
@@ -98,85 +159,35 @@ def download_whisper(name_or_file: str, url: Optional[str] = None) -> dict:
     return download_model(dir_name, url, format_hint=filename.rsplit(".", 1)[-1])
 
 
-# -------------------- Parler-TTS (PyTorch) via huggingface_hub --------------------
+# -------------------- Parler-TTS (PyTorch) snapshots --------------------
 
 def download_parler_tts(model_id: str) -> dict:
-    """Download model snapshot into models dir using huggingface_hub.
+    """Download model snapshot into models dir.
     Examples: "parler-tts/parler-tts-mini-v1"
     """
-    try:
-        from huggingface_hub import snapshot_download
-    except Exception as exc:
-        raise RuntimeError("huggingface_hub is required to download Parler-TTS. Install it or mount the model.") from exc
-
     local_dir = models_root() / model_id
     local_dir.mkdir(parents=True, exist_ok=True)
-    snapshot_download(repo_id=model_id, local_dir=str(local_dir), resume_download=True)
+    hf_snapshot(model_id, local_dir)
     return {"status": "downloaded", "path": str(local_dir)}
 
 
-# -------------------- Piper voices (ONNX datasets) into data directory --------------------
+# -------------------- Piper voices (ONNX) into data directory --------------------
 
 def download_piper_voice(voice_pattern: str) -> dict:
     """Download Piper voice files into data directory under piper-tts.
     voice_pattern should be a path like:
       en/en_US/amy/medium/en_US-amy-medium.onnx
-    We will fetch both .onnx and .onnx.json adjacent files.
+    or a glob such as en/en_US/amy/medium/*. A bare .onnx also fetches its .onnx.json.
     """
     base = data_root() / "piper-tts"
     base.mkdir(parents=True, exist_ok=True)
-
-    # First try using huggingface_hub if available (fast and robust for directories)
-    try:
-        from huggingface_hub import snapshot_download  # type: ignore
-        snapshot_download(
-            repo_id="rhasspy/piper-voices",
-            local_dir=str(base),
-            allow_patterns=voice_pattern,
-            resume_download=True,
-        )
-        # Also fetch matching json if only .onnx matched
-        if voice_pattern.endswith(".onnx"):
-            json_pattern = voice_pattern + ".json"
-            try:
-                snapshot_download(
-                    repo_id="rhasspy/piper-voices",
-                    local_dir=str(base),
-                    allow_patterns=json_pattern,
-                    resume_download=True,
-                )
-            except Exception:
-                pass
-    except Exception:
-        # Fallback to direct HTTP without huggingface_hub
-        # Construct raw URLs to dataset
-        # https://huggingface.co/datasets/rhasspy/piper-voices/resolve/main/<voice>
-        def _hf_dataset_url(rel_path: str) -> str:
-            return f"https://huggingface.co/datasets/rhasspy/piper-voices/resolve/main/{rel_path}"
-
-        # Ensure nested directories
-        dest_dir = base / str(Path(voice_pattern).parent)
-        dest_dir.mkdir(parents=True, exist_ok=True)
-
-        # Download .onnx
-        onnx_url = _hf_dataset_url(voice_pattern)
-        onnx_dest = base / voice_pattern
-        download_file(onnx_url, onnx_dest, resume=True)
-
-        # Download .json sidecar if present
-        json_url = _hf_dataset_url(voice_pattern + ".json")
-        json_dest = base / (voice_pattern + ".json")
-        try:
-            download_file(json_url, json_dest, resume=True)
-        except Exception:
-            # Optional; some voices might have metadata under different naming
-            pass
+    patterns = [voice_pattern]
+    if voice_pattern.endswith(".onnx"):
+        patterns.append(voice_pattern + ".json")
+    hf_snapshot("rhasspy/piper-voices", base, allow_patterns=patterns)
 
     # Create minimal marker config for discovery if missing
     cfg = base / "config.json"
     if not cfg.exists():
         cfg.write_text(json.dumps({}, indent=2))
     return {"status": "downloaded", "path": str(base / str(Path(voice_pattern).parent))}
-
-
-
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .config import (
+    engine_workers,
+    onnx_graph_optimization,
+    onnx_inter_op_threads,
+    onnx_intra_op_threads,
+    onnx_mmap_weights,
+    onnx_optimized_cache_dir,
+    onnx_shared_threads,
+)
+
+_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+_WEIGHTS_FILE = "weights.bin"
+
+_threads_lock = threading.Lock()
+# Decided once per process: ORT refuses per-session pools once the global ones exist
+_shared_threads: bool | None = None
+
+
+def _ort():
+    import onnxruntime
+
+    return onnxruntime
+
+
+def _level() -> str:
+    level = onnx_graph_optimization()
+    if level not in _LEVELS:
+        print(f"[onnx] unknown ONNX_GRAPH_OPTIMIZATION {level!r}, using extended")
+        return "extended"
+    return level
+
+
+def _session_intra_threads() -> int:
+    # Per-session pools: split the cores between the Piper workers that run sessions
+    # at once, instead of ORT's default of a thread per core in every session
+    configured = onnx_intra_op_threads()
+    if configured:
+        return configured
+    return max(1, (os.cpu_count() or 1) // engine_workers("piper"))
+
+
+def _use_shared_threads(ort) -> bool:
+    global _shared_threads
+    with _threads_lock:
+        if _shared_threads is None:
+            _shared_threads = False
+            if onnx_shared_threads():
+                # Only some ORT builds export the global pool setter; stock PyPI wheels mostly do not
+                setter = getattr(ort, "set_global_thread_pool_sizes", None)
+                try:
+                    if setter is None:
+                        raise RuntimeError("this onnxruntime build has no global thread pools")
+                    setter(onnx_intra_op_threads(), onnx_inter_op_threads())
+                    _shared_threads = True
+                except Exception as exc:
+                    print(
+                        f"[onnx] WARNING: shared thread pool unavailable ({exc}); "
+                        f"each session gets {_session_intra_threads()} intra-op thread(s)"
+                    )
+        return _shared_threads
+
+
+def session_options(level: str | None = None) -> Any:
+    """
+    SessionOptions from the ONNX_* settings. With ONNX_SHARED_THREADS, and an
+    ORT build that has global thread pools, every session in the process runs
+    on one intra-op and one inter-op pool sized by ONNX_INTRA_OP_THREADS and
+    ONNX_INTER_OP_THREADS. Otherwise each session gets its own small pool (the
+    cores divided by the Piper workers unless ONNX_INTRA_OP_THREADS is set), so
+    several resident voices do not each start a thread per core.
+    """
+    ort = _ort()
+    options = ort.SessionOptions()
+    if _use_shared_threads(ort):
+        options.use_per_session_threads = False
+    else:
+        options.intra_op_num_threads = _session_intra_threads()
+        options.inter_op_num_threads = onnx_inter_op_threads()
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, _LEVELS[level or _level()])
+    return options
+
+
+def _cache_entry(model_path: Path, level: str) -> Path | None:
+    cache_dir = onnx_optimized_cache_dir()
+    if cache_dir is None or level == "disable":
+        return None
+    stat = model_path.stat()
+    # Any change to the source model, ORT version or settings yields a new entry
+    ident = json.dumps([str(model_path.resolve()), stat.st_size, stat.st_mtime_ns, _ort().__version__, level, onnx_mmap_weights(), platform.machine()])
+    return cache_dir / f"{model_path.stem}-{hashlib.sha256(ident.encode()).hexdigest()[:16]}"
+
+
+def _optimize(model_path: Path, entry: Path, level: str) -> Path | None:
+    """Optimize `model_path` once and serialize the result into `entry`; concurrent workers race, one rename wins."""
+    ort = _ort()
+    staging = entry.with_name(f"{entry.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    options = session_options(level)
+    options.optimized_model_filepath = str(staging / "model.onnx")
+    if onnx_mmap_weights():
+        # Weights go to a side file that ORT maps read-only when the cached model loads
+        options.add_session_config_entry("session.optimized_model_external_initializers_file_name", _WEIGHTS_FILE)
+        options.add_session_config_entry("session.optimized_model_external_initializers_min_size_in_bytes", "1024")
+    started = time.perf_counter()
+    try:
+        ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
+        os.rename(staging, entry)
+    except OSError:
+        # Another worker cached it first
+        shutil.rmtree(staging, ignore_errors=True)
+    except Exception as exc:
+        shutil.rmtree(staging, ignore_errors=True)
+        print(f"[onnx] cannot cache optimized {model_path.name}: {exc}")
+        return None
+    print(f"[onnx] optimized {model_path.name} ({level}) in {time.perf_counter() - started:.2f}s, cached in {entry}")
+    return entry / "model.onnx"
+
+
+def load_session(model_path: str | Path, use_cuda: bool = False) -> Any:
+    """
+    An InferenceSession for `model_path` tuned by the ONNX_* settings.
+
+    On CPU the graph is optimized once per host and served from
+    ONNX_OPTIMIZED_CACHE afterwards, skipping optimization on later loads and
+    in other workers. With ONNX_MMAP_WEIGHTS the cached weights live in a
+    separate file that ORT memory-maps, so processes loading the same voice
+    share its pages instead of each holding a private copy. CUDA sessions
+    load the original model.
+    """
+    ort = _ort()
+    model_path = Path(model_path)
+    level = _level()
+    if use_cuda:
+        providers = [("CUDAExecutionProvider", {"cudnn_conv_algo_search": "HEURISTIC"})]
+        return ort.InferenceSession(str(model_path), sess_options=session_options(level), providers=providers)
+
+    entry = _cache_entry(model_path, level)
+    cached = None
+    if entry is not None:
+        cached = entry / "model.onnx"
+        if not cached.exists():
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            cached = _optimize(model_path, entry, level)
+    if cached is not None:
+        try:
+            # Already optimized: loading it again only has to map the weights
+            return ort.InferenceSession(str(cached), sess_options=session_options("disable"), providers=["CPUExecutionProvider"])
+        except Exception as exc:
+            print(f"[onnx] cached {cached} unusable, loading {model_path.name}: {exc}")
+            shutil.rmtree(entry, ignore_errors=True)
+    return ort.InferenceSession(str(model_path), sess_options=session_options(level), providers=["CPUExecutionProvider"])
+
+
+def load_piper_voice(model_path: str | Path, config_path: str | Path | None = None, use_cuda: bool = False) -> Any:
+    """PiperVoice.load with the session from load_session instead of a default one."""
+    from piper import PiperVoice
+    from piper.config import PiperConfig
+
+    config_path = config_path or f"{model_path}.json"
+    with open(config_path, "r", encoding="utf-8") as fh:
+        config = PiperConfig.from_dict(json.load(fh))
+    return PiperVoice(config=config, session=load_session(model_path, use_cuda=use_cuda))
+
+
+def settings() -> dict:
+    """Effective ONNX Runtime settings, for health and benchmark output."""
+    cache_dir = onnx_optimized_cache_dir()
+    shared = _shared_threads
+    if shared is None:
+        pool = "not started"
+    elif shared:
+        pool = "shared"
+    else:
+        pool = "per-session" + (" (shared unavailable)" if onnx_shared_threads() else "")
+    return {
+        "thread_pool": pool,
+        "intra_op_threads": onnx_intra_op_threads() if shared else _session_intra_threads(),
+        "inter_op_threads": onnx_inter_op_threads(),
+        "graph_optimization": _level(),
+        "optimized_cache": str(cache_dir) if cache_dir else None,
+        "mmap_weights": onnx_mmap_weights(),
+    }
@@ -0,0 +1,181 @@
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from .audio import silence, wav_header
+from .config import preload_models, preload_profile_path
+from .metrics import mark_model_known, metrics, observe_stage, set_request_model
+
+# Two sentences with a number and punctuation, so warm-up touches the phonemizer and segmenter paths requests use
+DEFAULT_WARMUP_TEXT = "Hello, and welcome. This short sentence, read at 10:30 on March 3rd, warms up the voice."
+
+READY = metrics.gauge("shabda_ready", "1 once startup preload and warm-up have finished")
+
+
+@dataclass
+class PreloadItem:
+    """One model (and, for Piper, voice) to load and warm up at startup."""
+
+    runtime: str
+    model: str
+    voice: Optional[str] = None
+    text: Optional[str] = None
+    description: Optional[str] = None
+    runs: int = 1
+
+    @property
+    def key(self) -> str:
+        return f"{self.runtime}:{self.model}" + (f"@{self.voice}" if self.voice else "")
+
+
+def parse_item(spec: str) -> PreloadItem:
+    """Inline form `<runtime>:<model>[@<voice>]`, e.g. `piper:piper-tts@en/en_US/amy/medium/en_US-amy-medium.onnx`."""
+    runtime, _, rest = spec.strip().partition(":")
+    model, _, voice = rest.partition("@")
+    if not runtime or not model:
+        raise ValueError(f"bad preload entry {spec!r}; expected <runtime>:<model>[@<voice>]")
+    return PreloadItem(runtime=runtime.strip(), model=model.strip(), voice=voice.strip() or None)
+
+
+def load_profile(extra: Optional[list[str]] = None) -> list[PreloadItem]:
+    """
+    The preload profile: entries of the PRELOAD_PROFILE JSON file, then the
+    inline PRELOAD_MODELS entries (and `extra`), without duplicates.
+
+    File format:
+        {"text": "default warm-up text",
+         "models": [{"runtime": "piper", "model": "piper-tts", "voice": "en/en_US/amy/medium/en_US-amy-medium.onnx"},
+                    {"runtime": "parler", "model": "parler-tts/parler-tts-mini-v1", "description": "A calm voice.", "runs": 2},
+                    {"runtime": "whisper", "model": "openai/whisper-small"}]}
+    """
+    items: list[PreloadItem] = []
+    default_text = None
+    path = preload_profile_path()
+    if path is not None:
+        try:
+            raw = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            print(f"[preload] cannot read profile {path}: {exc}")
+            raw = {}
+        default_text = raw.get("text")
+        for entry in raw.get("models", []):
+            try:
+                items.append(
+                    PreloadItem(
+                        runtime=str(entry["runtime"]),
+                        model=str(entry["model"]),
+                        voice=entry.get("voice"),
+                        text=entry.get("text"),
+                        description=entry.get("description"),
+                        runs=max(0, int(entry.get("runs", 1))),
+                    )
+                )
+            except (KeyError, TypeError, ValueError) as exc:
+                print(f"[preload] skipping bad profile entry {entry!r}: {exc}")
+    for spec in preload_models() + list(extra or []):
+        try:
+            items.append(parse_item(spec))
+        except ValueError as exc:
+            print(f"[preload] {exc}")
+    unique: dict[str, PreloadItem] = {}
+    for item in items:
+        if item.text is None:
+            item.text = default_text
+        unique.setdefault(item.key, item)
+    return list(unique.values())
+
+
+def silent_wav(seconds: float = 1.0, sample_rate: int = 16000) -> bytes:
+    """Short 16 kHz silence for warming up speech recognizers."""
+    pcm = silence(sample_rate, seconds * 1000)
+    return wav_header(sample_rate, data_bytes=len(pcm)) + pcm
+
+
+@dataclass
+class _ItemState:
+    status: str = "pending"
+    load_ms: Optional[float] = None
+    warmup_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class Readiness:
+    """
+    Startup preload progress of this process. `/health` reports not-ready
+    (503, status "warming") until every profile entry has been loaded and
+    warmed up; a failed entry is reported but does not hold readiness back.
+    """
+
+    state: str = "ready"
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    models: dict[str, _ItemState] = field(default_factory=dict)
+
+    def __post_init__(self):
+        READY.collect(lambda: [({}, int(self.ready))])
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def info(self) -> dict:
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else None
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "seconds": round(elapsed, 3) if elapsed is not None else None,
+            "pending": [k for k, s in self.models.items() if s.status in ("pending", "loading", "warming")],
+            "models": {k: vars(s) for k, s in self.models.items()},
+        }
+
+
+# runtime -> (load, warm); both take the item (warm also the text) and are awaited
+Warmer = tuple[Callable[[PreloadItem], Awaitable[object]], Callable[[PreloadItem, str], Awaitable[object]]]
+
+
+async def preload(items: list[PreloadItem], warmers: dict[str, Warmer], readiness: Readiness, service: str) -> None:
+    """Load and warm up `items` one after another, recording timings in `readiness` and logging them per model."""
+    served = [item for item in items if item.runtime in warmers]
+    for item in items:
+        if item.runtime not in warmers:
+            print(f"[preload] {service}: {item.key} skipped, runtime not served here")
+    if not served:
+        readiness.state = "ready"
+        return
+    readiness.state = "warming"
+    readiness.started = time.time()
+    readiness.models = {item.key: _ItemState() for item in served}
+    total = time.perf_counter()
+    for item in served:
+        state = readiness.models[item.key]
+        load, warm = warmers[item.runtime]
+        # Labels the model_load/inference stages the loaders record; configured models are real names
+        mark_model_known(item.model)
+        set_request_model(item.model)
+        try:
+            state.status = "loading"
+            started = time.perf_counter()
+            await load(item)
+            state.load_ms = round((time.perf_counter() - started) * 1000, 1)
+            state.status = "warming"
+            started = time.perf_counter()
+            for _ in range(item.runs):
+                await warm(item, item.text or DEFAULT_WARMUP_TEXT)
+            seconds = time.perf_counter() - started
+            state.warmup_ms = round(seconds * 1000, 1)
+            if item.runs:
+                observe_stage("warmup", seconds, item.model)
+            state.status = "ready"
+            print(f"[preload] {service}: {item.key} loaded in {state.load_ms:.0f} ms, warm-up {state.warmup_ms:.0f} ms ({item.runs} run(s))")
+        except Exception as exc:
+            state.status = "failed"
+            state.error = str(exc)
+            print(f"[preload] {service}: {item.key} failed: {exc}")
+    set_request_model("")
+    readiness.finished = time.time()
+    readiness.state = "ready"
+    failed = sum(s.status == "failed" for s in readiness.models.values())
+    print(f"[preload] {service}: ready after {time.perf_counter() - total:.1f}s ({len(served) - failed}/{len(served)} models warm)")
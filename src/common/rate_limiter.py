@@ -1,29 +1,367 @@
+import asyncio
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
 import time
-from collections import deque, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
 from fastapi import Request, HTTPException
 
+from .auth import get_allowed_tokens
+from .config import (
+    rate_limit_backend,
+    rate_limit_redis_url,
+    rate_limit_requests,
+    rate_limit_route_costs,
+    rate_limit_shm_path,
+    rate_limit_shm_slots,
+    rate_limit_trust_proxy,
+    rate_limit_window_seconds,
+)
+
+# (allowed, seconds until the request would be allowed)
+Decision = tuple[bool, float]
+
+
+class MemoryBackend:
+    """
+    In-process GCRA: one float ("theoretical arrival time") per client.
+
+    A key whose TAT is in the past is indistinguishable from a new client, so
+    idle keys are dropped by a periodic sweep and memory stays bounded by the
+    number of clients active within one window.
+    """
+
+    def __init__(self, max_keys: int = 100_000, sweep_every: float = 30.0):
+        self._tat: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+        self.sweep_every = sweep_every
+        self._last_sweep = time.monotonic()
+
+    def _sweep(self, now: float) -> None:
+        self._tat = {k: t for k, t in self._tat.items() if t > now}
+        if len(self._tat) > self.max_keys:
+            # Still too many active clients: keep the ones with the most debt
+            keep = sorted(self._tat.items(), key=lambda kv: kv[1], reverse=True)[: self.max_keys // 2]
+            self._tat = dict(keep)
+        self._last_sweep = time.monotonic()
+
+    async def hit(self, key: str, cost: float, limit: int, window: float) -> Decision:
+        now = time.time()
+        interval = window / limit
+        with self._lock:
+            if time.monotonic() - self._last_sweep > self.sweep_every or len(self._tat) > self.max_keys:
+                self._sweep(now)
+            tat = max(self._tat.get(key, now), now) + interval * cost
+            if tat - now > window:
+                return False, tat - now - window
+            self._tat[key] = tat
+        return True, 0.0
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "keys": len(self._tat)}
+
+
+class SharedMemoryBackend:
+    """
+    GCRA shared by every worker process on a host through an mmap'd table.
+
+    The table has a fixed number of 16-byte slots (key hash, TAT) addressed by
+    open addressing, after a 16-byte header holding a format tag and the count
+    of occupied slots. Slots whose TAT has passed are cleared when a probe
+    passes over them, so memory is constant regardless of how many clients
+    have ever been seen. Updates are serialized with an flock on the backing
+    file, taken off the event loop.
+    """
+
+    _SLOT = struct.Struct("<Qd")
+    _HEADER = struct.Struct("<QQ")
+    _MAGIC = 0x53484244524C3031  # "SHBDRL01"
+    _PROBES = 32
+
+    def __init__(self, path: Path, slots: int):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = Path(path)
+        self.slots = slots
+        size = self._HEADER.size + slots * self._SLOT.size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        with self._locked():
+            if os.fstat(self._fd).st_size != size:
+                # New file, or one laid out for another slot count: start empty
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+            magic, _ = self._HEADER.unpack_from(self._map, 0)
+            if magic != self._MAGIC:
+                self._map[:] = bytes(size)
+                self._HEADER.pack_into(self._map, 0, self._MAGIC, 0)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _offset(self, idx: int) -> int:
+        return self._HEADER.size + idx * self._SLOT.size
+
+    def _hit(self, key: str, cost: float, limit: int, window: float) -> Decision:
+        now = time.time()
+        interval = window / limit
+        h = self._hash(key)
+        with self._locked():
+            _, live = self._HEADER.unpack_from(self._map, 0)
+            slot, tat, free, oldest = None, now, None, None
+            for i in range(self._PROBES):
+                idx = (h + i) % self.slots
+                kh, t = self._SLOT.unpack_from(self._map, self._offset(idx))
+                if kh == h:
+                    slot, tat = idx, t
+                    break
+                if kh and t <= now:
+                    # Expired: reclaim it. Lookups scan all probes, so clearing never breaks a chain
+                    self._SLOT.pack_into(self._map, self._offset(idx), 0, 0.0)
+                    live -= 1
+                    kh = 0
+                if free is None and kh == 0:
+                    free = idx
+                if kh and (oldest is None or t < oldest[1]):
+                    oldest = (idx, t)
+            if slot is None:
+                slot = free if free is not None else oldest[0]
+                tat = now
+            new_tat = max(tat, now) + interval * cost
+            allowed = new_tat - now <= window
+            if allowed:
+                if slot == free:
+                    live += 1
+                self._SLOT.pack_into(self._map, self._offset(slot), h, new_tat)
+            self._HEADER.pack_into(self._map, 0, self._MAGIC, max(0, live))
+        return (True, 0.0) if allowed else (False, new_tat - now - window)
+
+    async def hit(self, key: str, cost: float, limit: int, window: float) -> Decision:
+        # flock can wait on another worker; never block the event loop on it
+        return await asyncio.to_thread(self._hit, key, cost, limit, window)
 
-class SlidingWindowRateLimiter:
-    def __init__(self, max_requests: int, window_seconds: int):
+    def stats(self) -> dict:
+        # Occupied slots; expired ones count until a probe reclaims them
+        _, live = self._HEADER.unpack_from(self._map, 0)
+        return {"backend": "shm", "path": str(self.path), "slots": self.slots, "active": live}
+
+
+class RespBackend:
+    """
+    Sliding-window counter in a Redis-protocol store (Redis, Valkey, KeyDB, or a
+    local stand-in that implements INCRBY/DECRBY/GET/EXPIRE).
+
+    Each client has a counter for the current and previous fixed window; the
+    rate is the current count plus the previous one weighted by how much of it
+    still overlaps the sliding window. Costs are stored in milli-units so
+    fractional route weights stay integers. If the store is unreachable the
+    limiter fails open rather than rejecting all traffic.
+    """
+
+    def __init__(self, url: str, prefix: str = "shabda:rl:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.prefix = prefix
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.errors = 0
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [f"*{len(args)}\r\n".encode()]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode()
+            out.append(f"${len(b)}\r\n".encode() + b + b"\r\n")
+        return b"".join(out)
+
+    async def _read_reply(self):
+        assert self._reader is not None
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("store closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = await self._reader.readexactly(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            return [await self._read_reply() for _ in range(int(rest))]
+        raise RuntimeError(f"unexpected reply: {line!r}")
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout=2)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            await self._pipeline(setup)
+
+    async def _pipeline(self, commands: list[tuple]) -> list:
+        assert self._writer is not None
+        self._writer.write(b"".join(self._encode(*c) for c in commands))
+        await self._writer.drain()
+        return [await self._read_reply() for _ in commands]
+
+    async def _execute(self, commands: list[tuple]) -> list:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None or self._writer.is_closing():
+                        await self._connect()
+                    return await asyncio.wait_for(self._pipeline(commands), timeout=2)
+                except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    self._writer = None
+                    if attempt:
+                        raise
+        return []
+
+    async def hit(self, key: str, cost: float, limit: int, window: float) -> Decision:
+        now = time.time()
+        w = max(1, int(window))
+        current = int(now // w)
+        weight = 1.0 - (now % w) / w
+        units = max(1, int(round(cost * 1000)))
+        cap = limit * 1000
+        cur_key = f"{self.prefix}{key}:{current}"
+        prev_key = f"{self.prefix}{key}:{current - 1}"
+        try:
+            count, _, prev = await self._execute(
+                [("INCRBY", cur_key, units), ("EXPIRE", cur_key, 2 * w), ("GET", prev_key)]
+            )
+            prev = int(prev or 0)
+            estimate = prev * weight + count
+            if estimate <= cap:
+                return True, 0.0
+            await self._execute([("DECRBY", cur_key, units)])
+        except Exception as exc:
+            self.errors += 1
+            print(f"[rate-limit] store unavailable, allowing request: {exc}")
+            return True, 0.0
+        # Time until the previous window's share has decayed enough (or the window rolls over)
+        wait = (estimate - cap) * w / prev if prev else w - (now % w)
+        return False, min(float(w), max(wait, 0.001))
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "target": f"{self.host}:{self.port}/{self.db}", "errors": self.errors}
+
+
+class RateLimiter:
+    """
+    Request limiter with pluggable storage: `max_requests` cost units per
+    `window_seconds`, per client identity. Route weights let expensive calls
+    (speech synthesis, transcription) consume more of the budget than cheap ones.
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float, backend=None, route_costs: dict[str, float] | None = None):
         self.max_requests = max_requests
         self.window = window_seconds
-        self._hits: dict[str, deque[float]] = defaultdict(deque)
+        self.backend = backend or MemoryBackend()
+        self.route_costs = route_costs or {}
+        self.allowed = 0
+        self.rejected = 0
 
-    def check(self, key: str) -> None:
-        now = time.time()
-        q = self._hits[key]
-        cutoff = now - self.window
-        while q and q[0] < cutoff:
-            q.popleft()
-        if len(q) >= self.max_requests:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        q.append(now)
+    def cost_for(self, path: str) -> float:
+        cost = self.route_costs.get(path)
+        if cost is None:
+            # Longest matching prefix, e.g. "/v1/models" for "/v1/models/download"
+            matches = [p for p in self.route_costs if p.endswith("*") and path.startswith(p[:-1])]
+            cost = self.route_costs[max(matches, key=len)] if matches else 1.0
+        return cost
+
+    async def acquire(self, key: str, cost: float = 1.0) -> None:
+        if cost <= 0:
+            return
+        # A request costing more than the whole burst could never fit the window;
+        # charge it the full burst so it waits for an idle quota instead of failing forever
+        cost = min(cost, float(self.max_requests))
+        allowed, retry_after = await self.backend.hit(key, cost, self.max_requests, self.window)
+        if allowed:
+            self.allowed += 1
+            return
+        self.rejected += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.max_requests,
+            "window_seconds": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            **self.backend.stats(),
+        }
+
+
+def build_rate_limiter() -> RateLimiter:
+    """Limiter configured from RATE_LIMIT_* environment variables."""
+    kind = rate_limit_backend()
+    if kind == "shm":
+        backend = SharedMemoryBackend(rate_limit_shm_path(), rate_limit_shm_slots())
+    elif kind in ("redis", "resp"):
+        backend = RespBackend(rate_limit_redis_url())
+    else:
+        backend = MemoryBackend()
+    return RateLimiter(rate_limit_requests(), rate_limit_window_seconds(), backend, rate_limit_route_costs())
 
 
 def client_key(request: Request) -> str:
+    """
+    Identity a quota is charged to: the bearer token or X-API-Key when it is
+    one of the configured API_TOKENS (hashed, never stored in clear), otherwise
+    the client IP without the port. Unchecked tokens never get a bucket of
+    their own, or a client could skip its limit by sending a new one each time.
+    """
+    token = request.headers.get("Authorization", "")
+    if token.startswith("Bearer "):
+        token = token[7:]
+    token = token.strip() or request.headers.get("X-API-Key", "").strip()
+    if token and token in get_allowed_tokens():
+        return "key:" + hashlib.sha256(token.encode()).hexdigest()[:24]
+    if rate_limit_trust_proxy():
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return "ip:" + forwarded.split(",")[0].strip()
     client = request.client
     if client is None:
         return "unknown"
-    return f"{client.host}:{client.port}"
-
-
+    return f"ip:{client.host}"
@@ -0,0 +1,53 @@
+import importlib.util
+from functools import lru_cache
+
+from .config import required_runtimes
+
+# Optional inference runtimes: the modules each needs and how to install them.
+# Checked with find_spec, which locates a package without importing it, so
+# validation costs milliseconds instead of loading torch at boot.
+RUNTIMES: dict[str, tuple[tuple[str, ...], str]] = {
+    "piper": (("piper", "onnxruntime"), "pip install .[piper-tts]"),
+    "parler": (("parler_tts", "transformers", "torch", "soundfile"), "pip install .[parler-tts]"),
+    "hf_whisper": (("transformers", "torch", "soundfile"), "pip install transformers torch soundfile"),
+    "xtts": (("TTS", "torch"), "pip install .[xtts]"),
+}
+
+
+@lru_cache(maxsize=None)
+def installed(module: str) -> bool:
+    # Cached: packages come with the image and do not appear while the server runs
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def check_runtimes(names: tuple[str, ...] | None = None) -> dict[str, dict]:
+    """{runtime: {"available", "missing", "install"}} for the named runtimes (all by default)."""
+    out = {}
+    for name in names or tuple(RUNTIMES):
+        modules, hint = RUNTIMES[name]
+        missing = [m for m in modules if not installed(m)]
+        out[name] = {"available": not missing, "missing": missing, "install": hint if missing else None}
+    return out
+
+
+def validate_runtimes(service: str, names: tuple[str, ...]) -> dict[str, dict]:
+    """
+    Log which of `names` are installed and raise RuntimeError if one listed in
+    REQUIRED_RUNTIMES is not. Packages are installed with the image, never by
+    the running server; a missing optional runtime only fails its own requests.
+    """
+    status = check_runtimes(names)
+    for name, info in status.items():
+        detail = "ok" if info["available"] else f"missing {', '.join(info['missing'])} ({info['install']})"
+        print(f"[{service}] runtime {name}: {detail}")
+    unmet = [name for name in required_runtimes() if name in status and not status[name]["available"]]
+    unknown = [name for name in required_runtimes() if name not in RUNTIMES]
+    if unknown:
+        print(f"[{service}] REQUIRED_RUNTIMES names unknown runtimes: {', '.join(unknown)}")
+    if unmet:
+        hints = "; ".join(f"{name}: {status[name]['install']}" for name in unmet)
+        raise RuntimeError(f"required runtimes not installed: {hints}")
+    return status
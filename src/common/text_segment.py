@@ -0,0 +1,109 @@
+import re
+
+# Sentence terminators by script; applied together since mixed-script text is common
+_TERMINATORS = ".!?…" + "。！？" + "।॥" + "؟۔" + "።"
+# Clause boundaries used when a sentence is still longer than `max_chars`
+_CLAUSE_BREAKS = ",;:—–" + "，；：、" + "،"
+
+# Words whose trailing period does not end a sentence, by language prefix
+_ABBREVIATIONS = {
+    "en": {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "approx", "no", "fig", "inc", "ltd", "co"},
+    "de": {"z.b", "bzw", "usw", "dr", "prof", "nr", "ca", "d.h"},
+    "fr": {"m", "mme", "mlle", "dr", "p.ex", "etc", "env"},
+    "es": {"sr", "sra", "srta", "dr", "dra", "etc", "p.ej", "ud", "uds"},
+}
+
+# A terminator must be followed by whitespace or the end, so "3.5" and "v1.2" stay intact
+_SENTENCE_END = re.compile(rf"([{re.escape(_TERMINATORS)}]+)([\"'”’»)\]]*)(\s+|$)")
+_NO_SPACE_END = re.compile(r"([。！？])")  # CJK terminators need no following space
+
+
+def _abbreviations(language: str | None) -> set[str]:
+    lang = (language or "en").lower().replace("-", "_").split("_")[0]
+    return _ABBREVIATIONS.get(lang, set()) | _ABBREVIATIONS["en"]
+
+
+def _is_abbreviation(before: str, abbreviations: set[str]) -> bool:
+    word = before.rsplit(None, 1)[-1] if before.strip() else ""
+    word = word.lstrip("(\"'“‘«").lower()
+    if not word:
+        return False
+    # Single initials ("J. R. Tolkien") and known abbreviations
+    return (len(word) == 1 and word.isalpha()) or word in abbreviations
+
+
+def split_sentences(text: str, language: str | None = None) -> list[str]:
+    """Split text into sentences, keeping terminators and closing quotes attached."""
+    text = re.sub(r"\s+", " ", text.replace("\r", " ")).strip()
+    if not text:
+        return []
+    text = _NO_SPACE_END.sub(r"\1 ", text)
+    abbreviations = _abbreviations(language)
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end(2)
+        if match.group(1) == "." and _is_abbreviation(text[start:match.start(1)], abbreviations):
+            continue
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    parts = []
+    current = ""
+    for piece in re.split(rf"(?<=[{re.escape(_CLAUSE_BREAKS)}])\s*", sentence):
+        if current and len(current) + 1 + len(piece) > max_chars:
+            parts.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}".strip() if current else piece
+    if current:
+        parts.append(current)
+    out = []
+    for part in parts:
+        # No clause boundary short enough: fall back to word boundaries
+        while len(part) > max_chars:
+            cut = part.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            out.append(part[:cut].strip())
+            part = part[cut:].strip()
+        if part:
+            out.append(part)
+    return out
+
+
+def segment_text(text: str, language: str | None = None, max_chars: int = 250, min_chars: int = 20) -> list[str]:
+    """
+    Split text into synthesis segments: sentences, with over-long sentences cut
+    at clause (then word) boundaries to at most `max_chars`, and very short
+    sentences merged into the following one so each model call has enough context.
+    """
+    segments: list[str] = []
+    carry = ""
+    for sentence in split_sentences(text, language):
+        for part in _split_long(sentence, max_chars):
+            candidate = f"{carry} {part}".strip() if carry else part
+            if len(candidate) < min_chars:
+                carry = candidate
+                continue
+            if carry and len(candidate) > max_chars:
+                segments.append(carry)
+                candidate = part
+            segments.append(candidate)
+            carry = ""
+    if carry:
+        if segments and len(segments[-1]) + 1 + len(carry) <= max_chars:
+            segments[-1] = f"{segments[-1]} {carry}"
+        else:
+            segments.append(carry)
+    return segments
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Callable, Optional, Sequence
+
+from src.common.affinity import rendezvous_order
+from src.gateway.h3_client import H3Response
+from src.gateway.quic_pool import QuicConnectionPool, _PooledConnection
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class EngineBackend:
+    """One engine (or engine worker port) behind the gateway, with its own connection pool and circuit."""
+
+    def __init__(self, index: int, base: str, pool: QuicConnectionPool):
+        self.index = index
+        self.key = str(index)  # hashed for model affinity; matches engine worker indexes
+        self.base = base
+        self.pool = pool
+        self.outstanding = 0
+        self.ewma_ms: Optional[float] = None
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.draining = False
+        self.warming = False
+        self.healthy: Optional[bool] = None
+        self.last_check = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        if self.draining or self.warming:
+            return False
+        if self.state == OPEN:
+            if now < self.open_until:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # One trial request decides whether the backend comes back
+            return not self.trial_in_flight
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "base": self.base,
+            "state": self.state,
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "warming": self.warming,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "pool": self.pool.stats(),
+        }
+
+
+class EngineLease:
+    """A request in flight on one backend; hand it back with `EngineBalancer.release`."""
+
+    def __init__(self, backend: EngineBackend, slot: _PooledConnection, stream_id: int, resp: H3Response):
+        self.backend = backend
+        self.slot = slot
+        self.stream_id = stream_id
+        self.resp = resp
+        self.started = time.perf_counter()
+        self.released = False
+
+    def cancel(self) -> None:
+        if self.slot.proto is not None:
+            self.slot.proto.cancel(self.stream_id)
+
+
+class EngineBalancer:
+    """
+    Spreads engine requests over several backends.
+
+    Requests that name a model go to the model's preferred backend (rendezvous
+    hash over backend positions, so warm models stay put and only the keys of
+    a lost backend move) unless it is ejected or carries more than
+    `load_factor` times its share of outstanding requests. Everything else
+    goes to the backend with the fewest outstanding requests, or the lowest
+    EWMA time-to-headers scaled by queue depth with the "ewma" policy.
+
+    Backends are ejected by a circuit breaker after `failure_threshold`
+    consecutive transport failures (requests or active `/health` checks) and
+    readmitted after `open_seconds` through a single trial. A backend whose
+    `/health` answers "draining", or "warming" while it preloads models,
+    receives no new requests unless no other backend is left.
+    """
+
+    def __init__(
+        self,
+        bases: Sequence[str],
+        pool_factory: Callable[[str], QuicConnectionPool],
+        policy: str = "least_outstanding",
+        affinity: bool = True,
+        load_factor: float = 2.0,
+        health_interval: float = 5.0,
+        failure_threshold: int = 3,
+        open_seconds: float = 10.0,
+        ewma_alpha: float = 0.3,
+    ):
+        if not bases:
+            raise ValueError("at least one engine backend is required")
+        self.backends = [EngineBackend(i, base, pool_factory(base)) for i, base in enumerate(bases)]
+        self.policy = policy
+        self.affinity = affinity
+        self.load_factor = load_factor
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.ewma_alpha = ewma_alpha
+        self._health_task: Optional[asyncio.Task] = None
+        self.affinity_hits = 0
+        self.affinity_spills = 0
+        self.retries = 0
+
+    # ----- selection -----
+
+    def _by_policy(self, candidates: list[EngineBackend]) -> EngineBackend:
+        random.shuffle(candidates)  # break ties without always favouring the first backend
+        if self.policy == "ewma":
+            # Unsampled backends score 0 so they get measured first
+            return min(candidates, key=lambda b: (b.ewma_ms or 0.0) * (b.outstanding + 1))
+        return min(candidates, key=lambda b: b.outstanding)
+
+    def pick(self, model: Optional[str] = None, exclude: Sequence[EngineBackend] = ()) -> EngineBackend:
+        now = time.monotonic()
+        remaining = [b for b in self.backends if b not in exclude]
+        if not remaining:
+            raise ConnectionError("no engine backend left to try")
+        candidates = [b for b in remaining if b.available(now)]
+        if not candidates:
+            # Everything is ejected: trying the backend that failed longest ago beats refusing outright
+            candidates = [min(remaining, key=lambda b: b.open_until)]
+        if model and self.affinity and len(candidates) > 1:
+            by_key = {b.key: b for b in candidates}
+            total = sum(b.outstanding for b in candidates)
+            cap = max(1, math.ceil(self.load_factor * (total + 1) / len(candidates)))
+            for i, key in enumerate(rendezvous_order(model, list(by_key))):
+                backend = by_key[key]
+                if backend.outstanding < cap:
+                    if i == 0:
+                        self.affinity_hits += 1
+                    else:
+                        self.affinity_spills += 1
+                    return backend
+        return self._by_policy(candidates)
+
+    # ----- request lifecycle -----
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        model: Optional[str] = None,
+        headers: Optional[list[tuple[bytes, bytes]]] = None,
+        body: Optional[bytes] = None,
+        end_stream: bool = True,
+        exclude: Sequence[EngineBackend] = (),
+    ) -> EngineLease:
+        """Open a request stream on the chosen backend, moving on to the next one if it cannot connect."""
+        self.start()
+        tried = list(exclude)
+        error: Optional[BaseException] = None
+        while len(tried) < len(self.backends):
+            if error is not None:
+                self.retries += 1
+            backend = self.pick(model, exclude=tried)
+            tried.append(backend)
+            if backend.state == HALF_OPEN:
+                backend.trial_in_flight = True
+            try:
+                slot, stream_id, resp = await backend.pool.request(method, path, headers=headers, body=body, end_stream=end_stream)
+            except ConnectionError as exc:
+                backend.trial_in_flight = False
+                self._failure(backend)
+                error = exc
+                continue
+            backend.outstanding += 1
+            backend.requests += 1
+            return EngineLease(backend, slot, stream_id, resp)
+        raise ConnectionError(f"no engine backend available: {error or 'all backends tried'}")
+
+    def headers_received(self, lease: EngineLease) -> None:
+        backend = lease.backend
+        ms = (time.perf_counter() - lease.started) * 1000
+        backend.ewma_ms = ms if backend.ewma_ms is None else backend.ewma_ms + self.ewma_alpha * (ms - backend.ewma_ms)
+        if lease.resp.status != 503:
+            self._success(backend)
+
+    def release(self, lease: EngineLease, failed: bool = False) -> None:
+        if lease.released:
+            return
+        lease.released = True
+        backend = lease.backend
+        backend.outstanding = max(0, backend.outstanding - 1)
+        backend.pool.release(lease.slot)
+        if failed:
+            self._failure(backend)
+        backend.trial_in_flight = False
+
+    # ----- circuit breaker -----
+
+    def _success(self, backend: EngineBackend) -> None:
+        if backend.state != CLOSED:
+            print(f"[gateway] engine {backend.base} readmitted")
+        backend.state = CLOSED
+        backend.failures = 0
+        backend.trial_in_flight = False
+
+    def _failure(self, backend: EngineBackend) -> None:
+        backend.errors += 1
+        backend.failures += 1
+        if backend.state == HALF_OPEN or (backend.state == CLOSED and backend.failures >= self.failure_threshold):
+            backend.state = OPEN
+            backend.open_until = time.monotonic() + self.open_seconds
+            backend.ejections += 1
+            print(f"[gateway] engine {backend.base} ejected for {self.open_seconds:.0f}s after {backend.failures} failure(s)")
+
+    # ----- active health checks -----
+
+    async def _check(self, backend: EngineBackend) -> None:
+        backend.last_check = time.time()
+        try:
+            slot, stream_id, resp = await backend.pool.request("GET", "/health")
+        except ConnectionError:
+            backend.healthy = False
+            self._failure(backend)
+            return
+        try:
+            await resp.wait_headers(timeout=min(5.0, self.health_interval))
+            blob = await resp.read(timeout=min(5.0, self.health_interval))
+        except Exception:
+            if slot.proto is not None:
+                slot.proto.cancel(stream_id)
+            backend.healthy = False
+            self._failure(backend)
+            return
+        finally:
+            backend.pool.release(slot)
+        try:
+            status = json.loads(blob.decode() or "{}").get("status")
+        except ValueError:
+            status = None
+        backend.draining = status == "draining"
+        backend.warming = status == "warming"
+        backend.healthy = resp.status == 200
+        if resp.status == 200:
+            self._success(backend)
+        elif not (backend.draining or backend.warming):
+            self._failure(backend)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check(b) for b in self.backends), return_exceptions=True)
+            await asyncio.sleep(self.health_interval)
+
+    def start(self) -> None:
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for backend in self.backends:
+            await backend.pool.close()
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "affinity": self.affinity,
+            "affinity_hits": self.affinity_hits,
+            "affinity_spills": self.affinity_spills,
+            "retries": self.retries,
+            "backends": [b.stats() for b in self.backends],
+        }
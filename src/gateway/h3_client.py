@@ -0,0 +1,166 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from aioquic.asyncio import QuicConnectionProtocol
+from aioquic.h3.connection import H3Connection
+from aioquic.h3.events import DataReceived, HeadersReceived
+from aioquic.quic.events import ConnectionTerminated, StreamReset
+
+
+class H3StreamError(Exception):
+    """The engine reset the stream or the connection dropped mid-response."""
+
+
+class H3Response:
+    """One in-flight HTTP/3 request; body chunks are consumed as they arrive."""
+
+    def __init__(self) -> None:
+        self.status = 0
+        self.headers: list[tuple[bytes, bytes]] = []
+        self._headers_ready = asyncio.Event()
+        self._chunks: asyncio.Queue = asyncio.Queue()
+        self._error: Optional[Exception] = None
+
+    def header(self, name: bytes) -> Optional[bytes]:
+        for k, v in self.headers:
+            if k == name:
+                return v
+        return None
+
+    def _on_headers(self, headers: list[tuple[bytes, bytes]]) -> None:
+        self.headers = headers
+        for k, v in headers:
+            if k == b":status":
+                try:
+                    self.status = int(v.decode())
+                except Exception:
+                    self.status = 0
+        self._headers_ready.set()
+
+    def _on_data(self, data: bytes, ended: bool) -> None:
+        if data:
+            self._chunks.put_nowait(data)
+        if ended:
+            self._chunks.put_nowait(None)
+
+    def _on_error(self, exc: Exception) -> None:
+        self._error = exc
+        self._headers_ready.set()
+        self._chunks.put_nowait(None)
+
+    async def wait_headers(self, timeout: float = 60) -> None:
+        await asyncio.wait_for(self._headers_ready.wait(), timeout=timeout)
+        if self._error is not None and not self.headers:
+            raise self._error
+
+    async def iter_body(self, timeout: float = 60) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await asyncio.wait_for(self._chunks.get(), timeout=timeout)
+            if chunk is None:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield chunk
+
+    async def read(self, timeout: float = 60) -> bytes:
+        body = bytearray()
+        async for chunk in self.iter_body(timeout=timeout):
+            body.extend(chunk)
+        return bytes(body)
+
+
+class H3ClientProtocol(QuicConnectionProtocol):
+    """HTTP/3 client that can carry several concurrent requests on one QUIC connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.http: Optional[H3Connection] = None
+        self._responses: dict[int, H3Response] = {}
+        # Body bytes handed to QUIC per streamed request since its last acknowledged PING
+        self._unacked: dict[int, int] = {}
+
+    def quic_event_received(self, event):
+        if self.http is None:
+            self.http = H3Connection(self._quic)
+        if isinstance(event, StreamReset):
+            self._unacked.pop(event.stream_id, None)
+            resp = self._responses.pop(event.stream_id, None)
+            if resp is not None:
+                resp._on_error(H3StreamError(f"stream reset by engine (code {event.error_code})"))
+        if isinstance(event, ConnectionTerminated):
+            for resp in self._responses.values():
+                resp._on_error(H3StreamError(f"connection terminated: {event.reason_phrase}"))
+            self._responses.clear()
+            self._unacked.clear()
+        for ev in self.http.handle_event(event):
+            resp = self._responses.get(getattr(ev, "stream_id", -1))
+            if resp is None:
+                continue
+            if isinstance(ev, HeadersReceived):
+                resp._on_headers(ev.headers)
+                if ev.stream_ended:
+                    resp._on_data(b"", True)
+                    self._responses.pop(ev.stream_id, None)
+            elif isinstance(ev, DataReceived):
+                resp._on_data(ev.data, ev.stream_ended)
+                if ev.stream_ended:
+                    self._responses.pop(ev.stream_id, None)
+
+    def request(
+        self,
+        method: str,
+        authority: str,
+        path: str,
+        headers: Optional[list[tuple[bytes, bytes]]] = None,
+        body: Optional[bytes] = None,
+        end_stream: bool = True,
+    ) -> tuple[int, H3Response]:
+        """Send request headers (and optionally a body); returns (stream_id, response)."""
+        if self.http is None:
+            self.http = H3Connection(self._quic)
+        stream_id = self._quic.get_next_available_stream_id()
+        resp = H3Response()
+        self._responses[stream_id] = resp
+        all_headers = [
+            (b":method", method.encode()),
+            (b":scheme", b"https"),
+            (b":authority", authority.encode()),
+            (b":path", path.encode()),
+        ] + list(headers or [])
+        self.http.send_headers(stream_id, all_headers, end_stream=(body is None and end_stream))
+        if body is not None:
+            self.http.send_data(stream_id, body, end_stream=end_stream)
+        self.transmit()
+        return stream_id, resp
+
+    def send_body(self, stream_id: int, data: bytes, end_stream: bool = False) -> None:
+        assert self.http is not None
+        self.http.send_data(stream_id, data, end_stream=end_stream)
+        self.transmit()
+        if end_stream:
+            self._unacked.pop(stream_id, None)
+        else:
+            self._unacked[stream_id] = self._unacked.get(stream_id, 0) + len(data)
+
+    async def drain(self, stream_id: int, window: int = 1 << 20) -> None:
+        """
+        Pace a streamed request body by the engine's acknowledgements.
+
+        After every `window` bytes this waits for a PING round trip, so the
+        body goes to QUIC at most about one window per round trip instead of
+        piling up in the send buffer as fast as the client uploads.
+        """
+        if stream_id not in self._responses or self._unacked.get(stream_id, 0) < window:
+            return
+        self._unacked[stream_id] = 0
+        await self.ping()
+
+    def cancel(self, stream_id: int) -> None:
+        """Abandon a request, e.g. when the downstream HTTP client disconnected."""
+        self._unacked.pop(stream_id, None)
+        if self._responses.pop(stream_id, None) is not None:
+            try:
+                self._quic.reset_stream(stream_id, 0x010C)  # H3_REQUEST_CANCELLED
+                self.transmit()
+            except Exception:
+                pass
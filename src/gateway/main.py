@@ -3,36 +3,120 @@ import json
 import socket
 import time
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
 
 from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Form
 from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse, PlainTextResponse
 
 from src.common.auth import require_auth
-from src.common.rate_limiter import SlidingWindowRateLimiter, client_key
+from src.common.codecs import CodecError, normalize_format, parse_sample_rate
+from src.common.metrics import (
+    CONTENT_TYPE,
+    INFLIGHT,
+    REQUEST_SECONDS,
+    REQUESTS,
+    begin_request,
+    current_request_id,
+    mark_model_known,
+    metrics,
+    model_label,
+    observe_stage,
+)
+from src.common.rate_limiter import build_rate_limiter, client_key
+from src.common.download_manager import DownloadCancelled, DownloadManager
 from src.common.model_store import (
     list_models,
     download_model,
     download_whisper,
     download_parler_tts,
     download_piper_voice,
+    whisper_known,
+)
+from src.common.config import (
+    data_root,
+    engine_affinity_load_factor,
+    engine_circuit_failures,
+    engine_circuit_open_seconds,
+    engine_health_interval_seconds,
+    engine_lb_policy,
+    engine_model_affinity,
+    quic_base_urls,
+    quic_cert_paths,
+    insecure_quic,
+    quic_pool_size,
+    quic_keepalive_seconds,
+    quic_early_data,
+    rate_limit_tts_chars_per_unit,
 )
-from src.common.config import quic_base_url, quic_cert_paths, insecure_quic
 
 
 app = FastAPI(title="Shabdabhav Gateway", version="1.0.0")
 
-rate_limiter = SlidingWindowRateLimiter(max_requests=120, window_seconds=60)
+rate_limiter = build_rate_limiter()
+
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+ENGINE_BACKEND_OUTSTANDING = metrics.gauge("shabda_engine_backend_outstanding", "Requests in flight per engine backend", ("backend",))
+ENGINE_BACKEND_UP = metrics.gauge("shabda_engine_backend_up", "1 while an engine backend takes traffic (healthy, circuit closed)", ("backend",))
+
+
+def _backend_stats() -> list[dict]:
+    return _engine_balancer.stats()["backends"] if _engine_balancer is not None else []
+
+
+ENGINE_BACKEND_OUTSTANDING.collect(lambda: [({"backend": b["base"]}, b["outstanding"]) for b in _backend_stats()])
+ENGINE_BACKEND_UP.collect(
+    lambda: [({"backend": b["base"]}, int(b["healthy"] and b["state"] == "closed" and not b["draining"])) for b in _backend_stats()]
+)
 
 
 @app.middleware("http")
 async def _auth_and_rate(request: Request, call_next):
-    await require_auth(request)
+    # The request id is forwarded to the engine and echoed back, so one id covers both hops' logs
+    rid = begin_request(request.headers.get("x-request-id"))
+    started = time.perf_counter()
+    INFLIGHT.inc(route="all")
+    finished = False
+
+    def _finish(status: int) -> None:
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        INFLIGHT.dec(route="all")
+        route = getattr(request.scope.get("route"), "path", "other")
+        REQUESTS.inc(route=route, status=str(status))
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route)
+
     try:
-        rate_limiter.check(client_key(request))
+        await require_auth(request)
+        try:
+            await rate_limiter.acquire(client_key(request), rate_limiter.cost_for(request.url.path))
+        except HTTPException as e:
+            _finish(e.status_code)
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers={**(e.headers or {}), "x-request-id": rid})
+        response = await call_next(request)
     except HTTPException as e:
-        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
-    return await call_next(request)
+        _finish(e.status_code)
+        raise
+    except BaseException:
+        _finish(500)
+        raise
+    response.headers["x-request-id"] = rid
+    body = response.body_iterator
+
+    async def _tracked():
+        # Streamed bodies count until their last byte, not until headers
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            _finish(response.status_code)
+
+    response.body_iterator = _tracked()
+    return response
 
 
 @app.get("/")
@@ -40,13 +124,21 @@ async def root():
     return {
         "name": "shabdabhav-gateway",
         "time": time.time(),
-        "quic_base": quic_base_url(),
+        "quic_bases": quic_base_urls(),
     }
 
 
+@app.get("/metrics")
+async def metrics_text():
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    out = {"status": "ok", "rate_limit": rate_limiter.stats(), "downloads": download_manager.stats()}
+    if _engine_balancer is not None:
+        out["engines"] = _engine_balancer.stats()
+    return out
 
 
 @app.get("/v1/models")
@@ -54,39 +146,100 @@ async def models_list():
     return {"data": list_models()}
 
 
-@app.post("/v1/models/download")
-async def models_download(request: Request):
-    body = await request.json()
+download_manager = DownloadManager(state_path=data_root() / ".downloads-gateway.json")
+download_manager.register("parler-tts", download_parler_tts)
+download_manager.register("piper-tts", download_piper_voice)
+download_manager.register("whisper", download_whisper)
+download_manager.register("model", download_model)
+
+
+def _download_job(body: dict) -> tuple[str, str, dict]:
+    """Validate a download request and return its job's (kind, name, params)."""
     name = str(body.get("name", "")).strip()
     url = (body.get("url") or "").strip()
     fmt = body.get("format")
     voice = body.get("voice")
+    sha256 = (body.get("sha256") or "").strip().lower() or None
     if not name:
         raise HTTPException(status_code=400, detail="name required")
 
+    # Parler-TTS: model name like "parler-tts/parler-tts-mini-v1"
+    if name.startswith("parler-tts/"):
+        return "parler-tts", name, {"model_id": name}
+
+    # Piper voices (ONNX dataset) go to data dir
+    if name == "piper-tts":
+        if not voice:
+            raise HTTPException(status_code=400, detail="voice required for piper-tts")
+        return "piper-tts", f"piper-tts:{voice}", {"voice_pattern": voice}
+
+    # Whisper GGUF/BIN by canonical names
+    if name.endswith(".bin") or name.endswith(".gguf") or name.startswith("ggml-"):
+        if not url and not whisper_known(name):
+            raise HTTPException(status_code=400, detail="Unknown whisper model name; provide a direct url")
+        return "whisper", name, {"name_or_file": name, "url": url or None}
+
+    # Fallback: direct URL to models dir
+    if not url:
+        raise HTTPException(status_code=400, detail="url required for generic download")
+    return "model", name, {"name": name, "url": url, "format_hint": fmt, "sha256": sha256}
+
+
+@app.post("/v1/models/download")
+async def models_download(request: Request):
+    """
+    Start a background download job and answer 202 with it; poll
+    GET /v1/models/download/{id} for progress. With "wait": true the request
+    blocks until the job ends and returns its result instead.
+    """
+    body = await request.json()
+    kind, name, params = _download_job(body)
+    job = download_manager.submit(kind, name, **params)
+    if not body.get("wait"):
+        return JSONResponse(job.info(), status_code=202, headers={"Location": f"/v1/models/download/{job.id}"})
     try:
-        # Parler-TTS: model name like "parler-tts/parler-tts-mini-v1"
-        if name.startswith("parler-tts/"):
-            return download_parler_tts(name)
-
-        # Piper voices (ONNX dataset) go to data dir
-        if name == "piper-tts":
-            if not voice:
-                raise HTTPException(status_code=400, detail="voice required for piper-tts")
-            return download_piper_voice(voice)
-
-        # Whisper GGUF/BIN by canonical names
-        if name.endswith(".bin") or name.endswith(".gguf") or name.startswith("ggml-"):
-            return download_whisper(name, url=url or None)
-
-        # Fallback: direct URL to models dir
-        if not url:
-            raise HTTPException(status_code=400, detail="url required for generic download")
-        return download_model(name=name, url=url, format_hint=fmt)
-    except HTTPException:
-        raise
+        result = await asyncio.wrap_future(job.future)
+    except DownloadCancelled:
+        raise HTTPException(status_code=409, detail="download cancelled")
+    except asyncio.CancelledError:
+        # The job was cancelled before it started, unless it is this request that went away
+        if not job.future.cancelled():
+            raise
+        raise HTTPException(status_code=409, detail="download cancelled")
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
+    return {**result, "job": job.id}
+
+
+@app.get("/v1/models/downloads")
+async def models_downloads():
+    return {"data": download_manager.list(), **download_manager.stats()}
+
+
+@app.get("/v1/models/download/{job_id}")
+async def models_download_status(job_id: str):
+    job = download_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown download job")
+    return job.info()
+
+
+@app.delete("/v1/models/download/{job_id}")
+async def models_download_cancel(job_id: str):
+    job = download_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown download job")
+    return job.info()
+
+
+@app.on_event("startup")
+async def _restore_downloads():
+    await asyncio.to_thread(download_manager.restore)
+
+
+@app.on_event("shutdown")
+async def _stop_downloads():
+    download_manager.shutdown()
 
 
 # ---------- OpenAI compatibility (basic) ----------
@@ -113,23 +266,19 @@ async def chat_completions(request: Request):
     }
 
 
-async def _http3_post_json_bytes(path: str, payload: dict) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
-    # Lightweight HTTP/3 client adapted from demo, for protocol translation
-    from aioquic.asyncio import connect
-    from aioquic.h3.connection import H3_ALPN, H3Connection
-    from aioquic.h3.events import HeadersReceived, DataReceived
+def _engine_target(base: str) -> tuple[str, int]:
+    """Host and port of an engine base URL; IPv6 hosts must be bracketed, as in `https://[::1]:4433`."""
+    parts = urlsplit(base)
+    if parts.netloc.count(":") > 1 and not parts.netloc.startswith("["):
+        raise ValueError(f"IPv6 engine host must be bracketed, e.g. https://[::1]:4433, got {base!r}")
+    if parts.scheme != "https" or not parts.hostname:
+        raise ValueError(f"engine base URL must look like https://host:port, got {base!r}")
+    return parts.hostname, parts.port or 443
+
+
+def _quic_client_config():
+    from aioquic.h3.connection import H3_ALPN
     from aioquic.quic.configuration import QuicConfiguration
-    from aioquic.asyncio import QuicConnectionProtocol
-
-    base = quic_base_url()
-    if not base:
-        raise HTTPException(status_code=502, detail="STREAM_ENGINE_BASE not configured")
-    assert base.startswith("https://")
-    host_port = base[len("https://") :]
-    if "/" in host_port:
-        host_port = host_port.split("/")[0]
-    host, port_s = host_port.split(":") if ":" in host_port else (host_port, "443")
-    port = int(port_s)
 
     cfg = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN)
     if insecure_quic():
@@ -138,71 +287,208 @@ async def _http3_post_json_bytes(path: str, payload: dict) -> tuple[int, list[tu
     cert, key = quic_cert_paths()
     if cert and key:
         cfg.load_cert_chain(str(cert), str(key))
+    return cfg
+
+
+_engine_balancer = None
+
+
+def _get_engine_balancer():
+    """Lazily create the process-wide balancer over pooled QUIC connections to each engine."""
+    global _engine_balancer
+    if _engine_balancer is None:
+        from src.gateway.balancer import EngineBalancer
+        from src.gateway.quic_pool import QuicConnectionPool
+
+        bases = quic_base_urls()
+        if not bases:
+            raise HTTPException(status_code=502, detail="STREAM_ENGINE_BASE not configured")
+        configuration = _quic_client_config()
+
+        def _pool(base: str) -> QuicConnectionPool:
+            host, port = _engine_target(base)
+            return QuicConnectionPool(
+                host,
+                port,
+                configuration=configuration,
+                size=quic_pool_size(),
+                keepalive_seconds=quic_keepalive_seconds(),
+                early_data=quic_early_data(),
+            )
+
+        _engine_balancer = EngineBalancer(
+            bases,
+            _pool,
+            policy=engine_lb_policy(),
+            affinity=engine_model_affinity(),
+            load_factor=engine_affinity_load_factor(),
+            health_interval=engine_health_interval_seconds(),
+            failure_threshold=engine_circuit_failures(),
+            open_seconds=engine_circuit_open_seconds(),
+        )
+    return _engine_balancer
+
+
+@app.on_event("shutdown")
+async def _close_engine_balancer():
+    if _engine_balancer is not None:
+        await _engine_balancer.close()
+
+
+async def _http3_request_stream(
+    path: str,
+    headers: list[tuple[bytes, bytes]],
+    body: bytes = b"",
+    body_chunks: Optional[AsyncIterator[bytes]] = None,
+    model: Optional[str] = None,
+) -> tuple[int, list[tuple[bytes, bytes]], AsyncIterator[bytes]]:
+    """
+    POST to an engine and return (status, headers, body iterator) as soon as
+    response headers arrive. The request runs as one stream on a pooled
+    connection to the backend the balancer picks (by `model` affinity when
+    given), which is released when the iterator is exhausted or closed.
+
+    With `body_chunks`, the request body is sent as DATA frames while it is
+    read, waiting for the connection to drain so at most ~1 MiB is buffered.
+    Buffered requests are retried on another backend if the chosen one fails
+    before answering or is busy (503); streamed uploads cannot be replayed.
+    """
+    from src.gateway.h3_client import H3StreamError
+
+    balancer = _get_engine_balancer()
+    rid = current_request_id()
+    if rid:
+        headers = [*headers, (b"x-request-id", rid.encode())]
+    tried = []
+    started = time.perf_counter()
+    while True:
+        try:
+            if body_chunks is None:
+                lease = await balancer.request("POST", path, model=model, headers=headers, body=body, exclude=tried)
+            else:
+                lease = await balancer.request("POST", path, model=model, headers=headers, end_stream=False, exclude=tried)
+        except ConnectionError as exc:
+            raise HTTPException(status_code=502, detail=str(exc))
+        tried.append(lease.backend)
+        resp = lease.resp
+        can_retry = body_chunks is None and len(tried) < len(balancer.backends)
+        try:
+            if body_chunks is not None:
+                assert lease.slot.proto is not None
+                async for chunk in body_chunks:
+                    lease.slot.proto.send_body(lease.stream_id, chunk)
+                    await lease.slot.proto.drain(lease.stream_id)
+                lease.slot.proto.send_body(lease.stream_id, b"", end_stream=True)
+            await resp.wait_headers(timeout=60)
+        except (H3StreamError, ConnectionError, asyncio.TimeoutError):
+            lease.cancel()
+            balancer.release(lease, failed=True)
+            if can_retry:
+                balancer.retries += 1
+                continue
+            raise
+        except BaseException:
+            lease.cancel()
+            balancer.release(lease)
+            raise
+        balancer.headers_received(lease)
+        if resp.status == 503 and can_retry:
+            # Engine queue full or draining: another backend may have room
+            lease.cancel()
+            balancer.release(lease)
+            balancer.retries += 1
+            continue
+        break
+    if model and resp.status < 400:
+        # The engine accepted the name, so it is a real model rather than a made-up label
+        mark_model_known(model)
+    # Time until the engine answered, including any retries on other backends
+    observe_stage("upstream", time.perf_counter() - started, model_label(model or ""))
+
+    async def _body() -> AsyncIterator[bytes]:
+        completed = False
+        try:
+            async for chunk in resp.iter_body(timeout=60):
+                yield chunk
+            completed = True
+        finally:
+            if not completed:
+                lease.cancel()
+            balancer.release(lease)
+
+    return resp.status, resp.headers, _body()
+
+
+async def _http3_post_json_stream(path: str, payload: dict) -> tuple[int, list[tuple[bytes, bytes]], AsyncIterator[bytes]]:
+    return await _http3_request_stream(
+        path,
+        headers=[(b"content-type", b"application/json")],
+        body=json.dumps(payload).encode(),
+        model=str(payload.get("model") or "") or None,
+    )
 
-    class _Client(QuicConnectionProtocol):
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self.http: Optional[H3Connection] = None
-            self.headers: list[tuple[bytes, bytes]] = []
-            self.body = bytearray()
-            self.done = asyncio.Event()
-            self.status = 0
-
-        def quic_event_received(self, event):
-            if self.http is None:
-                self.http = H3Connection(self._quic)
-            for ev in self.http.handle_event(event):
-                if isinstance(ev, HeadersReceived):
-                    self.headers = ev.headers
-                    for k, v in self.headers:
-                        if k == b":status":
-                            try:
-                                self.status = int(v.decode())
-                            except Exception:
-                                self.status = 0
-                elif isinstance(ev, DataReceived):
-                    if ev.data:
-                        self.body.extend(ev.data)
-                    if ev.stream_ended:
-                        self.done.set()
-
-        def send(self, authority: str, _path: str, data: bytes):
-            if self.http is None:
-                self.http = H3Connection(self._quic)
-            stream_id = self._quic.get_next_available_stream_id()
-            headers = [
-                (b":method", b"POST"),
-                (b":scheme", b"https"),
-                (b":authority", authority.encode()),
-                (b":path", _path.encode()),
-                (b"content-type", b"application/json"),
-            ]
-            self.http.send_headers(stream_id, headers)
-            self.http.send_data(stream_id, data, end_stream=True)
-            self.transmit()
-
-    async with connect(host, port, configuration=cfg, create_protocol=_Client) as proto:  # type: ignore[arg-type]
-        body = json.dumps(payload).encode()
-        authority = f"{host}:{port}"
-        proto.send(authority, path, body)  # type: ignore[attr-defined]
-        await asyncio.wait_for(proto.done.wait(), timeout=60)  # type: ignore[attr-defined]
-        return proto.status, proto.headers, bytes(proto.body)  # type: ignore[attr-defined]
+
+async def _http3_post_json_bytes(path: str, payload: dict) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+    status, headers, body = await _http3_post_json_stream(path, payload)
+    blob = bytearray()
+    async for chunk in body:
+        blob.extend(chunk)
+    return status, headers, bytes(blob)
+
+
+def _backend_error(status: int, blob: bytes) -> HTTPException:
+    try:
+        detail = json.loads(blob.decode()).get("error", f"backend status {status}")
+    except Exception:
+        detail = f"backend status {status}"
+    # Engine backpressure is passed through so clients back off instead of failing hard
+    if status == 503:
+        return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+    return HTTPException(status_code=502, detail=detail)
 
 
 @app.post("/v1/audio/speech")
 async def audio_speech(request: Request):
     body = await request.json()
+    # Encoding happens on the engine, next to synthesis; reject bad formats before spending a request there
+    try:
+        body["response_format"] = normalize_format(body.get("response_format"))
+        parse_sample_rate(body.get("sample_rate"))
+    except CodecError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Long texts cost more of the client's budget, roughly one unit per second of audio
+    per_unit = rate_limit_tts_chars_per_unit()
+    if per_unit:
+        await rate_limiter.acquire(client_key(request), len(str(body.get("text", ""))) / per_unit)
     # If QUIC backend configured, translate protocol
-    base = quic_base_url()
-    if base:
-        status, headers, blob = await _http3_post_json_bytes("/v1/stream/audio/speech", body)
+    if quic_base_urls():
+        started = time.perf_counter()
+        status, headers, chunks = await _http3_post_json_stream("/v1/stream/audio/speech", body)
         if status != 200:
+            blob = b"".join([c async for c in chunks])
+            raise _backend_error(status, blob)
+        media_type = dict(headers).get(b"content-type", b"audio/wav").decode()
+
+        async def _relay():
+            first_ms = None
+            sent = 0
             try:
-                detail = json.loads(blob.decode()).get("error", f"backend status {status}")
-            except Exception:
-                detail = f"backend status {status}"
-            raise HTTPException(status_code=502, detail=detail)
-        return StreamingResponse(iter([blob]), media_type="audio/wav")
+                async for chunk in chunks:
+                    if first_ms is None:
+                        first_ms = (time.perf_counter() - started) * 1000
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                # Also runs when the HTTP client disconnects; resets the engine stream
+                await chunks.aclose()
+            total_ms = (time.perf_counter() - started) * 1000
+            observe_stage("relay", (total_ms - (first_ms or total_ms)) / 1000, model_label(str(body.get("model") or "")))
+            print(
+                f"[gateway] speech id={current_request_id()} first_byte={first_ms or total_ms:.1f}ms "
+                f"total={total_ms:.1f}ms bytes={sent}"
+            )
+
+        return StreamingResponse(_relay(), media_type=media_type)
     # Fallback: instruct client to use streaming endpoint directly if configured
     raise HTTPException(status_code=501, detail="Streaming engine not configured")
 
@@ -214,32 +500,34 @@ async def audio_transcriptions(
     language: Optional[str] = Form(None),
     response_format: str = Form("json"),
 ):
-    base = quic_base_url()
-    if not base:
+    if not quic_base_urls():
         raise HTTPException(status_code=501, detail="Streaming engine not configured")
 
-    # Transport the small payload as base64 JSON to QUIC for simplicity
-    import base64, tempfile, os as _os
-    with tempfile.NamedTemporaryFile(delete=False, suffix="-upload") as tmp:
-        uploaded_path = tmp.name
-        tmp.write(await file.read())
-    try:
-        with open(uploaded_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode()
-        payload = {"model": model, "language": language, "audio_b64": b64}
-        status, headers, blob = await _http3_post_json_bytes("/v1/stream/audio/transcriptions", payload)
-        if status != 200:
-            try:
-                detail = json.loads(blob.decode()).get("error", f"backend status {status}")
-            except Exception:
-                detail = f"backend status {status}"
-            raise HTTPException(status_code=502, detail=detail)
-        result = json.loads(blob.decode() or "{}")
-    finally:
-        try:
-            _os.unlink(uploaded_path)
-        except Exception:
-            pass
+    # Send the audio as raw DATA frames with metadata in headers; the engine spools it to one file
+    async def _chunks() -> AsyncIterator[bytes]:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+    # The engine takes any non-JSON body as raw audio, so the client's own label for the file
+    # (which may well say application/json) must not reach it; it is passed on separately
+    headers = [
+        (b"content-type", b"application/octet-stream"),
+        (b"x-model", model.encode()),
+    ]
+    if file.content_type:
+        headers.append((b"x-upload-content-type", file.content_type.encode()))
+    if language:
+        headers.append((b"x-language", language.encode()))
+    status, headers, body = await _http3_request_stream(
+        "/v1/stream/audio/transcriptions", headers, body_chunks=_chunks(), model=model
+    )
+    blob = b"".join([c async for c in body])
+    if status != 200:
+        raise _backend_error(status, blob)
+    result = json.loads(blob.decode() or "{}")
 
     text_out = (result.get("text") or "").strip()
     if response_format in (None, "", "json"):
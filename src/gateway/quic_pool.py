@@ -0,0 +1,244 @@
+import asyncio
+import dataclasses
+import random
+import time
+from contextlib import AsyncExitStack
+from typing import Optional
+
+from aioquic.asyncio import connect
+from aioquic.quic.configuration import QuicConfiguration
+
+from src.gateway.h3_client import H3ClientProtocol, H3Response
+
+
+class _PooledConnection:
+    def __init__(self, index: int):
+        self.index = index
+        self.proto: Optional[H3ClientProtocol] = None
+        self.stack: Optional[AsyncExitStack] = None
+        self.outstanding = 0
+        self.connected_at = 0.0
+        self.last_used = 0.0
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.resumed = False
+        # Set while a handshake for this slot runs outside the pool lock; resolved when it ends
+        self.opening: Optional[asyncio.Future] = None
+        self._watch: Optional[asyncio.Task] = None
+        self._keepalive: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.proto is not None
+
+
+class QuicConnectionPool:
+    """
+    Persistent HTTP/3 connections to one engine, shared by all gateway requests.
+
+    Requests are multiplexed as concurrent streams on up to `size` connections
+    (least outstanding streams first). Connections are kept warm with PINGs,
+    re-established with exponential backoff after failures, and reconnect with
+    the last TLS session ticket so resumption (and optionally 0-RTT) skips the
+    full handshake.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        configuration: QuicConfiguration,
+        size: int = 2,
+        max_streams_per_connection: int = 100,
+        keepalive_seconds: float = 15.0,
+        early_data: bool = False,
+        connect_timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.authority = f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+        self.configuration = configuration
+        self.size = max(1, size)
+        self.max_streams_per_connection = max_streams_per_connection
+        self.keepalive_seconds = keepalive_seconds
+        self.early_data = early_data
+        self.connect_timeout = connect_timeout
+        self._slots = [_PooledConnection(i) for i in range(self.size)]
+        self._lock = asyncio.Lock()
+        self._session_ticket = None
+        self._last_error: Optional[BaseException] = None
+        self._handshakes = 0
+        self._resumptions = 0
+        self._reconnects = 0
+        self._requests = 0
+
+    def _store_ticket(self, ticket) -> None:
+        self._session_ticket = ticket
+
+    async def _open(self, slot: _PooledConnection) -> None:
+        cfg = self.configuration
+        resumed = self._session_ticket is not None
+        if resumed:
+            cfg = dataclasses.replace(cfg, session_ticket=self._session_ticket)
+        stack = AsyncExitStack()
+        try:
+            proto = await asyncio.wait_for(
+                stack.enter_async_context(
+                    connect(
+                        self.host,
+                        self.port,
+                        configuration=cfg,
+                        create_protocol=H3ClientProtocol,
+                        session_ticket_handler=self._store_ticket,
+                        wait_connected=not (resumed and self.early_data),
+                    )
+                ),
+                timeout=self.connect_timeout,
+            )
+        except BaseException:
+            await stack.aclose()
+            raise
+        if slot.connected_at:
+            self._reconnects += 1
+        slot.proto = proto  # type: ignore[assignment]
+        slot.stack = stack
+        slot.connected_at = time.time()
+        slot.failures = 0
+        slot.next_attempt = 0.0
+        slot.resumed = resumed
+        self._handshakes += 1
+        if resumed:
+            self._resumptions += 1
+        slot._watch = asyncio.create_task(self._watch_closed(slot, proto))
+        if self.keepalive_seconds > 0:
+            slot._keepalive = asyncio.create_task(self._keep_alive(slot, proto))
+
+    async def _watch_closed(self, slot: _PooledConnection, proto) -> None:
+        await proto.wait_closed()
+        if slot.proto is proto:
+            await self._drop(slot, failed=True)
+
+    async def _keep_alive(self, slot: _PooledConnection, proto) -> None:
+        # PING idle connections so NAT bindings and the engine's idle timer stay fresh
+        try:
+            while slot.proto is proto:
+                await asyncio.sleep(self.keepalive_seconds)
+                if slot.proto is not proto:
+                    return
+                if time.time() - slot.last_used < self.keepalive_seconds:
+                    continue
+                await asyncio.wait_for(proto.ping(), timeout=self.keepalive_seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if slot.proto is proto:
+                await self._drop(slot, failed=True)
+
+    @staticmethod
+    def _mark_failed(slot: _PooledConnection) -> None:
+        slot.failures += 1
+        backoff = min(30.0, 0.25 * (2 ** min(slot.failures, 8)))
+        slot.next_attempt = time.time() + backoff * random.uniform(0.5, 1.0)
+
+    async def _drop(self, slot: _PooledConnection, failed: bool) -> None:
+        stack, slot.stack, slot.proto = slot.stack, None, None
+        for task in (slot._watch, slot._keepalive):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+        slot._watch = slot._keepalive = None
+        if failed:
+            self._mark_failed(slot)
+        if stack is not None:
+            try:
+                await stack.aclose()
+            except Exception:
+                pass
+
+    async def _acquire(self) -> _PooledConnection:
+        while True:
+            waiting: Optional[asyncio.Future] = None
+            async with self._lock:
+                live = [s for s in self._slots if s.alive and s.outstanding < self.max_streams_per_connection]
+                best = min(live, key=lambda s: s.outstanding) if live else None
+                # Prefer an idle live connection; otherwise grow the pool if a slot is free
+                if best is not None and best.outstanding == 0:
+                    return best
+                now = time.time()
+                target = next((s for s in self._slots if not s.alive and s.opening is None and s.next_attempt <= now), None)
+                if target is not None:
+                    target.opening = asyncio.get_running_loop().create_future()
+                elif best is not None:
+                    return best
+                else:
+                    waiting = next((s.opening for s in self._slots if s.opening is not None), None)
+                    if waiting is None:
+                        raise ConnectionError(f"engine {self.authority} unavailable: {self._last_error or 'backing off'}")
+            if waiting is not None:
+                # Another caller is handshaking; look again once it is done
+                await asyncio.shield(waiting)
+                continue
+            # The handshake runs outside the lock so one slow engine does not stall other callers
+            try:
+                await self._open(target)
+                return target
+            except Exception as exc:
+                self._last_error = exc
+                self._mark_failed(target)
+                if best is not None and best.alive:
+                    return best
+                raise ConnectionError(f"engine {self.authority} unavailable: {exc}") from exc
+            finally:
+                opening, target.opening = target.opening, None
+                opening.set_result(None)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: Optional[list[tuple[bytes, bytes]]] = None,
+        body: Optional[bytes] = None,
+        end_stream: bool = True,
+    ) -> tuple["_PooledConnection", int, H3Response]:
+        """Start a request on a pooled connection. Call `release(slot)` when the response is done."""
+        slot = await self._acquire()
+        assert slot.proto is not None
+        slot.outstanding += 1
+        slot.last_used = time.time()
+        self._requests += 1
+        try:
+            stream_id, resp = slot.proto.request(method, self.authority, path, headers=headers, body=body, end_stream=end_stream)
+        except BaseException:
+            slot.outstanding -= 1
+            raise
+        return slot, stream_id, resp
+
+    def release(self, slot: "_PooledConnection") -> None:
+        slot.outstanding = max(0, slot.outstanding - 1)
+        slot.last_used = time.time()
+
+    async def close(self) -> None:
+        for slot in self._slots:
+            if slot.alive:
+                await self._drop(slot, failed=False)
+
+    def stats(self) -> dict:
+        return {
+            "target": self.authority,
+            "size": self.size,
+            "connections": [
+                {
+                    "index": s.index,
+                    "alive": s.alive,
+                    "connecting": s.opening is not None,
+                    "outstanding": s.outstanding,
+                    "resumed": s.resumed,
+                    "failures": s.failures,
+                    "connected_at": s.connected_at or None,
+                }
+                for s in self._slots
+            ],
+            "handshakes": self._handshakes,
+            "resumptions": self._resumptions,
+            "reconnects": self._reconnects,
+            "requests": self._requests,
+        }
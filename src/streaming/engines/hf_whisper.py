@@ -1,44 +1,53 @@
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 from io import BytesIO
-import tempfile
 
+from src.common.metrics import stage
+from src.streaming.engines.model_registry import model_registry
 
-async def transcribe_with_hf_whisper(audio_bytes: bytes, model_id: str, language: Optional[str] = None) -> Dict[str, Any]:
+
+def load_hf_whisper(model_id: str):
+    """Return (processor, model) for a Whisper checkpoint from the shared registry."""
+    try:
+        from transformers import WhisperProcessor, WhisperForConditionalGeneration
+    except Exception as exc:
+        raise FileNotFoundError(
+            "HF Whisper runtime not installed. Install: 'pip install transformers torch soundfile'"
+        ) from exc
+
+    def _loader():
+        # Load model and processor from hub (cached in HF_HOME or ~/.cache)
+        processor = WhisperProcessor.from_pretrained(model_id)
+        model = WhisperForConditionalGeneration.from_pretrained(model_id)
+        model.eval()
+        return processor, model
+
+    return model_registry.get(f"whisper:{model_id}", _loader)
+
+
+def transcribe_with_hf_whisper(audio: Union[bytes, Path], model_id: str, language: Optional[str] = None) -> Dict[str, Any]:
     """
     Transcribe using Hugging Face Transformers Whisper (e.g., openai/whisper-small).
+    Blocking; the engine runs it on its hf_whisper pool. `audio` is WAV bytes or a path to a spooled upload.
     Optional dependency inside QUIC container:
       pip install transformers torch soundfile
     """
     try:
         import soundfile as sf
-        from transformers import WhisperProcessor, WhisperForConditionalGeneration
         import torch
     except Exception as exc:
         raise FileNotFoundError(
             "HF Whisper runtime not installed. Install: 'pip install transformers torch soundfile'"
         ) from exc
 
-    # Load model and processor from hub (cached in HF_HOME or ~/.cache)
-    processor = WhisperProcessor.from_pretrained(model_id)
-    model = WhisperForConditionalGeneration.from_pretrained(model_id)
-    model.eval()
+    processor, model = load_hf_whisper(model_id)
 
-    # Read audio from bytes
     # Whisper expects 16kHz mono log-mel; the processor handles conversion
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        tmp.write(audio_bytes)
-        tmp_path = tmp.name
-    try:
-        audio, sr = sf.read(tmp_path)
-    finally:
-        try:
-            Path(tmp_path).unlink(missing_ok=True)
-        except Exception:
-            pass
+    with stage("preprocess"):
+        samples, sr = sf.read(str(audio) if isinstance(audio, Path) else BytesIO(audio))
 
-    # Prepare features
-    inputs = processor(audio, sampling_rate=sr, return_tensors="pt")
+        # Prepare features
+        inputs = processor(samples, sampling_rate=sr, return_tensors="pt")
     forced_decoder_ids = None
     if language:
         try:
@@ -46,12 +55,10 @@ async def transcribe_with_hf_whisper(audio_bytes: bytes, model_id: str, language
         except Exception:
             forced_decoder_ids = None
 
-    with torch.no_grad():
+    with stage("inference"), torch.no_grad():
         pred_ids = model.generate(
             inputs.input_features,
             forced_decoder_ids=forced_decoder_ids,
         )
     text = processor.batch_decode(pred_ids, skip_special_tokens=True)[0].strip()
     return {"text": text, "language": language}
-
-
@@ -0,0 +1,155 @@
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from src.common.config import engine_model_cache_bytes
+from src.common.metrics import cache_event, observe_stage
+
+
+def estimate_bytes(obj: Any) -> int:
+    """
+    Best-effort resident size of a loaded model: torch parameters and buffers,
+    looked up through wrapper `.model` attributes, else the size of `.model_path`.
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_bytes(o) for o in obj)
+    total = 0
+    for attr in ("parameters", "buffers"):
+        fn = getattr(obj, attr, None)
+        if not callable(fn):
+            continue
+        try:
+            total += sum(t.numel() * t.element_size() for t in fn())
+        except Exception:
+            pass
+    if total == 0 and getattr(obj, "model", None) is not None and obj.model is not obj:
+        total = estimate_bytes(obj.model)
+    if total == 0 and isinstance(getattr(obj, "model_path", None), str):
+        try:
+            total = os.path.getsize(obj.model_path)
+        except OSError:
+            pass
+    return total
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size_bytes: int
+    load_seconds: float
+    hits: int = 0
+    loaded_at: float = field(default_factory=time.time)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models shared by the engine runtimes.
+
+    Loads are single-flight: concurrent first requests for the same key wait on
+    one loader call. Entries are evicted least-recently-used once the summed
+    estimated size exceeds `max_bytes` (the newest entry is always kept).
+    """
+
+    def __init__(self, max_bytes: int | None = None):
+        self.max_bytes = max_bytes if max_bytes is not None else engine_model_cache_bytes()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str, loader: Callable[[], Any], size_of: Callable[[Any], int] = estimate_bytes) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self._hits += 1
+                cache_event("engine_model", True)
+                return entry.value
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._pending[key] = pending
+                self._misses += 1
+                cache_event("engine_model", False)
+
+        if not owner:
+            return pending.result()
+
+        try:
+            started = time.perf_counter()
+            value = loader()
+            elapsed = time.perf_counter() - started
+            observe_stage("model_load", elapsed)
+            size = size_of(value)
+        except BaseException as exc:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._entries[key] = _Entry(value=value, size_bytes=size, load_seconds=elapsed)
+            self._pending.pop(key, None)
+            self._evict_locked(keep=key)
+        pending.set_result(value)
+        print(f"[engine] model loaded: {key} in {elapsed:.2f}s (~{size / 2**20:.0f} MiB)")
+        return value
+
+    def _evict_locked(self, keep: str) -> None:
+        total = sum(e.size_bytes for e in self._entries.values())
+        evicted = False
+        for key in list(self._entries.keys()):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self._entries.pop(key)
+            total -= entry.size_bytes
+            self._evictions += 1
+            evicted = True
+            print(f"[engine] model evicted: {key}")
+        if evicted:
+            gc.collect()
+            # Only if a model already imported torch; importing it here would cost seconds
+            torch = sys.modules.get("torch")
+            try:
+                if torch is not None and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": [
+                    {
+                        "key": k,
+                        "size_bytes": e.size_bytes,
+                        "load_seconds": round(e.load_seconds, 3),
+                        "hits": e.hits,
+                        "loaded_at": e.loaded_at,
+                    }
+                    for k, e in self._entries.items()
+                ],
+                "resident_bytes": sum(e.size_bytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "loading": list(self._pending.keys()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+model_registry = ModelRegistry()
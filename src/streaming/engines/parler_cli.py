@@ -1,47 +1,143 @@
 from pathlib import Path
 from io import BytesIO
+from typing import Iterator
 
+from src.common.audio import PcmJoiner
+from src.common.config import parler_segment_batch, tts_segment_crossfade_ms, tts_segment_gap_ms, tts_segment_max_chars
+from src.common.metrics import stage
+from src.common.text_segment import segment_text
+from src.streaming.engines.model_registry import model_registry
+from src.streaming.executor import check_cancelled
 
-async def synthesize_with_parler(text: str, model: str, description: str | None = None) -> bytes:
+DEFAULT_DESCRIPTION = "A clear, neutral voice"
+
+
+def _local_parler_dir(model: str) -> Path:
+    # Resolve local model directory
+    from src.common.config import models_root
+
+    local_dir = models_root() / model
+    if not local_dir.exists():
+        raise FileNotFoundError(f"Parler model not found at {local_dir}")
+    return local_dir
+
+
+def load_parler(model: str):
+    """Return (tokenizer, model) for a local Parler snapshot from the shared registry."""
+    try:
+        from transformers import AutoTokenizer
+        from parler_tts import ParlerTTSForConditionalGeneration
+    except Exception as exc:
+        raise FileNotFoundError(
+            "Parler-TTS runtime not installed. Install: 'pip install parler-tts transformers soundfile torch'"
+        ) from exc
+
+    local_dir = _local_parler_dir(model)
+
+    def _loader():
+        tok = AutoTokenizer.from_pretrained(str(local_dir))
+        net = ParlerTTSForConditionalGeneration.from_pretrained(str(local_dir))
+        net.eval()
+        return tok, net
+
+    return model_registry.get(f"parler:{local_dir}", _loader)
+
+
+def synthesize_with_parler(text: str, model: str, description: str | None = None) -> bytes:
     """
     Optional Parler-TTS inference. Requires extra deps inside the QUIC container:
       pip install parler-tts transformers soundfile torch
 
     Expects the model snapshot to be available under data/models/<model>/
+    Blocking; the engine runs it on its parler pool.
     """
     try:
         import torch  # noqa: F401
         import soundfile as sf
-        from transformers import AutoTokenizer
-        from parler_tts import ParlerTTSForConditionalGeneration
     except Exception as exc:
         raise FileNotFoundError(
             "Parler-TTS runtime not installed. Install: 'pip install parler-tts transformers soundfile torch'"
         ) from exc
 
-    # Resolve local model directory
-    from src.common.config import models_root
-
-    local_dir = models_root() / model
-    if not local_dir.exists():
-        raise FileNotFoundError(f"Parler model not found at {local_dir}")
-
-    # Minimal inference per upstream examples
-    tok = AutoTokenizer.from_pretrained(str(local_dir))
-    net = ParlerTTSForConditionalGeneration.from_pretrained(str(local_dir))
+    tok, net = load_parler(model)
 
     if not description:
-        description = "A clear, neutral voice"
+        description = DEFAULT_DESCRIPTION
 
-    inputs = tok(text, return_tensors="pt")
-    desc = tok(description, return_tensors="pt")
-    with torch.no_grad():
+    # Minimal inference per upstream examples
+    with stage("tokenization"):
+        inputs = tok(text, return_tensors="pt")
+        desc = tok(description, return_tensors="pt")
+    with stage("inference"), torch.no_grad():
         audio = net.generate(**inputs, description=desc.input_ids)
     audio = audio.squeeze().cpu().numpy()
 
-    buf = BytesIO()
-    sf.write(buf, audio, 22050, format="WAV")
+    with stage("encoding"):
+        buf = BytesIO()
+        sf.write(buf, audio, int(getattr(net.config, "sampling_rate", 44100)), format="WAV", subtype="PCM_16")
     buf.seek(0)
     return buf.read()
 
 
+def _generate_batch(tok, net, prompts: list[str], description: str) -> list:
+    """Generate several prompts with one padded generate() call; returns float waveforms."""
+    import torch
+
+    with stage("tokenization"):
+        desc = tok([description] * len(prompts), return_tensors="pt", padding=True)
+        prompt = tok(prompts, return_tensors="pt", padding=True)
+    with stage("inference"), torch.no_grad():
+        output = net.generate(
+            input_ids=desc.input_ids,
+            attention_mask=desc.attention_mask,
+            prompt_input_ids=prompt.input_ids,
+            prompt_attention_mask=prompt.attention_mask,
+            return_dict_in_generate=True,
+        )
+    sequences = output.sequences.cpu()
+    lengths = getattr(output, "audios_length", None)
+    audios = []
+    for i in range(len(prompts)):
+        audio = sequences[i]
+        if lengths is not None:
+            audio = audio[: int(lengths[i])]
+        audios.append(audio.numpy().squeeze())
+    return audios
+
+
+def iter_parler_chunks(
+    text: str, model: str, description: str | None = None, language: str | None = None
+) -> Iterator[tuple[int, int, int, bytes]]:
+    """
+    Synthesize long text segment by segment and yield 16-bit PCM in order.
+
+    The first segment is generated alone so audio starts quickly; the rest go
+    through generate() in batches of PARLER_SEGMENT_BATCH. Blocking generator;
+    the engine drives it through EngineExecutor.stream on its parler pool.
+    """
+    try:
+        import numpy as np
+    except Exception as exc:
+        raise FileNotFoundError(
+            "Parler-TTS runtime not installed. Install: 'pip install parler-tts transformers soundfile torch'"
+        ) from exc
+
+    tok, net = load_parler(model)
+    rate = int(getattr(net.config, "sampling_rate", 44100))
+    joiner = PcmJoiner(rate, gap_ms=tts_segment_gap_ms(), crossfade_ms=tts_segment_crossfade_ms())
+    segments = segment_text(text, language, max_chars=tts_segment_max_chars())
+    index, batch = 0, 1
+    while index < len(segments):
+        check_cancelled()
+        group = segments[index:index + batch]
+        for audio in _generate_batch(tok, net, group, description or DEFAULT_DESCRIPTION):
+            with stage("encoding"):
+                pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+            out = joiner.push(pcm)
+            if out:
+                yield rate, 2, 1, out
+        index += len(group)
+        batch = parler_segment_batch()
+    tail = joiner.finish()
+    if tail:
+        yield rate, 2, 1, tail
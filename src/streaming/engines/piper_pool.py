@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+from src.common.config import piper_pool_max_bytes, piper_voice_concurrency
+from src.common.metrics import cache_event, observe_stage
+from src.common.onnx_sessions import load_piper_voice, settings as onnx_settings
+from src.common.runtimes import installed
+
+
+@dataclass
+class _VoiceEntry:
+    path: Path
+    voice: Any
+    size_bytes: int
+    slots: threading.BoundedSemaphore
+    in_use: int = 0
+    hits: int = 0
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+class PiperVoicePool:
+    """
+    Resident Piper voices keyed by resolved model path.
+
+    Each voice keeps one ONNX Runtime session for the life of the process,
+    built by src.common.onnx_sessions (shared thread pool, cached optimized
+    graph, memory-mapped weights).
+    Sessions are shared by up to `per_voice_concurrency` callers at a time and
+    evicted least-recently-used once the summed model size exceeds `max_bytes`.
+    Voices that are in use are never evicted.
+    """
+
+    def __init__(self, max_bytes: int | None = None, per_voice_concurrency: int | None = None):
+        self.max_bytes = max_bytes if max_bytes is not None else piper_pool_max_bytes()
+        self.per_voice_concurrency = per_voice_concurrency or piper_voice_concurrency()
+        self._voices: "OrderedDict[str, _VoiceEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self._warm_hits = 0
+        self._cold_loads = 0
+        self._evictions = 0
+        self._load_seconds = 0.0
+
+    @staticmethod
+    def available() -> bool:
+        # Located, not imported: piper (and onnxruntime) load with the first voice
+        return installed("piper")
+
+    def _load_voice(self, model_path: Path, config_path: Path) -> Any:
+        return load_piper_voice(model_path, config_path)
+
+    def _get_or_load(self, model_path: Path, config_path: Path) -> _VoiceEntry:
+        key = str(model_path)
+        with self._lock:
+            entry = self._voices.get(key)
+            if entry is not None:
+                self._voices.move_to_end(key)
+                self._warm_hits += 1
+                entry.hits += 1
+                entry.in_use += 1
+                cache_event("piper_voice", True)
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one caller loads a given voice; the others wait and then hit warm
+        with load_lock:
+            try:
+                with self._lock:
+                    entry = self._voices.get(key)
+                    if entry is not None:
+                        self._voices.move_to_end(key)
+                        self._warm_hits += 1
+                        entry.hits += 1
+                        entry.in_use += 1
+                        cache_event("piper_voice", True)
+                        return entry
+
+                started = time.perf_counter()
+                voice = self._load_voice(model_path, config_path)
+                elapsed = time.perf_counter() - started
+                cache_event("piper_voice", False)
+                observe_stage("model_load", elapsed)
+                try:
+                    size = model_path.stat().st_size
+                except OSError:
+                    size = 0
+
+                with self._lock:
+                    entry = _VoiceEntry(
+                        path=model_path,
+                        voice=voice,
+                        size_bytes=size,
+                        slots=threading.BoundedSemaphore(self.per_voice_concurrency),
+                        in_use=1,
+                    )
+                    self._voices[key] = entry
+                    self._cold_loads += 1
+                    self._load_seconds += elapsed
+                    self._evict_locked(keep=key)
+                print(f"[engine] piper voice loaded: {model_path.name} in {elapsed:.2f}s")
+                return entry
+            finally:
+                # Dropped on failure too, or every voice that failed to load would leave its lock behind
+                with self._lock:
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+
+    def _evict_locked(self, keep: str) -> None:
+        total = sum(e.size_bytes for e in self._voices.values())
+        if total <= self.max_bytes:
+            return
+        for key in list(self._voices.keys()):
+            if total <= self.max_bytes:
+                break
+            entry = self._voices[key]
+            if key == keep or entry.in_use > 0:
+                continue
+            del self._voices[key]
+            total -= entry.size_bytes
+            self._evictions += 1
+            print(f"[engine] piper voice evicted: {entry.path.name}")
+
+    @contextmanager
+    def session(self, model_path: Path, config_path: Path) -> Iterator[Any]:
+        """Borrow a loaded PiperVoice, waiting for a free per-voice slot."""
+        entry = self._get_or_load(model_path, config_path)
+        try:
+            waited = time.perf_counter()
+            with entry.slots:
+                observe_stage("queue_wait", time.perf_counter() - waited)
+                entry.last_used = time.time()
+                yield entry.voice
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._warm_hits + self._cold_loads
+            return {
+                "voices": [
+                    {
+                        "path": str(e.path),
+                        "size_bytes": e.size_bytes,
+                        "in_use": e.in_use,
+                        "hits": e.hits,
+                        "loaded_at": e.loaded_at,
+                        "last_used": e.last_used,
+                    }
+                    for e in self._voices.values()
+                ],
+                "resident_bytes": sum(e.size_bytes for e in self._voices.values()),
+                "max_bytes": self.max_bytes,
+                "per_voice_concurrency": self.per_voice_concurrency,
+                "warm_hits": self._warm_hits,
+                "cold_loads": self._cold_loads,
+                "evictions": self._evictions,
+                "warm_ratio": (self._warm_hits / lookups) if lookups else None,
+                "load_seconds_total": round(self._load_seconds, 3),
+                "onnx": onnx_settings(),
+            }
+
+
+voice_pool = PiperVoicePool()
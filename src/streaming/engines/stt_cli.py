@@ -1,19 +1,18 @@
-import subprocess
 import tempfile
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 
-from src.common.config import models_root, whisper_cpp_bin_path, audio_root
-import time
+from src.common.archiver import archiver
+from src.common.catalog import catalog
+from src.common.config import models_root, whisper_cpp_bin_path, whisper_server_enabled
+from src.common.metrics import stage
+from src.streaming.engines.whisper_server import WhisperServerPool, whisper_servers
+from src.streaming.executor import run_cancellable
 import shutil
 import os
 
 
-async def transcribe_with_whisper_cpp(audio_bytes: bytes, model: str, language: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Run whisper.cpp binary with a GGUF/BIN model.
-    model: directory name under models/ or absolute path to model file.
-    """
+def _resolve_whisper_bin() -> Path:
     wbin = whisper_cpp_bin_path()
     if not wbin:
         for candidate in ("whisper-cpp", "whisper_cpp", "main", "whisper"):
@@ -36,33 +35,70 @@ async def transcribe_with_whisper_cpp(audio_bytes: bytes, model: str, language:
     # Ensure executable
     if not (wpath.exists() and os.access(wpath, os.X_OK)):
         raise PermissionError(f"Whisper.cpp binary not executable: {wpath}. Ensure chmod +x and correct path.")
+    return wpath
 
+
+def resolve_whisper_model(model: str) -> Path:
     model_path = Path(model)
     if not model_path.exists():
-        candidate_dir = models_root() / model
-        if candidate_dir.exists() and candidate_dir.is_dir():
-            ggufs = list(candidate_dir.glob("*.gguf")) + list(candidate_dir.glob("*.bin"))
-            if not ggufs:
+        entries = [e for e in catalog.model_entries(model) if e["engine"] == "whisper_cpp"]
+        if not entries:
+            candidate_dir = models_root() / model
+            if candidate_dir.is_dir():
                 raise FileNotFoundError(f"No gguf/bin found in {candidate_dir}")
-            model_path = ggufs[0]
-        else:
             raise FileNotFoundError(f"Model not found: {model}")
+        # Prefer GGUF over legacy GGML .bin when both are present
+        entries.sort(key=lambda e: not e["path"].endswith(".gguf"))
+        model_path = Path(entries[0]["path"])
+    return model_path
+
 
+def _whisper_threads() -> int:
+    # Tuning: threads
+    threads_env = os.getenv("WHISPER_THREADS")
+    try:
+        return int(threads_env) if threads_env else (os.cpu_count() or 2)
+    except Exception:
+        return os.cpu_count() or 2
+
+
+def _whisper_env(wpath: Path) -> dict:
+    # Ensure the shared library location is discoverable by the loader
+    env = os.environ.copy()
+    ld_paths = []
+    # If binary is .../bin/<name>, lib is commonly sibling ../src
+    bin_dir = wpath.parent
+    root_dir = bin_dir.parent
+    candidates = [
+        root_dir / "src",
+        bin_dir,
+        root_dir,
+    ]
+    for c in candidates:
+        if c.exists():
+            ld_paths.append(str(c))
+    if ld_paths:
+        current = env.get("LD_LIBRARY_PATH", "")
+        parts = [p for p in current.split(":") if p]
+        for p in ld_paths:
+            if p not in parts:
+                parts.append(p)
+        env["LD_LIBRARY_PATH"] = ":".join(parts)
+    return env
+
+
+def _transcribe_cli(wpath: Path, model_path: Path, audio: Union[bytes, Path], language: Optional[str], env: dict) -> str:
     with tempfile.TemporaryDirectory() as td:
-        wav_path = Path(td) / "input.wav"
         out_base = Path(td) / "out"
-        wav_path.write_bytes(audio_bytes)
-
-        # Tuning: threads
-        threads_env = os.getenv("WHISPER_THREADS")
-        try:
-            threads = int(threads_env) if threads_env else (os.cpu_count() or 2)
-        except Exception:
-            threads = os.cpu_count() or 2
+        if isinstance(audio, Path):
+            wav_path = audio
+        else:
+            wav_path = Path(td) / "input.wav"
+            wav_path.write_bytes(audio)
 
         cmd = [
-            wbin,
-            "-t", str(threads),
+            str(wpath),
+            "-t", str(_whisper_threads()),
             "-m",
             str(model_path),
             "-f",
@@ -73,39 +109,47 @@ async def transcribe_with_whisper_cpp(audio_bytes: bytes, model: str, language:
         ]
         if language:
             cmd += ["-l", str(language)]
-        # Ensure the shared library location is discoverable by the loader
-        env = os.environ.copy()
-        ld_paths = []
-        # If binary is .../bin/<name>, lib is commonly sibling ../src
-        bin_dir = wpath.parent
-        root_dir = bin_dir.parent
-        candidates = [
-            root_dir / "src",
-            bin_dir,
-            root_dir,
+        run_cancellable(cmd, env=env)
+        return (out_base.with_suffix(".txt")).read_text(encoding="utf-8", errors="ignore")
+
+
+def transcribe_segments(audio: Union[bytes, Path], model: str, language: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Transcribe WAV bytes (or a spooled WAV file) and return {"text", "language", "segments"}.
+
+    Uses a resident whisper.cpp server for the model when `whisper-server` is
+    available next to WHISPER_CPP_BIN (or at WHISPER_SERVER_BIN), so the GGML
+    model is loaded once per process instead of once per request. Falls back to
+    running the CLI per call. Blocking; the engine runs it on its whisper_cpp pool.
+    """
+    wpath = _resolve_whisper_bin()
+    model_path = resolve_whisper_model(model)
+    env = _whisper_env(wpath)
+
+    server_bin = WhisperServerPool.find_binary(wpath) if whisper_server_enabled() else None
+    if server_bin is not None:
+        with stage("inference"):
+            result = whisper_servers.transcribe(server_bin, model_path, audio, language, _whisper_threads(), env)
+        segments = [
+            {"start": s.get("start"), "end": s.get("end"), "text": (s.get("text") or "").strip()}
+            for s in result.get("segments", [])
         ]
-        for c in candidates:
-            if c.exists():
-                ld_paths.append(str(c))
-        if ld_paths:
-            current = env.get("LD_LIBRARY_PATH", "")
-            parts = [p for p in current.split(":") if p]
-            for p in ld_paths:
-                if p not in parts:
-                    parts.append(p)
-            env["LD_LIBRARY_PATH"] = ":".join(parts)
-        subprocess.run(cmd, check=True, env=env)
-        txt = (out_base.with_suffix(".txt")).read_text(encoding="utf-8", errors="ignore")
-        # Save inputs/outputs to audio dir
-        base_dir = audio_root() / "stt"
-        uploads = base_dir / "uploads"
-        transcripts = base_dir / "transcripts"
-        uploads.mkdir(parents=True, exist_ok=True)
-        transcripts.mkdir(parents=True, exist_ok=True)
-        ts = int(time.time() * 1000)
-        up_dest = uploads / f"stt_{ts}.wav"
-        up_dest.write_bytes(audio_bytes)
-        (transcripts / f"stt_{ts}.txt").write_text(txt, encoding="utf-8")
-        return {"text": txt.strip(), "language": language}
+        text = (result.get("text") or " ".join(s["text"] for s in segments)).strip()
+        return {"text": text, "language": result.get("language", language), "segments": segments}
+
+    with stage("inference"):
+        txt = _transcribe_cli(wpath, model_path, audio, language, env)
+    return {"text": txt.strip(), "language": language, "segments": []}
 
 
+def transcribe_with_whisper_cpp(audio: Union[bytes, Path], model: str, language: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run whisper.cpp with a GGUF/BIN model. Blocking; the engine runs it on its whisper_cpp pool.
+    model: directory name under models/ or absolute path to model file.
+    audio: WAV bytes or a path to a spooled upload (used in place, not copied into memory).
+    """
+    result = transcribe_segments(audio, model=model, language=language)
+    txt = result["text"]
+    # Upload and transcript are archived in the background under one record id
+    archiver.submit("stt", {".wav": audio, ".txt": txt})
+    return {"text": txt.strip(), "language": language}
@@ -1,20 +1,83 @@
+import json
 import subprocess
-import tempfile
+import threading
 from pathlib import Path
 
-from src.common.config import models_root, data_root, piper_bin_path, audio_root
-import time
+from src.common.archiver import archiver
+from src.common.catalog import catalog
+from src.common.audio import PcmJoiner, WavBuffer
+from src.common.config import (
+    models_root,
+    data_root,
+    piper_bin_path,
+    tts_segment_crossfade_ms,
+    tts_segment_gap_ms,
+    tts_segment_max_chars,
+)
+from src.common.metrics import timed_iter
+from src.common.text_segment import segment_text
+from src.streaming.engines.piper_pool import voice_pool
+from src.streaming.executor import check_cancelled
 import shutil
-from typing import Optional
+from typing import Iterator, Optional
 
+# (sample_rate, sample_width, channels, pcm_bytes) for one synthesized sentence/read
+PcmChunk = tuple[int, int, int, bytes]
 
-async def synthesize_with_piper(text: str, model: str, voice: str | None = None) -> bytes:
-    """
-    Run Piper TTS via subprocess and return WAV bytes.
 
-    model: can be a name under models/, or an absolute/relative path to .onnx
-    If model is a directory name, we search for a single .onnx inside it.
-    """
+def _find_piper_model_path(model_name: str, voice_name: str | None) -> Path:
+    # 1) direct path provided
+    mp = Path(model_name)
+    if mp.exists() and mp.is_file():
+        return mp
+
+    # 2) models/<name>/*.onnx (manual placement)
+    for entry in catalog.model_entries(model_name):
+        if entry["engine"] == "piper":
+            return Path(entry["path"])
+
+    # 3) data/piper-tts/<voice> (downloaded via dataset)
+    #    if model_name looks like a voice path, use it; else if voice provided, prefer that.
+    #    Accepts a full relative path or just a voice id like en_US-amy-medium.
+    if voice_name:
+        found = catalog.piper_voice(voice_name)
+        if found:
+            return Path(found["path"])
+
+    # If no voice provided, try model_name as a voice hint
+    found2 = catalog.piper_voice(model_name)
+    if found2:
+        return Path(found2["path"])
+
+    raise FileNotFoundError(
+        f"Piper model not found. Looked under: {mp}, {models_root() / model_name}, {data_root() / 'piper-tts'}"
+    )
+
+
+def resolve_piper_model(model: str, voice: str | None = None) -> tuple[Path, Path]:
+    """Return (model_path, config_path) for a Piper voice request."""
+    model_path = _find_piper_model_path(model, voice)
+    cfg_path = Path(str(model_path) + ".json")
+    if not cfg_path.exists():
+        # Piper requires a matching JSON config
+        raise FileNotFoundError(f"Piper config not found: {cfg_path}")
+    return model_path, cfg_path
+
+
+def _synthesize_in_process(text: str, model_path: Path, cfg_path: Path) -> WavBuffer:
+    buf = None
+    with voice_pool.session(model_path, cfg_path) as voice:
+        for chunk in timed_iter(voice.synthesize(text), "inference"):
+            check_cancelled()
+            if buf is None:
+                buf = WavBuffer(chunk.sample_rate, chunk.sample_channels, chunk.sample_width)
+            buf.append(chunk.audio_int16_bytes)
+    if buf is None:
+        raise RuntimeError("No audio generated.")
+    return buf
+
+
+def _piper_bin() -> str:
     piper_bin = piper_bin_path()
     if not piper_bin:
         guessed = shutil.which("piper")
@@ -22,86 +85,130 @@ async def synthesize_with_piper(text: str, model: str, voice: str | None = None)
             piper_bin = guessed
     if not piper_bin or not Path(piper_bin).exists():
         raise FileNotFoundError("PIPER_BIN not configured or binary not found")
+    return piper_bin
+
+
+def _synthesize_subprocess(text: str, model_path: Path, cfg_path: Path) -> WavBuffer:
+    # Raw PCM straight from piper's stdout: no text file, WAV file or re-read from disk
+    buf = None
+    for rate, width, channels, pcm in timed_iter(_iter_subprocess(text, model_path, cfg_path, read_size=65536), "inference"):
+        if buf is None:
+            buf = WavBuffer(rate, channels, width)
+        buf.append(pcm)
+    if buf is None:
+        raise RuntimeError("No audio generated.")
+    return buf
+
+
+def _iter_in_process(text: str, model_path: Path, cfg_path: Path) -> Iterator[PcmChunk]:
+    with voice_pool.session(model_path, cfg_path) as voice:
+        for chunk in timed_iter(voice.synthesize(text), "inference"):
+            check_cancelled()
+            yield chunk.sample_rate, chunk.sample_width, chunk.sample_channels, chunk.audio_int16_bytes
+
+
+def _feed_stdin(stdin, data: bytes) -> None:
+    try:
+        stdin.write(data)
+    except (BrokenPipeError, ValueError):
+        pass  # piper exited or was killed; its exit status says why
+    finally:
+        try:
+            stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+
+def _iter_subprocess(text: str, model_path: Path, cfg_path: Path, read_size: int = 16384) -> Iterator[PcmChunk]:
+    # piper --output-raw writes 16-bit mono PCM to stdout as each sentence completes
+    cfg = json.loads(cfg_path.read_text(encoding="utf-8"))
+    sample_rate = int(cfg.get("audio", {}).get("sample_rate", 22050))
+    cmd = [_piper_bin(), "--model", str(model_path), "--config", str(cfg_path), "--output-raw"]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    # piper speaks the first sentences before it has read the rest: with a long text, writing all of
+    # stdin before reading stdout would leave both sides blocked on full pipes
+    feeder = threading.Thread(target=_feed_stdin, args=(proc.stdin, text.encode("utf-8")), name="piper-stdin", daemon=True)
+    feeder.start()
+    try:
+        assert proc.stdout is not None
+        while True:
+            check_cancelled()
+            data = proc.stdout.read1(read_size)
+            if not data:
+                break
+            yield sample_rate, 2, 1, data
+        rc = proc.wait()
+        if rc != 0:
+            raise subprocess.CalledProcessError(rc, cmd)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        feeder.join()
+
+
+def _iter_segmented(text: str, model_path: Path, cfg_path: Path, language: str | None) -> Iterator[PcmChunk]:
+    # One synthesis call per segment, joined with short fades and a pause
+    joiner = None
+    with voice_pool.session(model_path, cfg_path) as voice:
+        for segment in segment_text(text, language, max_chars=tts_segment_max_chars()):
+            parts = []
+            for chunk in timed_iter(voice.synthesize(segment), "inference"):
+                check_cancelled()
+                parts.append(chunk.audio_int16_bytes)
+            if not parts:
+                continue
+            if joiner is None:
+                rate, width, channels = chunk.sample_rate, chunk.sample_width, chunk.sample_channels
+                joiner = PcmJoiner(rate, channels, gap_ms=tts_segment_gap_ms(), crossfade_ms=tts_segment_crossfade_ms())
+            pcm = joiner.push(b"".join(parts))
+            if pcm:
+                yield rate, width, channels, pcm
+    if joiner is not None:
+        tail = joiner.finish()
+        if tail:
+            yield rate, width, channels, tail
+
+
+def iter_piper_chunks(
+    text: str, model: str, voice: str | None = None, segmented: bool = False, language: str | None = None
+) -> Iterator[PcmChunk]:
+    """
+    Yield raw PCM chunks as Piper produces them, for chunked streaming responses.
+    Blocking generator; the engine drives it through EngineExecutor.stream.
 
-    def _find_piper_model_path(model_name: str, voice_name: str | None) -> Path:
-        # 1) direct path provided
-        mp = Path(model_name)
-        if mp.exists() and mp.is_file():
-            return mp
-
-        # 2) models/<name>/*.onnx (manual placement)
-        candidate_dir = models_root() / model_name
-        if candidate_dir.exists() and candidate_dir.is_dir():
-            onnx_files = list(candidate_dir.glob("*.onnx"))
-            if onnx_files:
-                return onnx_files[0]
-
-        # 3) data/piper-tts/<voice> (downloaded via dataset)
-        #    if model_name looks like a voice path, use it; else if voice provided, prefer that
-        base = data_root() / "piper-tts"
-
-        def _search_voice_file(base_dir: Path, pattern: str) -> Optional[Path]:
-            # Accept either a full relative path or just a voice id like en_US-amy-medium
-            # 1) Exact relative path
-            candidate = base_dir / pattern
-            if candidate.exists() and candidate.is_file():
-                return candidate
-            # 2) If pattern lacks extension, try append .onnx
-            if not pattern.endswith(".onnx"):
-                candidate2 = base_dir / f"{pattern}.onnx"
-                if candidate2.exists() and candidate2.is_file():
-                    return candidate2
-            # 3) Fuzzy search across tree: filename equals or endswith pattern(.onnx)
-            target_name = pattern if pattern.endswith(".onnx") else f"{pattern}.onnx"
-            for fp in base_dir.rglob("*.onnx"):
-                if fp.name == target_name or fp.name.endswith(target_name):
-                    return fp
-            return None
-
-        if voice_name:
-            found = _search_voice_file(base, voice_name)
-            if found:
-                return found
-
-        # If no voice provided, try model_name as a voice hint
-        found2 = _search_voice_file(base, model_name)
-        if found2:
-            return found2
-
-        raise FileNotFoundError(
-            f"Piper model not found. Looked under: {mp}, {candidate_dir}, {base}"
-        )
+    With `segmented`, the text is split into sentence/clause segments first
+    (see src.common.text_segment) and each is synthesized and emitted in order.
+    The subprocess fallback already streams sentence by sentence and ignores it.
+    """
+    model_path, cfg_path = resolve_piper_model(model, voice)
+    if voice_pool.available():
+        if segmented:
+            yield from _iter_segmented(text, model_path, cfg_path, language)
+        else:
+            yield from _iter_in_process(text, model_path, cfg_path)
+    else:
+        yield from _iter_subprocess(text, model_path, cfg_path)
 
-    model_path = _find_piper_model_path(model, voice)
 
-    cfg_path = Path(str(model_path) + ".json")
-    if not cfg_path.exists():
-        # Piper requires a matching JSON config
-        raise FileNotFoundError(f"Piper config not found: {cfg_path}")
+def synthesize_with_piper(text: str, model: str, voice: str | None = None) -> bytes:
+    """
+    Run Piper TTS and return WAV bytes. Blocking; the engine runs it on its piper pool.
 
-    with tempfile.TemporaryDirectory() as td:
-        text_file = Path(td) / "text.txt"
-        wav_file = Path(td) / "out.wav"
-        text_file.write_text(text, encoding="utf-8")
-
-        cmd = [
-            piper_bin,
-            "--model",
-            str(model_path),
-            "--config",
-            str(cfg_path),
-            "--output_file",
-            str(wav_file),
-            "--text_file",
-            str(text_file),
-        ]
-        subprocess.run(cmd, check=True)
-        # Save copy to audio dir
-        out_dir = audio_root() / "tts"
-        out_dir.mkdir(parents=True, exist_ok=True)
-        ts = int(time.time() * 1000)
-        dest = out_dir / f"tts_{ts}.wav"
-        dest.write_bytes(wav_file.read_bytes())
-        return dest.read_bytes()
+    model: can be a name under models/, or an absolute/relative path to .onnx
+    If model is a directory name, we search for a single .onnx inside it.
+
+    Voices are served from the resident voice pool when the piper Python
+    package is installed; otherwise the PIPER_BIN subprocess is used.
+    """
+    model_path, cfg_path = resolve_piper_model(model, voice)
 
+    if voice_pool.available():
+        buf = _synthesize_in_process(text, model_path, cfg_path)
+    else:
+        buf = _synthesize_subprocess(text, model_path, cfg_path)
+    blob = buf.tobytes()
 
+    # Archived in the background; never on the response path
+    archiver.submit("tts", {".wav": blob})
+    return blob
@@ -0,0 +1,206 @@
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+from src.common.config import whisper_server_procs
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _multipart(
+    fields: dict[str, str], file_field: str, filename: str, data: Union[bytes, Path]
+) -> tuple[Iterator[bytes], int, str]:
+    """Build a multipart body lazily so a spooled file is streamed rather than read into memory."""
+    boundary = uuid.uuid4().hex
+    head = b"".join(
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+        for name, value in fields.items()
+    )
+    head += (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{file_field}\"; filename=\"{filename}\"\r\n"
+        "Content-Type: audio/wav\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    size = data.stat().st_size if isinstance(data, Path) else len(data)
+
+    def _parts() -> Iterator[bytes]:
+        yield head
+        if isinstance(data, Path):
+            with data.open("rb") as f:
+                while chunk := f.read(64 * 1024):
+                    yield chunk
+        else:
+            yield data
+        yield tail
+
+    return _parts(), len(head) + size + len(tail), f"multipart/form-data; boundary={boundary}"
+
+
+class _ServerProcess:
+    """One supervised whisper.cpp `whisper-server` with a model resident in memory."""
+
+    def __init__(self, binary: Path, model_path: Path, threads: int, env: dict):
+        self.binary = binary
+        self.model_path = model_path
+        self.threads = threads
+        self.env = env
+        self.port = 0
+        self.proc: Optional[subprocess.Popen] = None
+        self.busy = threading.Lock()  # whisper-server decodes one request at a time
+        self.restarts = 0
+        self.requests = 0
+        self.started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self, ready_timeout: float = 120.0) -> None:
+        if self.proc is not None:
+            self.restarts += 1
+        self.port = _free_port()
+        cmd = [
+            str(self.binary),
+            "-m", str(self.model_path),
+            "-t", str(self.threads),
+            "--host", "127.0.0.1",
+            "--port", str(self.port),
+        ]
+        self.proc = subprocess.Popen(cmd, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.started_at = time.time()
+        # The server binds its port only after the model has been loaded
+        deadline = time.monotonic() + ready_timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"whisper-server exited during startup (code {self.proc.returncode})")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    print(f"[engine] whisper-server ready: {self.model_path.name} on :{self.port}")
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise TimeoutError("whisper-server did not become ready")
+
+    def stop(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+    def inference(self, audio: Union[bytes, Path], language: Optional[str], timeout: float = 600.0) -> Dict[str, Any]:
+        fields = {"response_format": "verbose_json", "temperature": "0.0"}
+        if language:
+            fields["language"] = language
+        body, length, ctype = _multipart(fields, "file", "input.wav", audio)
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}/inference",
+            data=body,
+            headers={"Content-Type": ctype, "Content-Length": str(length)},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            result = json.loads(resp.read().decode("utf-8", errors="ignore") or "{}")
+        self.requests += 1
+        return result
+
+
+class WhisperServerPool:
+    """
+    Long-running whisper.cpp servers keyed by model path.
+
+    Each model gets up to `procs_per_model` server processes started on first
+    use; a request takes the first idle process (or waits on one), and a
+    process that died is restarted before its next request.
+    """
+
+    def __init__(self, procs_per_model: int | None = None):
+        self.procs_per_model = procs_per_model or whisper_server_procs()
+        self._servers: dict[str, list[_ServerProcess]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def find_binary(cli_path: Path) -> Optional[Path]:
+        configured = os.getenv("WHISPER_SERVER_BIN")
+        candidates = [Path(configured)] if configured else []
+        candidates += [cli_path.parent / "whisper-server", cli_path.parent / "server"]
+        for c in candidates:
+            if c.exists() and os.access(c, os.X_OK):
+                return c
+        return None
+
+    def _processes(self, binary: Path, model_path: Path, threads: int, env: dict) -> list[_ServerProcess]:
+        key = str(model_path)
+        with self._lock:
+            procs = self._servers.get(key)
+            if procs is None:
+                procs = [_ServerProcess(binary, model_path, threads, env) for _ in range(self.procs_per_model)]
+                self._servers[key] = procs
+            return procs
+
+    def transcribe(
+        self,
+        binary: Path,
+        model_path: Path,
+        audio: Union[bytes, Path],
+        language: Optional[str],
+        threads: int,
+        env: dict,
+    ) -> Dict[str, Any]:
+        procs = self._processes(binary, model_path, threads, env)
+        # Prefer an idle process; otherwise queue on the first one
+        chosen = None
+        for p in procs:
+            if p.busy.acquire(blocking=False):
+                chosen = p
+                break
+        if chosen is None:
+            chosen = procs[0]
+            chosen.busy.acquire()
+        try:
+            if not chosen.running:
+                chosen.start()
+            return chosen.inference(audio, language)
+        finally:
+            chosen.busy.release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for procs in self._servers.values():
+                for p in procs:
+                    p.stop()
+            self._servers.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                model: [
+                    {
+                        "port": p.port,
+                        "running": p.running,
+                        "busy": p.busy.locked(),
+                        "requests": p.requests,
+                        "restarts": p.restarts,
+                        "started_at": p.started_at or None,
+                    }
+                    for p in procs
+                ]
+                for model, procs in self._servers.items()
+            }
+
+
+whisper_servers = WhisperServerPool()
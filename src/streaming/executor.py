@@ -0,0 +1,247 @@
+import asyncio
+import contextvars
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from src.common.config import engine_max_queue, engine_workers
+from src.common.metrics import observe_stage
+
+# Engine types that get their own pool; sized so one slow runtime cannot starve another
+ENGINE_KINDS = ("piper", "parler", "whisper_cpp", "hf_whisper")
+
+_cancel_event: contextvars.ContextVar[threading.Event | None] = contextvars.ContextVar("_cancel_event", default=None)
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_DONE = object()
+
+
+class EngineBusy(Exception):
+    """Raised when an engine's pool and queue are full; maps to HTTP 503."""
+
+
+class RequestCancelled(Exception):
+    """Raised inside a worker when the originating stream was reset."""
+
+
+def cancelled() -> bool:
+    event = _cancel_event.get()
+    return bool(event and event.is_set())
+
+
+def check_cancelled() -> None:
+    if cancelled():
+        raise RequestCancelled()
+
+
+def run_cancellable(cmd: list[str], poll_seconds: float = 0.1, **kwargs) -> None:
+    """subprocess.run(check=True) replacement that kills the child if the request is cancelled."""
+    proc = subprocess.Popen(cmd, **kwargs)
+    while True:
+        try:
+            rc = proc.wait(timeout=poll_seconds)
+            break
+        except subprocess.TimeoutExpired:
+            if cancelled():
+                proc.kill()
+                proc.wait()
+                raise RequestCancelled()
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, cmd)
+
+
+def _queued(fn: Callable[..., Any], submitted: float) -> Callable[..., Any]:
+    # Runs on the worker thread: the gap since submission is time spent queued behind other calls
+    def _call(*args, **kwargs):
+        observe_stage("queue_wait", time.perf_counter() - submitted)
+        return fn(*args, **kwargs)
+
+    return _call
+
+
+class EngineExecutor:
+    """
+    Runs blocking engine calls on bounded per-engine thread pools.
+
+    Each engine kind admits `workers + max_queue` outstanding calls; beyond that
+    `run` raises EngineBusy immediately instead of growing an unbounded backlog.
+    Cancelling the awaiting task drops queued work and signals running work via
+    `cancelled()` / `run_cancellable`. A call stays outstanding until its pool
+    future is done, so work still running after its caller gave up keeps its
+    slot instead of letting more work in than the pool can hold.
+    """
+
+    def __init__(self, kinds: tuple[str, ...] = ENGINE_KINDS):
+        self._pools: dict[str, ThreadPoolExecutor] = {}
+        self._limits: dict[str, int] = {}
+        self._workers: dict[str, int] = {}
+        self._outstanding: dict[str, int] = {}
+        self._rejected: dict[str, int] = {}
+        self._completed: dict[str, int] = {}
+        self._cancelled: dict[str, int] = {}
+        # Futures finish on worker threads, so admission and release share a lock
+        self._lock = threading.Lock()
+        for kind in kinds:
+            workers = engine_workers(kind)
+            self._workers[kind] = workers
+            self._limits[kind] = workers + engine_max_queue()
+            self._pools[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"engine-{kind}")
+            self._outstanding[kind] = 0
+            self._rejected[kind] = 0
+            self._completed[kind] = 0
+            self._cancelled[kind] = 0
+
+    def _admit(self, kind: str) -> None:
+        with self._lock:
+            if self._outstanding[kind] >= self._limits[kind]:
+                self._rejected[kind] += 1
+                raise EngineBusy(f"{kind} engine busy, retry later")
+            self._outstanding[kind] += 1
+
+    def _release(self, kind: str, _future: Any = None) -> None:
+        with self._lock:
+            self._outstanding[kind] -= 1
+
+    def _submit(self, kind: str, fn: Callable[..., Any], ctx: contextvars.Context):
+        self._admit(kind)
+        try:
+            future = self._pools[kind].submit(ctx.run, fn)
+        except BaseException:
+            self._release(kind)
+            raise
+        # Runs when the work ends or is dropped from the queue, whether or not anyone still awaits it
+        future.add_done_callback(partial(self._release, kind))
+        return future
+
+    async def run(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        event = threading.Event()
+        ctx = contextvars.copy_context()
+        ctx.run(_cancel_event.set, event)
+        loop = asyncio.get_running_loop()
+        future = self._submit(kind, partial(_queued(fn, time.perf_counter()), *args, **kwargs), ctx)
+        try:
+            result = await asyncio.wrap_future(future, loop=loop)
+        except asyncio.CancelledError:
+            event.set()
+            future.cancel()
+            self._cancelled[kind] += 1
+            raise
+        self._completed[kind] += 1
+        return result
+
+    async def stream(self, kind: str, gen_fn: Callable[..., Iterator[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+        """
+        Run a blocking generator on the `kind` pool and yield its items on the loop.
+
+        Closing the async iterator early (client went away, stream reset) stops
+        the producer at its next item.
+        """
+        event = threading.Event()
+        ctx = contextvars.copy_context()
+        ctx.run(_cancel_event.set, event)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def _produce() -> None:
+            gen = None
+            try:
+                gen = gen_fn(*args, **kwargs)
+                for item in gen:
+                    if event.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except BaseException as exc:
+                loop.call_soon_threadsafe(queue.put_nowait, _Failure(exc))
+            finally:
+                # Release pooled sessions/subprocesses held by the generator right away
+                close = getattr(gen, "close", None)
+                if close is not None:
+                    close()
+                loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+        future = self._submit(kind, _queued(_produce, time.perf_counter()), ctx)
+        state = "running"
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    state = "failed"
+                    raise item.exc
+                yield item
+            state = "finished"
+        finally:
+            if state == "finished":
+                self._completed[kind] += 1
+            elif state == "running":
+                event.set()
+                future.cancel()
+                self._cancelled[kind] += 1
+
+    def stats(self) -> dict:
+        return {
+            kind: {
+                "workers": self._workers[kind],
+                "limit": self._limits[kind],
+                "outstanding": self._outstanding[kind],
+                "queued": max(0, self._outstanding[kind] - self._workers[kind]),
+                "completed": self._completed[kind],
+                "rejected": self._rejected[kind],
+                "cancelled": self._cancelled[kind],
+            }
+            for kind in self._pools
+        }
+
+    def shutdown(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class LoopLagMonitor:
+    """Samples event-loop scheduling delay so responsiveness under load is observable."""
+
+    def __init__(self, interval: float = 0.05, window: int = 2000):
+        self.interval = interval
+        self._samples: deque[float] = deque(maxlen=window)
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0}
+
+        def _pct(p: float) -> float:
+            idx = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[idx] * 1000, 3)
+
+        return {
+            "samples": len(samples),
+            "p50_ms": _pct(0.50),
+            "p99_ms": _pct(0.99),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
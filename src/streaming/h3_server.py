@@ -1,33 +1,193 @@
 import argparse
 import asyncio
 import base64
+import contextvars
 import json
 import os
 import signal
-import tempfile
+import socket
+import sys
+import time
 from pathlib import Path
 from typing import Dict, Optional
 
-from aioquic.asyncio import QuicConnectionProtocol, serve
-from aioquic.h3.connection import H3_ALPN, H3Connection
+from aioquic.asyncio import QuicConnectionProtocol
+from aioquic.asyncio.server import QuicServer
+from aioquic.h3.connection import H3_ALPN, ErrorCode, H3Connection
 from aioquic.h3.events import DataReceived, HeadersReceived
 from aioquic.quic.configuration import QuicConfiguration
-from aioquic.quic.events import HandshakeCompleted, ConnectionTerminated
+from aioquic.quic.events import HandshakeCompleted, ConnectionTerminated, StreamReset
 
-from src.streaming.engines.tts_cli import synthesize_with_piper
-from src.streaming.engines.parler_cli import synthesize_with_parler
-from src.common.config import models_root
-from src.streaming.engines.hf_whisper import transcribe_with_hf_whisper
-from src.streaming.engines.stt_cli import transcribe_with_whisper_cpp
-from src.common.config import models_root
+from src.common.affinity import worker_for
+from src.common.archiver import archiver
+from src.common.audio_cache import audio_cache, cache_key
+from src.common.catalog import catalog
+from src.common.codecs import CodecError, CodecUnavailable, encode_stream, normalize_format, parse_sample_rate, require_encoder, seal_wav, transcode_wav
+from src.common.metrics import (
+    CONTENT_TYPE,
+    INFLIGHT,
+    MODEL_RESIDENT_BYTES,
+    MODELS_LOADED,
+    REQUEST_SECONDS,
+    REQUESTS,
+    begin_request,
+    current_request_id,
+    mark_model_known,
+    metrics,
+    model_label,
+    observe_stage,
+    request_stages,
+    set_request_model,
+)
+from src.common.preload import PreloadItem, Readiness, load_profile, preload, silent_wav
+from src.common.runtimes import validate_runtimes
+from src.streaming.engines.tts_cli import iter_piper_chunks, resolve_piper_model, synthesize_with_piper
+from src.streaming.engines.piper_pool import voice_pool
+from src.streaming.engines.parler_cli import iter_parler_chunks, synthesize_with_parler, load_parler
+from src.streaming.engines.model_registry import model_registry
+from src.common.config import engine_affinity_ports, engine_drain_seconds, engine_processes, engine_warm_models, live_stt_buffer_seconds, tmp_root
+from src.streaming.engines.hf_whisper import transcribe_with_hf_whisper, load_hf_whisper
+from src.streaming.engines.stt_cli import resolve_whisper_model, transcribe_segments, transcribe_with_whisper_cpp
+from src.streaming.engines.whisper_server import whisper_servers
+from src.streaming.executor import EngineBusy, EngineExecutor, LoopLagMonitor
+from src.streaming.live_stt import SAMPLE_RATE, LiveBuffer, LiveSegmenter
+from src.streaming.session_tickets import SessionTicketStore
+from src.streaming.upload_spool import UploadSpool
+from src.streaming.supervisor import Supervisor, read_statuses, reuseport_socket, write_status
+
+executor = EngineExecutor()
+loop_lag = LoopLagMonitor()
+
+
+class WorkerState:
+    """Identity of this engine process within a multi-process deployment, plus drain state."""
+
+    def __init__(self) -> None:
+        self.index = 0
+        self.workers = 1
+        self.port = 0
+        self.affinity_port: Optional[int] = None
+        self.draining = False
+        self.inflight = 0
+        self.served = 0
+
+    def track(self, task: asyncio.Task) -> None:
+        self.inflight += 1
+
+        def _done(_t) -> None:
+            self.inflight -= 1
+            self.served += 1
+
+        task.add_done_callback(_done)
+
+    def info(self) -> Dict:
+        return {
+            "index": self.index,
+            "workers": self.workers,
+            "pid": os.getpid(),
+            "affinity_port": self.affinity_port,
+            "draining": self.draining,
+            "inflight": self.inflight,
+            "served": self.served,
+        }
+
+
+worker = WorkerState()
+
+# Status of the response being sent by the current request task, for the request counters
+_response_status: contextvars.ContextVar[int] = contextvars.ContextVar("response_status", default=0)
 
 
 def _hdrs(status: int, content_type: bytes = b"application/json"):
-    return [
+    _response_status.set(status)
+    headers = [
         (b":status", str(status).encode()),
         (b"server", b"shabdabhav-quic/1.0"),
         (b"content-type", content_type),
     ]
+    rid = current_request_id()
+    if rid:
+        headers.append((b"x-request-id", rid.encode()))
+    return headers
+
+
+TRANSCRIPTIONS_PATH = "/v1/stream/audio/transcriptions"
+LIVE_TRANSCRIPTIONS_PATH = "/v1/stream/audio/transcriptions/live"
+SPEECH_PATH = "/v1/stream/audio/speech"
+_METRIC_ROUTES = {"/health", "/metrics", SPEECH_PATH, TRANSCRIPTIONS_PATH, LIVE_TRANSCRIPTIONS_PATH}
+
+ENGINE_QUEUED = metrics.gauge("shabda_engine_queued", "Jobs waiting for a worker thread, per executor pool", ("pool",))
+ENGINE_OUTSTANDING = metrics.gauge("shabda_engine_outstanding", "Jobs running or queued, per executor pool", ("pool",))
+
+
+def _route_label(path: str) -> str:
+    return path if path in _METRIC_ROUTES else "other"
+
+
+def _engine_knows(model: str) -> bool:
+    # Built-in Whisper aliases, models placed in the catalog or loaded in the registry
+    if model == "whisper-1" or model in _HF_WHISPER_ALIASES:
+        return True
+    if catalog.model_engine(model, refresh_on_miss=False):
+        return True
+    name = Path(model).name
+    return any(Path(m["key"].partition(":")[2]).name == name for m in model_registry.stats()["models"])
+
+
+def _model_label(model: str) -> str:
+    """Metric label for a requested model; see src.common.metrics.model_label."""
+    return model_label(model, _engine_knows)
+
+
+def _collect_resident() -> list:
+    out = [({"runtime": "piper", "model": Path(v["path"]).stem}, v["size_bytes"]) for v in voice_pool.stats()["voices"]]
+    for m in model_registry.stats()["models"]:
+        runtime, _, name = m["key"].partition(":")
+        out.append(({"runtime": runtime, "model": Path(name).name or name}, m["size_bytes"]))
+    return out
+
+
+def _collect_loaded() -> list:
+    counts: Dict[str, int] = {"piper": len(voice_pool.stats()["voices"])}
+    for m in model_registry.stats()["models"]:
+        runtime = m["key"].partition(":")[0]
+        counts[runtime] = counts.get(runtime, 0) + 1
+    return [({"runtime": k}, v) for k, v in counts.items()]
+
+
+MODEL_RESIDENT_BYTES.collect(_collect_resident)
+MODELS_LOADED.collect(_collect_loaded)
+INFLIGHT.collect(lambda: [({"route": "all"}, worker.inflight)])
+ENGINE_QUEUED.collect(lambda: [({"pool": k}, v["queued"]) for k, v in executor.stats().items()])
+ENGINE_OUTSTANDING.collect(lambda: [({"pool": k}, v["outstanding"]) for k, v in executor.stats().items()])
+
+
+def _finish_request(route: str, started: float, label: str) -> None:
+    """Count the request, record its latency and log where the time went."""
+    status = _response_status.get() or 500
+    elapsed = time.perf_counter() - started
+    REQUESTS.inc(route=route, status=str(status))
+    REQUEST_SECONDS.observe(elapsed, route=route)
+    stages = request_stages()
+    if stages and route not in ("/health", "/metrics"):
+        detail = " ".join(f"{k}={v}ms" for k, v in stages.items())
+        print(f"[engine] {label} id={current_request_id()} status={status} total={elapsed * 1000:.1f}ms {detail}")
+
+
+_HF_WHISPER_ALIASES = {"whisper-tiny", "whisper-base", "whisper-small", "whisper-medium", "whisper-large", "whisper-large-v2"}
+
+
+def _looks_like_hf_whisper(m: str) -> bool:
+    if m.startswith("openai/whisper-"):
+        return True
+    # Known aliases
+    if m in _HF_WHISPER_ALIASES:
+        return True
+    return False
+
+
+def _is_json(headers: Dict[str, str]) -> bool:
+    return headers.get("content-type", "application/json").split(";")[0].strip() == "application/json"
 
 
 class EngineProtocol(QuicConnectionProtocol):
@@ -36,6 +196,29 @@ class EngineProtocol(QuicConnectionProtocol):
         self._http: Optional[H3Connection] = None
         self._buf: Dict[int, bytearray] = {}
         self._meta: Dict[int, Dict] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._live: Dict[int, LiveBuffer] = {}
+        self._spool: Dict[int, UploadSpool] = {}
+
+    def _cancel_stream(self, sid: int) -> None:
+        self._buf.pop(sid, None)
+        self._meta.pop(sid, None)
+        self._live.pop(sid, None)
+        spool = self._spool.pop(sid, None)
+        if spool is not None:
+            spool.discard()
+        task = self._tasks.pop(sid, None)
+        if task is not None and not task.done():
+            task.cancel()
+
+    def _start_route(self, sid: int) -> None:
+        spool = self._spool.pop(sid, None)
+        if spool is not None:
+            self._meta[sid]["spool"] = spool
+        task = asyncio.create_task(self._route(sid))
+        self._tasks[sid] = task
+        task.add_done_callback(lambda _t, _sid=sid: self._tasks.pop(_sid, None))
+        worker.track(task)
 
     def quic_event_received(self, event):
         if isinstance(event, HandshakeCompleted):
@@ -52,6 +235,11 @@ class EngineProtocol(QuicConnectionProtocol):
                 except Exception:
                     reason = str(reason)
             print(f"[engine] QUIC terminated: {event.error_code} {reason}")
+            for sid in set(self._tasks) | set(self._spool):
+                self._cancel_stream(sid)
+        if isinstance(event, StreamReset):
+            # Client gave up on this request: drop queued work, signal running work
+            self._cancel_stream(event.stream_id)
         if self._http is None:
             self._http = H3Connection(self._quic)
         for http_event in self._http.handle_event(event):
@@ -59,57 +247,300 @@ class EngineProtocol(QuicConnectionProtocol):
                 headers = {k.decode().lower(): v.decode() for k, v in http_event.headers}
                 method = headers.get(":method", "GET").upper()
                 path = headers.get(":path", "/")
-                self._meta[http_event.stream_id] = {"method": method, "path": path, "headers": headers}
-                self._buf[http_event.stream_id] = bytearray()
+                if method == "POST" and path == LIVE_TRANSCRIPTIONS_PATH:
+                    # Live sessions consume the request body as it arrives instead of buffering it
+                    sid = http_event.stream_id
+                    live = LiveBuffer(live_stt_buffer_seconds() * SAMPLE_RATE * 2)
+                    self._live[sid] = live
+                    if http_event.stream_ended:
+                        live.end()
+                    task = asyncio.create_task(self._live_transcribe(sid, headers, live))
+                    self._tasks[sid] = task
+                    worker.track(task)
+                    task.add_done_callback(lambda _t, _sid=sid: (self._tasks.pop(_sid, None), self._live.pop(_sid, None)))
+                    continue
+                sid = http_event.stream_id
+                self._meta[sid] = {"method": method, "path": path, "headers": headers}
+                if method == "POST" and path == TRANSCRIPTIONS_PATH and not _is_json(headers):
+                    # Binary upload: write DATA frames straight to one file instead of memory
+                    self._spool[sid] = UploadSpool(tmp_root())
+                else:
+                    self._buf[sid] = bytearray()
+                if http_event.stream_ended:
+                    self._start_route(sid)
             elif isinstance(http_event, DataReceived):
-                self._buf[http_event.stream_id].extend(http_event.data)
+                sid = http_event.stream_id
+                live = self._live.get(sid)
+                if live is not None:
+                    if http_event.data and not live.put(http_event.data):
+                        self._live_overflow(sid, live)
+                        continue
+                    if http_event.stream_ended:
+                        live.end()
+                    continue
+                spool = self._spool.get(sid)
+                if spool is not None:
+                    spool.write(http_event.data)
+                elif sid in self._buf:
+                    self._buf[sid].extend(http_event.data)
+                else:
+                    continue
                 if http_event.stream_ended:
-                    asyncio.create_task(self._route(http_event.stream_id))
+                    self._start_route(sid)
+
+    def _live_overflow(self, sid: int, live: LiveBuffer) -> None:
+        # Audio is arriving faster than it is transcribed: stop reading rather than buffer it all
+        print(f"[engine] live transcription {sid} fell {live.pending} bytes behind, stopping")
+        self._cancel_stream(sid)
+        error = "live audio is arriving faster than it can be transcribed"
+        if live.headers_sent:
+            self._send_line(sid, {"type": "error", "error": error}, end_stream=True)
+        else:
+            self._send_json(sid, 413, {"error": error})
+        self._quic.stop_stream(sid, ErrorCode.H3_EXCESSIVE_LOAD)
+        self.transmit()
 
     def _send_json(self, sid: int, status: int, obj: Dict):
         assert self._http is not None
         self._http.send_headers(sid, _hdrs(status))
         self._http.send_data(sid, json.dumps(obj).encode(), end_stream=True)
+        self.transmit()
 
-    def _send_blob(self, sid: int, status: int, blob: bytes, content_type: bytes):
+    def _send_blob(self, sid: int, status: int, blob: bytes, content_type: bytes, extra: Optional[list] = None):
         assert self._http is not None
-        self._http.send_headers(sid, _hdrs(status, content_type))
+        started = time.perf_counter()
+        self._http.send_headers(sid, _hdrs(status, content_type) + list(extra or []))
         self._http.send_data(sid, blob, end_stream=True)
+        self.transmit()
+        observe_stage("transport", time.perf_counter() - started)
+
+    async def _send_audio_stream(self, sid: int, chunks, cache_as: Optional[str] = None):
+        """
+        Relay encoded audio as HTTP/3 DATA frames as soon as it is produced.
+
+        `chunks` yields (content_type, data) pairs (see src.common.codecs.encode_stream).
+        Errors before the first chunk propagate so the caller can answer with a
+        status code; later errors reset the stream since headers are already sent.
+        With `cache_as`, the complete audio is stored in the audio cache once the
+        stream finishes (WAV with exact sizes rather than the streaming sentinel).
+        """
+        assert self._http is not None
+        started = time.perf_counter()
+        try:
+            try:
+                ctype, data = await chunks.__anext__()
+            except StopAsyncIteration:
+                raise RuntimeError("No audio generated.")
+            first_ms = (time.perf_counter() - started) * 1000
+            headers = _hdrs(200, ctype.encode()) + [(b"x-first-chunk-ms", f"{first_ms:.1f}".encode())]
+            self._http.send_headers(sid, headers)
+            sent = time.perf_counter()
+            self._http.send_data(sid, data, end_stream=False)
+            self.transmit()
+            sending = time.perf_counter() - sent
+            collected = [data] if cache_as else None
+            try:
+                async for _ctype, data in chunks:
+                    sent = time.perf_counter()
+                    self._http.send_data(sid, data, end_stream=False)
+                    self.transmit()
+                    sending += time.perf_counter() - sent
+                    if collected is not None:
+                        collected.append(data)
+            except Exception as exc:
+                print(f"[engine] stream {sid} aborted: {exc}")
+                self._quic.reset_stream(sid, 0x0102)  # H3_INTERNAL_ERROR
+                self.transmit()
+                return
+            finally:
+                observe_stage("transport", sending)
+            self._http.send_data(sid, b"", end_stream=True)
+            self.transmit()
+            total_ms = (time.perf_counter() - started) * 1000
+            print(f"[engine] stream {sid} first_chunk={first_ms:.1f}ms total={total_ms:.1f}ms")
+            if collected is not None:
+                blob = b"".join(collected)
+                if ctype == "audio/wav":
+                    blob = seal_wav(blob)
+                audio_cache.put_background(cache_as, blob, ctype)
+        finally:
+            await chunks.aclose()
+
+    def _send_line(self, sid: int, obj: Dict, end_stream: bool = False):
+        assert self._http is not None
+        self._http.send_data(sid, (json.dumps(obj) + "\n").encode(), end_stream=end_stream)
+        self.transmit()
+
+    async def _transcribe_segment(self, model: str, wav: bytes, language: Optional[str]) -> Dict:
+        if _looks_like_hf_whisper(model):
+            return await executor.run(
+                "hf_whisper",
+                transcribe_with_hf_whisper,
+                wav,
+                model_id=(model if model.startswith("openai/") else f"openai/{model}"),
+                language=language,
+            )
+        return await executor.run("whisper_cpp", transcribe_segments, wav, model=model, language=language)
+
+    async def _live_transcribe(self, sid: int, headers: Dict[str, str], live: LiveBuffer):
+        """
+        Transcribe raw s16le mono PCM while it is still being uploaded.
+
+        Metadata comes from request headers (x-model, x-language, x-sample-rate)
+        so the body can be pure audio. The response is NDJSON: one "partial"
+        line per completed segment, then a "final" line with the joined text.
+        """
+        started = time.perf_counter()
+        begin_request(headers.get("x-request-id"))
+        try:
+            await self._live_session(sid, headers, live)
+        finally:
+            _finish_request(LIVE_TRANSCRIPTIONS_PATH, started, f"live {sid}")
+
+    async def _live_session(self, sid: int, headers: Dict[str, str], live: LiveBuffer):
+        if worker.draining:
+            self._send_json(sid, 503, {"error": "engine draining"})
+            return
+        model = headers.get("x-model", "").strip() or "whisper-1"
+        set_request_model(_model_label(model))
+        language = headers.get("x-language") or None
+        try:
+            sample_rate = int(headers.get("x-sample-rate", str(SAMPLE_RATE)))
+        except ValueError:
+            self._send_json(sid, 400, {"error": "invalid x-sample-rate"})
+            return
+        if sample_rate != SAMPLE_RATE:
+            self._send_json(sid, 400, {"error": f"x-sample-rate must be {SAMPLE_RATE} (16 kHz s16le mono PCM)"})
+            return
+        segmenter = LiveSegmenter(sample_rate=sample_rate)
+        assert self._http is not None
+        self._http.send_headers(sid, _hdrs(200, b"application/x-ndjson"))
+        live.headers_sent = True
+        self.transmit()
+        texts: list[str] = []
+        index = 0
+
+        async def _emit(segment) -> None:
+            nonlocal index
+            start, end, pcm = segment
+            started = time.perf_counter()
+            result = await self._transcribe_segment(model, segmenter.to_wav(pcm), language)
+            text = str(result.get("text", "")).strip()
+            if text:
+                texts.append(text)
+            self._send_line(
+                sid,
+                {
+                    "type": "partial",
+                    "index": index,
+                    "start": round(start, 3),
+                    "end": round(end, 3),
+                    "text": text,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                },
+            )
+            index += 1
+
+        try:
+            while True:
+                chunk = await live.get()
+                if chunk is None:
+                    break
+                for segment in segmenter.feed(chunk):
+                    await _emit(segment)
+            tail = segmenter.flush()
+            if tail is not None:
+                await _emit(tail)
+            self._send_line(sid, {"type": "final", "text": " ".join(texts), "segments": index}, end_stream=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # Headers are already out, so report the failure in-band
+            print(f"[engine] live transcription {sid} failed: {exc}")
+            self._send_line(sid, {"type": "error", "error": str(exc)}, end_stream=True)
 
     async def _route(self, sid: int):
         meta = self._meta.pop(sid, {})
+        started = time.perf_counter()
+        begin_request(meta.get("headers", {}).get("x-request-id"))
+        try:
+            await self._handle(sid, meta)
+        finally:
+            _finish_request(_route_label(meta.get("path", "/")), started, f"{meta.get('method', 'GET')} {meta.get('path', '/')}")
+
+    async def _handle(self, sid: int, meta: Dict):
         body = bytes(self._buf.pop(sid, b""))
         method = meta.get("method", "GET")
         path = meta.get("path", "/")
         try:
+            if method == "GET" and path == "/metrics":
+                self._send_blob(sid, 200, metrics.render().encode(), CONTENT_TYPE.encode())
+                return
+
             if method == "GET" and path == "/health":
-                self._send_json(sid, 200, {"status": "ok"})
+                # A draining or still-warming worker answers 503 so load balancers send it no work yet
+                status = "draining" if worker.draining else ("ok" if readiness.ready else "warming")
+                self._send_json(
+                    sid,
+                    200 if status == "ok" else 503,
+                    {
+                        "status": status,
+                        "preload": readiness.info(),
+                        "worker": worker.info(),
+                        "workers": _peer_stats() if worker.workers > 1 else None,
+                        "piper_pool": voice_pool.stats(),
+                        "models": model_registry.stats(),
+                        "executor": executor.stats(),
+                        "loop_lag": loop_lag.stats(),
+                        "audio_cache": audio_cache.stats(),
+                        "whisper_servers": whisper_servers.stats(),
+                        "archive": archiver.stats(),
+                        "catalog": catalog.stats(),
+                        "runtimes": runtimes,
+                        "session_tickets": session_tickets.stats(),
+                    },
+                )
+                return
+
+            if worker.draining:
+                self._send_json(sid, 503, {"error": "engine draining"})
                 return
 
-            if method == "POST" and path == "/v1/stream/audio/speech":
+            if method == "POST" and path == SPEECH_PATH:
                 req = json.loads(body or b"{}")
                 text = str(req.get("text", "")).strip()
                 model = str(req.get("model", "")).strip()
                 voice = req.get("voice")
                 description = req.get("description")
+                language = req.get("language")
+                stream = bool(req.get("stream"))
+                set_request_model(_model_label(model))
                 if not text or not model:
                     self._send_json(sid, 400, {"error": "text and model required"})
                     return
                 try:
+                    fmt = normalize_format(req.get("response_format"))
+                    sample_rate = parse_sample_rate(req.get("sample_rate"))
+                    require_encoder(fmt, sample_rate)
+                except CodecError as e:
+                    self._send_json(sid, 400, {"error": str(e)})
+                    return
+                except CodecUnavailable as e:
+                    self._send_json(sid, 501, {"error": str(e)})
+                    return
+                try:
+                    # Placement of models/<model>/, from the in-memory index only: most requests name a
+                    # Piper voice, which never sits there, and a miss must not rescan on the event loop
+                    placed_engine = catalog.model_engine(model, refresh_on_miss=False)
+
                     # Guard: prevent STT models from being used on TTS endpoint
                     def _looks_like_whisper(m: str) -> bool:
                         if m.startswith("ggml-"):
                             return True
                         if m.endswith(".gguf") or m.endswith(".bin"):
                             return True
-                        # Check local dir with gguf/bin inside
-                        ld = models_root() / m
-                        if ld.exists() and ld.is_dir():
-                            for f in ld.glob("*.gguf"):
-                                return True
-                            for f in ld.glob("*.bin"):
-                                return True
-                        return False
+                        # Local dir with gguf/bin inside
+                        return placed_engine == "whisper_cpp"
 
                     if _looks_like_whisper(model):
                         self._send_json(sid, 400, {"error": "Whisper/STT models are not valid for TTS. Use /v1/stream/audio/transcriptions."})
@@ -119,63 +550,108 @@ class EngineProtocol(QuicConnectionProtocol):
                     def _looks_like_parler(m: str) -> bool:
                         if m.startswith("parler-tts"):
                             return True
-                        # Check if there is a local model directory with Parler artifacts
-                        local_dir = models_root() / m
-                        if local_dir.exists() and local_dir.is_dir():
-                            if (local_dir / "config.json").exists():
-                                return True
-                            if (local_dir / "pytorch_model.bin").exists():
-                                return True
-                            # safetensors variant
-                            for f in local_dir.glob("*.safetensors"):
-                                return True
-                        return False
-
-                    if _looks_like_parler(model):
+                        # Local model directory with Parler (Hugging Face) artifacts
+                        return placed_engine in ("parler", "hf")
+
+                    is_parler = _looks_like_parler(model)
+                    # Raw PCM is always streamed; containers are streamed when asked to
+                    segmented = stream or fmt == "pcm"
+                    voice_path = None
+                    if not is_parler:
+                        voice_path, _ = await asyncio.to_thread(resolve_piper_model, model, voice)
+                        # A voice file exists for the name, so it is a bounded label from here on
+                        mark_model_known(model)
+                        set_request_model(_model_label(model))
+                    # Segmented (streamed) audio differs from whole-text synthesis, so it is cached separately
+                    output_format = fmt + (f"@{sample_rate}" if sample_rate else "") + ("+seg" if segmented else "")
+                    key = cache_key(model, str(voice_path or ""), description if is_parler else None, text, output_format)
+                    cached = await audio_cache.aget(key)
+                    if cached is not None:
+                        self._send_blob(sid, 200, cached[0], cached[1].encode(), extra=[(b"x-cache", b"hit")])
+                        return
+
+                    if is_parler and segmented:
+                        # Long texts: segments are generated in batches, encoded and relayed in order
+                        pcm = iter_parler_chunks(text=text, model=model, description=description, language=language)
+                        chunks = executor.stream("parler", encode_stream, pcm, fmt, sample_rate)
+                        await self._send_audio_stream(sid, chunks, cache_as=key)
+                        return
+                    elif is_parler:
                         # Optional Parler runtime (requires extra deps)
+                        async def _produce():
+                            blob = await executor.run("parler", synthesize_with_parler, text=text, model=model, description=description)
+                            return await asyncio.to_thread(transcode_wav, blob, fmt, sample_rate)
+
                         try:
-                            blob = await synthesize_with_parler(text=text, model=model, description=description)
+                            (blob, ctype), hit = await audio_cache.get_or_create(key, _produce)
                         except FileNotFoundError as e:
                             self._send_json(sid, 501, {"error": str(e)})
                             return
+                    elif segmented:
+                        # Piper: encode and relay each sentence as soon as it is synthesized
+                        pcm = iter_piper_chunks(text=text, model=str(voice_path), segmented=True, language=language)
+                        chunks = executor.stream("piper", encode_stream, pcm, fmt, sample_rate)
+                        await self._send_audio_stream(sid, chunks, cache_as=key)
+                        return
                     else:
-                        # Piper via subprocess
-                        blob = await synthesize_with_piper(text=text, model=model, voice=voice)
+                        # Piper via resident voice pool (or subprocess fallback)
+                        async def _produce():
+                            blob = await executor.run("piper", synthesize_with_piper, text=text, model=str(voice_path))
+                            return await asyncio.to_thread(transcode_wav, blob, fmt, sample_rate)
+
+                        (blob, ctype), hit = await audio_cache.get_or_create(key, _produce)
+                except EngineBusy as e:
+                    self._send_json(sid, 503, {"error": str(e)})
+                    return
+                except CodecUnavailable as e:
+                    self._send_json(sid, 501, {"error": str(e)})
+                    return
                 except FileNotFoundError as e:
                     self._send_json(sid, 404, {"error": str(e)})
                     return
                 except Exception as e:
                     self._send_json(sid, 500, {"error": f"tts error: {e}"})
                     return
-                self._send_blob(sid, 200, blob, b"audio/wav")
+                self._send_blob(sid, 200, blob, ctype.encode(), extra=[(b"x-cache", b"hit" if hit else b"miss")])
                 return
 
-            if method == "POST" and path == "/v1/stream/audio/transcriptions":
-                req = json.loads(body or b"{}")
-                model = str(req.get("model", "")).strip() or "whisper-1"
-                language = req.get("language")
-                audio_b64 = req.get("audio_b64")
-                if not audio_b64:
-                    self._send_json(sid, 400, {"error": "audio_b64 required"})
-                    return
-                try:
-                    audio_bytes = base64.b64decode(audio_b64)
-                except Exception:
-                    self._send_json(sid, 400, {"error": "invalid base64"})
-                    return
+            if method == "POST" and path == TRANSCRIPTIONS_PATH:
+                spool = meta.get("spool")
+                if spool:
+                    # Binary upload: metadata in headers, audio on disk once the last write lands
+                    headers = meta.get("headers", {})
+                    model = headers.get("x-model", "").strip() or "whisper-1"
+                    language = headers.get("x-language") or None
+                    audio = await spool.finish()
+                    set_request_model(_model_label(model))
+                else:
+                    req = json.loads(body or b"{}")
+                    model = str(req.get("model", "")).strip() or "whisper-1"
+                    language = req.get("language")
+                    set_request_model(_model_label(model))
+                    audio_b64 = req.get("audio_b64")
+                    if not audio_b64:
+                        self._send_json(sid, 400, {"error": "audio_b64 required"})
+                        return
+                    try:
+                        audio = base64.b64decode(audio_b64)
+                    except Exception:
+                        self._send_json(sid, 400, {"error": "invalid base64"})
+                        return
                 try:
-                    def _looks_like_hf_whisper(m: str) -> bool:
-                        if m.startswith("openai/whisper-"):
-                            return True
-                        # Known aliases
-                        if m in {"whisper-tiny", "whisper-base", "whisper-small", "whisper-medium", "whisper-large", "whisper-large-v2"}:
-                            return True
-                        return False
-
                     if _looks_like_hf_whisper(model):
-                        result = await transcribe_with_hf_whisper(audio_bytes, model_id=(model if model.startswith("openai/") else f"openai/{model}"), language=language)
+                        result = await executor.run(
+                            "hf_whisper",
+                            transcribe_with_hf_whisper,
+                            audio,
+                            model_id=(model if model.startswith("openai/") else f"openai/{model}"),
+                            language=language,
+                        )
                     else:
-                        result = await transcribe_with_whisper_cpp(audio_bytes, model=model, language=language)
+                        result = await executor.run("whisper_cpp", transcribe_with_whisper_cpp, audio, model=model, language=language)
+                except EngineBusy as e:
+                    self._send_json(sid, 503, {"error": str(e)})
+                    return
                 except FileNotFoundError as e:
                     self._send_json(sid, 404, {"error": str(e)})
                     return
@@ -188,15 +664,152 @@ class EngineProtocol(QuicConnectionProtocol):
             self._send_json(sid, 404, {"error": "not found"})
         except Exception as exc:
             self._send_json(sid, 500, {"error": str(exc)})
+        finally:
+            if meta.get("spool"):
+                meta["spool"].discard()
 
 
-async def main_async(host: str, port: int, cert: Path, key: Path):
+readiness = Readiness()
+runtimes: Dict[str, Dict] = {}
+# Shared by every listener of this process so gateways can resume TLS sessions
+session_tickets = SessionTicketStore()
+
+
+def _hf_whisper_id(model: str) -> str:
+    return model if model.startswith("openai/") else f"openai/{model}"
+
+
+def _load_piper(item: PreloadItem) -> None:
+    model_path, cfg_path = resolve_piper_model(item.model, item.voice)
+    if voice_pool.available():
+        with voice_pool.session(model_path, cfg_path):
+            pass
+
+
+def _warm_piper(item: PreloadItem, text: str) -> None:
+    # Drains the generator rather than calling synthesize_with_piper, so warm-ups are not archived
+    for _ in iter_piper_chunks(text=text, model=item.model, voice=item.voice, segmented=True):
+        pass
+
+
+# Same load and inference paths requests take; inference runs on the executor's pools
+_WARMERS = {
+    "piper": (
+        lambda item: asyncio.to_thread(_load_piper, item),
+        lambda item, text: executor.run("piper", _warm_piper, item, text),
+    ),
+    "parler": (
+        lambda item: asyncio.to_thread(load_parler, item.model),
+        lambda item, text: executor.run("parler", synthesize_with_parler, text=text, model=item.model, description=item.description),
+    ),
+    "whisper": (
+        lambda item: asyncio.to_thread(load_hf_whisper, _hf_whisper_id(item.model)),
+        lambda item, text: executor.run("hf_whisper", transcribe_with_hf_whisper, silent_wav(), model_id=_hf_whisper_id(item.model)),
+    ),
+    "whisper.cpp": (
+        lambda item: asyncio.to_thread(resolve_whisper_model, item.model),
+        lambda item, text: executor.run("whisper_cpp", transcribe_segments, silent_wav(), model=item.model),
+    ),
+}
+
+
+def _peer_stats() -> Dict:
+    """Latest stats every worker (and the supervisor) published for this port."""
+    return read_statuses(worker.port)
+
+
+def _worker_snapshot() -> Dict:
+    return {
+        **worker.info(),
+        "updated": time.time(),
+        "executor": executor.stats(),
+        "loop_lag": loop_lag.stats(),
+        "models": [m["key"] for m in model_registry.stats().get("models", [])],
+    }
+
+
+async def _publish_stats(interval: float = 2.0) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, write_status, worker.port, f"worker-{worker.index}", _worker_snapshot())
+        except Exception as exc:
+            print(f"[engine] could not publish worker stats: {exc}")
+        await asyncio.sleep(interval)
+
+
+async def _drain(timeout: float) -> None:
+    """Refuse new requests and wait for in-flight ones to finish, up to `timeout` seconds."""
+    worker.draining = True
+    deadline = time.monotonic() + timeout
+    if worker.inflight:
+        print(f"[engine] draining {worker.inflight} in-flight request(s)")
+    while worker.inflight > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if worker.inflight:
+        print(f"[engine] drain timed out with {worker.inflight} request(s) still running")
+
+
+async def _listen(cfg: QuicConfiguration, host: str, port: int, shared: bool, socket_fd: Optional[int] = None):
+    loop = asyncio.get_running_loop()
+    if socket_fd is not None:
+        # The supervisor's socket: it stays in the SO_REUSEPORT group across restarts of this worker
+        sock = socket.socket(fileno=socket_fd)
+        sock.setblocking(False)
+        endpoint = {"sock": sock}
+    else:
+        endpoint = {"sock": reuseport_socket(host, port)} if shared else {"local_addr": (host, port)}
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: QuicServer(
+            configuration=cfg,
+            create_protocol=lambda *a, **kw: EngineProtocol(*a, **kw),
+            session_ticket_fetcher=session_tickets.pop,
+            session_ticket_handler=session_tickets.add,
+        ),
+        **endpoint,
+    )
+    return transport
+
+
+async def main_async(
+    host: str,
+    port: int,
+    cert: Path,
+    key: Path,
+    worker_index: Optional[int] = None,
+    workers: int = 1,
+    socket_fd: Optional[int] = None,
+):
     cfg = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
     cfg.load_cert_chain(certfile=str(cert), keyfile=str(key))
-    server = await serve(host, port, configuration=cfg, create_protocol=lambda *a, **kw: EngineProtocol(*a, **kw))
-    print(f"[engine] listening on https://{host}:{port} (HTTP/3)")
+    worker.port = port
+    worker.workers = workers
+    worker.index = worker_index or 0
+    # Located, not imported: each runtime's packages load with its first model
+    runtimes.update(validate_runtimes("engine", ("piper", "parler", "hf_whisper")))
+    # ENGINE_WARM_MODELS entries join the preload profile
+    warm = load_profile(extra=engine_warm_models())
+    if workers > 1:
+        # Each model is warmed only in the worker that owns it, not once per process
+        warm = [item for item in warm if worker_for(item.model, workers) == worker.index]
+    if warm:
+        # Not ready from the first health check until the preload below has run
+        readiness.state = "warming"
+    transports = [await _listen(cfg, host, port, shared=worker_index is not None, socket_fd=socket_fd)]
+    if worker_index is not None and engine_affinity_ports():
+        # Private port so a gateway can send a model's traffic to the process that has it warm
+        worker.affinity_port = port + 1 + worker.index
+        transports.append(await _listen(cfg, host, worker.affinity_port, shared=False))
+    tag = f" worker {worker.index}/{workers} pid {os.getpid()}" if worker_index is not None else ""
+    extra = f", affinity port {worker.affinity_port}" if worker.affinity_port else ""
+    print(f"[engine] listening on https://{host}:{port} (HTTP/3){tag}{extra}")
     stop = asyncio.Event()
     loop = asyncio.get_running_loop()
+    loop_lag.start()
+    # Index models/voices before serving so routing never scans the tree
+    await loop.run_in_executor(None, catalog.start)
+    preloading = asyncio.create_task(preload(warm, _WARMERS, readiness, f"engine {worker.index}")) if warm else None
+    publisher = asyncio.create_task(_publish_stats()) if workers > 1 else None
     for sig in (signal.SIGINT, signal.SIGTERM):
         try:
             loop.add_signal_handler(sig, stop.set)
@@ -204,11 +817,22 @@ async def main_async(host: str, port: int, cert: Path, key: Path):
             pass
     try:
         await stop.wait()
+        await _drain(engine_drain_seconds())
     finally:
-        try:
-            server.close()
-        except Exception:
-            pass
+        loop_lag.stop()
+        if publisher is not None:
+            publisher.cancel()
+        if preloading is not None:
+            preloading.cancel()
+        for transport in transports:
+            try:
+                transport.close()
+            except Exception:
+                pass
+        executor.shutdown()
+        whisper_servers.shutdown()
+        archiver.close()
+        catalog.stop()
 
 
 def run():
@@ -217,8 +841,15 @@ def run():
     parser.add_argument("--port", type=int, default=9443)
     parser.add_argument("--cert", type=Path, default=Path("./quic_cert.pem"))
     parser.add_argument("--key", type=Path, default=Path("./quic_key.pem"))
+    parser.add_argument("--workers", type=int, default=engine_processes(), help="engine processes sharing the port (ENGINE_PROCESSES)")
+    parser.add_argument("--worker-index", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--socket-fd", type=int, default=None, help=argparse.SUPPRESS)
     args = parser.parse_args()
-    asyncio.run(main_async(args.host, args.port, args.cert, args.key))
+    workers = max(1, args.workers)
+    if workers > 1 and args.worker_index is None:
+        argv = ["--host", args.host, "--port", str(args.port), "--cert", str(args.cert), "--key", str(args.key), "--workers", str(workers)]
+        sys.exit(Supervisor(argv, workers, args.host, args.port).run())
+    asyncio.run(main_async(args.host, args.port, args.cert, args.key, args.worker_index, workers, args.socket_fd))
 
 
 if __name__ == "__main__":
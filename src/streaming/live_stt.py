@@ -0,0 +1,106 @@
+import asyncio
+from array import array
+from typing import List, Optional
+
+from src.common.audio import wav_header
+from src.common.config import live_stt_segment_seconds
+
+SAMPLE_RATE = 16000
+
+
+class LiveSegmenter:
+    """
+    Cut an incoming s16le mono PCM stream into segments for incremental STT.
+
+    A segment closes at the first quiet window after `min_seconds` of audio, or
+    unconditionally at `max_seconds`, so each partial transcript covers a whole
+    phrase where possible without holding audio back for too long.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        max_seconds: Optional[float] = None,
+        min_seconds: float = 2.0,
+        silence_ms: int = 300,
+        silence_rms: float = 500.0,
+    ):
+        self.sample_rate = sample_rate
+        self.max_bytes = int((max_seconds or live_stt_segment_seconds()) * sample_rate) * 2
+        self.min_bytes = int(min_seconds * sample_rate) * 2
+        self.window_bytes = int(silence_ms * sample_rate / 1000) * 2
+        self.silence_rms = silence_rms
+        self._pending = bytearray()
+        self._carry = b""  # odd trailing byte from the last chunk
+        self.offset_samples = 0  # start of the pending segment in the stream
+
+    def _quiet(self, pcm: bytes) -> bool:
+        samples = array("h", pcm)
+        if not samples:
+            return False
+        mean_sq = sum(s * s for s in samples) / len(samples)
+        return mean_sq ** 0.5 < self.silence_rms
+
+    def _cut(self, nbytes: int) -> tuple[float, float, bytes]:
+        pcm = bytes(self._pending[:nbytes])
+        del self._pending[:nbytes]
+        start = self.offset_samples / self.sample_rate
+        self.offset_samples += len(pcm) // 2
+        return start, self.offset_samples / self.sample_rate, pcm
+
+    def feed(self, data: bytes) -> List[tuple[float, float, bytes]]:
+        """Add PCM bytes; return (start, end, pcm) for every segment that completed."""
+        data = self._carry + data
+        if len(data) % 2:
+            self._carry, data = data[-1:], data[:-1]
+        else:
+            self._carry = b""
+        self._pending.extend(data)
+        out = []
+        while len(self._pending) >= self.max_bytes:
+            out.append(self._cut(self.max_bytes))
+        if len(self._pending) >= self.min_bytes and self._quiet(self._pending[-self.window_bytes:]):
+            out.append(self._cut(len(self._pending)))
+        return out
+
+    def flush(self) -> Optional[tuple[float, float, bytes]]:
+        """Return whatever audio is left once the input stream ends."""
+        if not self._pending:
+            return None
+        return self._cut(len(self._pending))
+
+    def to_wav(self, pcm: bytes) -> bytes:
+        return wav_header(self.sample_rate, 1, 2, len(pcm)) + pcm
+
+
+class LiveBuffer:
+    """
+    PCM received for a live session that the segmenter has not taken yet.
+
+    Bounded by bytes rather than chunks, since DATA frame sizes vary: `put`
+    refuses a chunk that would go over `max_bytes`, and the caller stops
+    reading the stream instead of holding audio without limit.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.pending = 0
+        self.headers_sent = False
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, data: bytes) -> bool:
+        if self.pending + len(data) > self.max_bytes:
+            return False
+        self.pending += len(data)
+        self._queue.put_nowait(data)
+        return True
+
+    def end(self) -> None:
+        self._queue.put_nowait(None)
+
+    async def get(self) -> Optional[bytes]:
+        """Next chunk, or None once the request body has ended."""
+        data = await self._queue.get()
+        if data is not None:
+            self.pending -= len(data)
+        return data
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+from typing import Optional
+
+from aioquic.tls import SessionTicket
+
+
+class SessionTicketStore:
+    """
+    TLS session tickets issued by this engine process.
+
+    With a store attached, the QUIC server sends every client a ticket after
+    its handshake; a client reconnecting with it resumes the TLS session (and
+    may send 0-RTT data) instead of doing a full handshake. Tickets are single
+    use, which also keeps replayed 0-RTT from being accepted twice, and the
+    oldest are dropped past `max_tickets`. They live in process memory, so a
+    connection that lands on another engine process, or a restarted one,
+    falls back to a full handshake.
+    """
+
+    def __init__(self, max_tickets: int = 4096):
+        self.max_tickets = max_tickets
+        self._tickets: "OrderedDict[bytes, SessionTicket]" = OrderedDict()
+        self.issued = 0
+        self.resumed = 0
+        self.misses = 0
+
+    def add(self, ticket: SessionTicket) -> None:
+        self._tickets[ticket.ticket] = ticket
+        self.issued += 1
+        while len(self._tickets) > self.max_tickets:
+            self._tickets.popitem(last=False)
+
+    def pop(self, label: bytes) -> Optional[SessionTicket]:
+        ticket = self._tickets.pop(label, None)
+        if ticket is None or not ticket.is_valid:
+            self.misses += 1
+            return None
+        self.resumed += 1
+        return ticket
+
+    def stats(self) -> dict:
+        return {"stored": len(self._tickets), "issued": self.issued, "resumed": self.resumed, "misses": self.misses}
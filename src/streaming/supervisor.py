@@ -0,0 +1,180 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.common.config import engine_drain_seconds, tmp_root
+
+
+def reuseport_socket(host: str, port: int) -> socket.socket:
+    """
+    UDP socket bound with SO_REUSEPORT so several engine processes share one port.
+
+    The kernel spreads datagrams across the sockets by a hash of the 4-tuple, so
+    every packet of a QUIC connection reaches the same process as long as the
+    client keeps its address (the gateway's pooled connections do) and the
+    group of sockets does not change: adding or removing a socket rehashes
+    flows onto other sockets. The supervisor therefore owns the group.
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if not hasattr(socket, "SO_REUSEPORT"):
+        sock.close()
+        raise RuntimeError("SO_REUSEPORT is not available on this platform; run a single engine process")
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    if family == socket.AF_INET6:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+def status_dir(port: int) -> Path:
+    d = tmp_root() / f"engine-{port}"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def write_status(port: int, name: str, data: dict) -> None:
+    # Write-then-rename so readers never see a partial file
+    path = status_dir(port) / f"{name}.json"
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def read_statuses(port: int) -> dict[str, dict]:
+    out: dict[str, dict] = {}
+    for path in sorted(status_dir(port).glob("*.json")):
+        try:
+            out[path.stem] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.proc: Optional[subprocess.Popen] = None
+        self.sock: Optional[socket.socket] = None
+        self.started = 0.0
+        self.restarts = 0
+        self.next_start = 0.0
+
+
+class Supervisor:
+    """
+    Runs `workers` engine processes on one UDP port and keeps them alive.
+
+    Workers are re-executed copies of the engine CLI (so each gets a clean
+    interpreter, its own GIL and its own thread pools) started with
+    `--worker-index`. A worker that exits is restarted with exponential
+    backoff. SIGTERM/SIGINT are forwarded so workers drain in-flight requests
+    for up to ENGINE_DRAIN_SECONDS before they are killed.
+
+    The supervisor binds one SO_REUSEPORT socket per worker before starting
+    any and hands it down (`--socket-fd`). The socket outlives its worker, so a
+    restart never changes the reuseport group and connections on the other
+    workers keep their process. Connections of the worker that died are lost
+    with its state; their packets queue on its socket and are dropped by the
+    replacement, and clients (the gateway pool) reconnect once their PINGs or
+    idle timeout fail.
+    """
+
+    def __init__(self, argv: list[str], workers: int, host: str, port: int):
+        self.argv = argv
+        self.host = host
+        self.port = port
+        self.workers = [_Worker(i) for i in range(workers)]
+        self._stopping = False
+
+    def _spawn(self, worker: _Worker) -> None:
+        fd = worker.sock.fileno()
+        cmd = [sys.executable, "-m", "src.streaming.h3_server", *self.argv, "--worker-index", str(worker.index), "--socket-fd", str(fd)]
+        worker.proc = subprocess.Popen(cmd, pass_fds=(fd,))
+        worker.started = time.time()
+        print(f"[supervisor] worker {worker.index} started (pid {worker.proc.pid})")
+
+    def _stop(self, signum, _frame) -> None:
+        if not self._stopping:
+            print(f"[supervisor] received signal {signum}, draining workers")
+        self._stopping = True
+
+    def _write_status(self) -> None:
+        write_status(
+            self.port,
+            "supervisor",
+            {
+                "pid": os.getpid(),
+                "updated": time.time(),
+                "workers": [
+                    {
+                        "index": w.index,
+                        "pid": w.proc.pid if w.proc else None,
+                        "alive": bool(w.proc and w.proc.poll() is None),
+                        "started": w.started,
+                        "restarts": w.restarts,
+                    }
+                    for w in self.workers
+                ],
+            },
+        )
+
+    def run(self) -> int:
+        for path in status_dir(self.port).glob("*.json"):
+            path.unlink(missing_ok=True)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        # Bind the whole group first: flows hash over a fixed set of sockets from the start
+        for worker in self.workers:
+            worker.sock = reuseport_socket(self.host, self.port)
+        for worker in self.workers:
+            self._spawn(worker)
+        last_status = 0.0
+        while not self._stopping:
+            now = time.time()
+            for worker in self.workers:
+                rc = worker.proc.poll() if worker.proc else 0
+                if rc is None:
+                    continue
+                if worker.proc is not None:
+                    print(f"[supervisor] worker {worker.index} exited with {rc}")
+                    worker.proc = None
+                    # Back off on crash loops; a worker that ran for a while restarts promptly
+                    if now - worker.started > 60:
+                        worker.restarts = 0
+                    worker.next_start = now + min(30, 2 ** worker.restarts) - 1
+                    worker.restarts += 1
+                if now >= worker.next_start:
+                    self._spawn(worker)
+            if now - last_status >= 2:
+                self._write_status()
+                last_status = now
+            time.sleep(0.5)
+        return self._shutdown()
+
+    def _shutdown(self) -> int:
+        alive = [w for w in self.workers if w.proc and w.proc.poll() is None]
+        for worker in alive:
+            worker.proc.send_signal(signal.SIGTERM)
+        deadline = time.time() + engine_drain_seconds() + 5
+        for worker in alive:
+            try:
+                worker.proc.wait(timeout=max(0.1, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                print(f"[supervisor] worker {worker.index} did not drain in time, killing")
+                worker.proc.kill()
+                worker.proc.wait()
+        for worker in self.workers:
+            if worker.sock is not None:
+                worker.sock.close()
+        (status_dir(self.port) / "supervisor.json").unlink(missing_ok=True)
+        print("[supervisor] all workers stopped")
+        return 0
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import queue
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+_END = object()
+
+
+class UploadSpool:
+    """
+    A request body written to a temporary file as its DATA frames arrive.
+
+    `write` only queues the chunk; a thread per upload creates the file and
+    writes the chunks in order, so a slow disk delays this upload rather than
+    the event loop every other stream shares. `finish` waits for the last
+    write and returns the file; `discard` stops writing and removes it.
+    """
+
+    def __init__(self, directory: Path, suffix: str = "-upload"):
+        self._chunks: queue.SimpleQueue = queue.SimpleQueue()
+        self._discarded = False
+        self._loop = asyncio.get_running_loop()
+        self._done: asyncio.Future = self._loop.create_future()
+        self.path: Optional[Path] = None
+        self._thread = threading.Thread(target=self._run, args=(directory, suffix), name="upload-spool", daemon=True)
+        self._thread.start()
+
+    def write(self, data: bytes) -> None:
+        if data:
+            self._chunks.put(data)
+
+    async def finish(self) -> Path:
+        self._chunks.put(_END)
+        return await asyncio.shield(self._done)
+
+    def discard(self) -> None:
+        """Drop the upload; safe to call more than once, and after `finish`."""
+        self._discarded = True
+        self._chunks.put(_END)
+        if self._done.done() and self.path is not None:
+            path, self.path = self.path, None
+            self._loop.run_in_executor(None, _remove, path)
+
+    def _run(self, directory: Path, suffix: str) -> None:
+        path, error = None, None
+        try:
+            fd, name = tempfile.mkstemp(suffix=suffix, dir=directory)
+            path = Path(name)
+            try:
+                while not self._discarded:
+                    chunk = self._chunks.get()
+                    if chunk is _END:
+                        break
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[os.write(fd, view) :]
+            finally:
+                os.close(fd)
+        except Exception as exc:
+            error = exc
+        if self._discarded and path is not None:
+            _remove(path)
+            path = None
+        try:
+            self._loop.call_soon_threadsafe(self._resolve, path, error)
+        except RuntimeError:
+            # The event loop is gone (engine shutting down); nobody will ask for the file
+            if path is not None:
+                _remove(path)
+
+    def _resolve(self, path: Optional[Path], error: Optional[Exception]) -> None:
+        if self._discarded and path is not None:
+            # Discarded while the last write was finishing
+            self._loop.run_in_executor(None, _remove, path)
+            path = None
+        self.path = path
+        if error is not None:
+            self._done.set_exception(error)
+        elif path is None:
+            self._done.set_exception(RuntimeError("upload discarded"))
+        else:
+            self._done.set_result(path)
+        # Nobody may be waiting (discarded uploads); the result is still consumed
+        self._done.exception()
+
+
+def _remove(path: Path) -> None:
+    path.unlink(missing_ok=True)
@@ -0,0 +1,74 @@
+import io
+import struct
+import wave
+from array import array
+
+from src.common.audio import STREAMING_WAV_SIZE, PcmJoiner, WavBuffer, parse_wav, wav_header
+from src.common.codecs import seal_wav
+
+
+def _tone(frames: int, value: int = 1000) -> bytes:
+    return array("h", [value] * frames).tobytes()
+
+
+def test_joiner_separates_segments_with_faded_gaps():
+    joiner = PcmJoiner(1000, gap_ms=10, fade_ms=4)
+    first = array("h", joiner.push(_tone(100)))
+    second = array("h", joiner.push(_tone(100) + b"\x01"))  # a stray odd byte is dropped
+    assert len(first) == 100 and len(second) == 10 + 100
+    assert first[0] == 1000 and first[-1] == 0  # the first segment does not fade in
+    assert list(second[:10]) == [0] * 10
+    assert second[10] == 0 and second[-1] == 0
+    assert joiner.finish() == b""
+
+
+def test_joiner_crossfades_without_dropping_level():
+    joiner = PcmJoiner(1000, crossfade_ms=20)
+    out = joiner.push(_tone(100)) + joiner.push(_tone(100)) + joiner.push(_tone(100)) + joiner.finish()
+    samples = array("h", out)
+    # Each join overlaps 20 frames, and equal levels mix to the same level: no click
+    assert len(samples) == 300 - 2 * 20
+    assert set(samples) == {1000}
+
+
+def test_joiner_handles_segments_shorter_than_the_overlap():
+    joiner = PcmJoiner(1000, crossfade_ms=20)
+    out = joiner.push(_tone(100)) + joiner.push(_tone(5)) + joiner.push(_tone(100)) + joiner.finish()
+    assert len(out) % 2 == 0
+    assert set(array("h", out)) == {1000}
+
+
+def test_wav_header_sizes():
+    header = wav_header(22050, 2, 2, 1000)
+    assert len(header) == 44
+    riff, fmt_size, tag, channels, rate, byte_rate, align, bits, data = struct.unpack("<4x I 8x I HHIIHH 4x I", header)
+    assert (riff, fmt_size, tag, channels, rate) == (36 + 1000, 16, 1, 2, 22050)
+    assert (byte_rate, align, bits, data) == (22050 * 4, 4, 16, 1000)
+    streaming = wav_header(22050)
+    assert struct.unpack_from("<I", streaming, 4)[0] == STREAMING_WAV_SIZE
+    assert struct.unpack_from("<I", streaming, 40)[0] == STREAMING_WAV_SIZE
+
+
+def test_wav_buffer_keeps_chunks_and_writes_a_readable_file():
+    buf = WavBuffer(16000)
+    chunks = [bytearray(b"\x01\x00" * 100), b"", memoryview(b"\x02\x00" * 50)]
+    for chunk in chunks:
+        buf.append(chunk)
+    assert len(buf) == 300 and len(buf.chunks) == 2
+    assert buf.duration == 150 / 16000
+    chunks[0][0] = 9  # referenced, not copied
+    blob = buf.tobytes()
+    assert blob == b"".join(bytes(v) for v in buf.views())
+    with wave.open(io.BytesIO(blob)) as reader:
+        assert (reader.getframerate(), reader.getnchannels(), reader.getsampwidth(), reader.getnframes()) == (16000, 1, 2, 150)
+        assert reader.readframes(1) == b"\x09\x00"
+    rate, width, channels, pcm = parse_wav(blob)
+    assert (rate, width, channels, len(pcm)) == (16000, 2, 1, 300)
+
+
+def test_seal_wav_fills_in_streaming_sizes():
+    streamed = wav_header(8000) + b"\x00" * 640
+    sealed = seal_wav(streamed)
+    assert sealed == wav_header(8000, 1, 2, 640) + b"\x00" * 640
+    assert parse_wav(streamed)[3] == parse_wav(sealed)[3]
+    assert seal_wav(b"not a wav") == b"not a wav"
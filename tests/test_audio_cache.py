@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from src.common import audio_cache as audio_cache_module
+from src.common.audio_cache import AudioCache
+
+
+class _Clock:
+    def __init__(self):
+        # Starts at the real time: a rebuilt disk index takes its stamps from file mtimes
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+
+def _cache(tmp_path, **kwargs) -> AudioCache:
+    options = {"memory_bytes": 1 << 20, "disk_bytes": 1 << 20, "ttl_seconds": 60, "enabled": True}
+    options.update(kwargs)
+    return AudioCache(root=tmp_path / "cache", **options)
+
+
+def test_memory_tier_expires_entries(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(audio_cache_module.time, "time", clock.time)
+    cache = _cache(tmp_path)
+    cache.put("a" * 64, b"audio", "audio/wav")
+    assert cache.get("a" * 64) == (b"audio", "audio/wav")
+    assert cache.counters["memory_hits"] == 1
+
+    clock.now += 61
+    assert cache.get("a" * 64) is None
+    # Both tiers drop it, and the memory bytes are given back
+    assert cache.counters["expired"] == 2
+    assert cache.stats()["memory_bytes"] == 0
+    assert cache.stats()["disk_bytes"] == 0
+
+
+def test_promoted_disk_hit_keeps_its_original_stamp(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(audio_cache_module.time, "time", clock.time)
+    cache = _cache(tmp_path)
+    cache.put("b" * 64, b"audio", "audio/wav")
+    clock.now += 50
+    fresh = _cache(tmp_path)  # empty memory tier, same disk
+    assert fresh.get("b" * 64) == (b"audio", "audio/wav")
+    assert fresh.counters["disk_hits"] == 1
+    clock.now += 20  # 70 s after the store, 20 s after the promotion
+    assert fresh.get("b" * 64) is None
+
+
+def test_vanished_disk_file_gives_its_bytes_back(tmp_path):
+    cache = _cache(tmp_path, memory_bytes=0)
+    cache.put("c" * 64, b"x" * 1000, "audio/wav")
+    cache.put("d" * 64, b"y" * 1000, "audio/wav")
+    used = cache.stats()["disk_bytes"]
+    cache._path("c" * 64).unlink()
+
+    assert cache.get("c" * 64) is None
+    stats = cache.stats()
+    assert stats["disk_entries"] == 1
+    assert stats["disk_bytes"] == used - (1000 + len("audio/wav") + 1)
+
+
+def test_eviction_accounting_stays_within_budgets(tmp_path):
+    entry = 1000 + len("audio/wav") + 1
+    cache = _cache(tmp_path, memory_bytes=2500, disk_bytes=3 * entry)
+    for i in range(5):
+        cache.put(f"{i:064d}", bytes([i]) * 1000, "audio/wav")
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_bytes"] == 2000
+    assert stats["memory_evictions"] == 3
+    assert stats["disk_entries"] == 3 and stats["disk_bytes"] == 3 * entry
+    assert stats["disk_evictions"] == 2
+    # The oldest entries went first in both tiers
+    assert cache.get(f"{0:064d}") is None
+    assert cache.get(f"{4:064d}") == (bytes([4]) * 1000, "audio/wav")
+
+
+def test_concurrent_misses_run_the_producer_once(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"audio", "audio/wav"
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_create("e" * 64, produce) for _ in range(5)))
+        await asyncio.gather(*cache._writes)
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True, True]
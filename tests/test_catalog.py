@@ -0,0 +1,64 @@
+import json
+
+
+def _tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = tmp_path / "data"
+    voices = data / "piper-tts" / "en" / "en_US"
+    voices.mkdir(parents=True)
+    (voices / "en_US-amy-medium.onnx").write_bytes(b"onnx")
+    (voices / "en_US-amy-medium.onnx.json").write_text(json.dumps({"audio": {"sample_rate": 22050}, "language": {"code": "en_US"}}))
+    whisper = data / "models" / "tiny"
+    whisper.mkdir(parents=True)
+    (whisper / "ggml-tiny.en.bin").write_bytes(b"ggml")
+    return data
+
+
+def test_catalog_resolves_voices_and_models(tmp_path, monkeypatch):
+    from src.common.catalog import ModelCatalog
+
+    data = _tree(tmp_path, monkeypatch)
+    catalog = ModelCatalog(root=data, poll_seconds=0)
+    voice = catalog.piper_voice("en_US-amy-medium")
+    assert voice["id"] == "piper-tts/en/en_US/en_US-amy-medium.onnx"
+    assert voice["sample_rate"] == 22050 and voice["language"] == "en_US"
+    assert catalog.piper_voice("en/en_US/en_US-amy-medium.onnx") == voice
+    assert catalog.piper_voice("amy-medium") == voice
+    assert catalog.model_engine("tiny") == "whisper_cpp"
+    assert [e["engine"] for e in catalog.entries()] == ["whisper_cpp", "piper"]
+
+
+def test_refresh_without_changes_rescans_nothing(tmp_path, monkeypatch):
+    from src.common.catalog import ModelCatalog
+
+    data = _tree(tmp_path, monkeypatch)
+    catalog = ModelCatalog(root=data, poll_seconds=0)
+    catalog.refresh()
+    assert catalog.index_path.exists()
+    # Creating .cache/ for the index moved the data root's mtime once; its listing is unchanged
+    assert catalog.refresh() is False
+    scanned = catalog.dirs_rescanned
+    # Persisting the index must not look like a change to the next refresh
+    assert catalog.refresh() is False
+    assert catalog.dirs_rescanned == scanned
+
+    restarted = ModelCatalog(root=data, poll_seconds=0)
+    assert restarted.refresh() is False
+    assert restarted.dirs_rescanned == 0
+    assert restarted.piper_voice("en_US-amy-medium") is not None
+
+
+def test_new_voices_are_found_on_refresh_but_not_by_probes(tmp_path, monkeypatch):
+    from src.common.catalog import ModelCatalog
+
+    data = _tree(tmp_path, monkeypatch)
+    catalog = ModelCatalog(root=data, poll_seconds=0)
+    catalog.refresh()
+    placed = data / "models" / "small"
+    placed.mkdir()
+    (placed / "ggml-small.bin").write_bytes(b"ggml")
+    refreshes = catalog.refreshes
+    assert catalog.model_engine("small", refresh_on_miss=False) is None
+    assert catalog.refreshes == refreshes
+    assert catalog.refresh() is True
+    assert catalog.model_engine("small", refresh_on_miss=False) == "whisper_cpp"
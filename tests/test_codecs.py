@@ -0,0 +1,89 @@
+import math
+import random
+from array import array
+
+import pytest
+
+from src.common import codecs
+from src.common.audio import parse_wav, wav_header
+from src.common.codecs import CodecError, Resampler, encode_stream, normalize_format, parse_sample_rate, require_encoder, transcode_wav
+
+
+def _ramp(frames: int, channels: int = 1) -> bytes:
+    return array("h", [(i * 37) % 20000 - 10000 for i in range(frames * channels)]).tobytes()
+
+
+@pytest.mark.parametrize("src,dst", [(22050, 16000), (16000, 48000), (22050, 24000), (48000, 8000), (24000, 24000)])
+def test_resampler_output_length_matches_the_rate_ratio(src, dst):
+    frames = 10007
+    resampler = Resampler(src, dst)
+    out = resampler.push(_ramp(frames)) + resampler.finish()
+    assert len(out) // 2 == math.ceil(frames * dst / src)
+
+
+@pytest.mark.parametrize("channels", [1, 2])
+def test_resampler_chunking_does_not_change_the_output(channels):
+    pcm = _ramp(5000, channels)
+    whole = Resampler(22050, 16000, channels)
+    expected = whole.push(pcm) + whole.finish()
+    rng = random.Random(7)
+    chunked = Resampler(22050, 16000, channels)
+    out, pos = [], 0
+    while pos < len(pcm):
+        step = rng.randint(1, 999)  # odd sizes split frames and samples
+        out.append(chunked.push(pcm[pos : pos + step]))
+        pos += step
+    out.append(chunked.finish())
+    assert b"".join(out) == expected
+    assert len(expected) % (2 * channels) == 0
+
+
+def test_resampler_keeps_a_constant_level():
+    pcm = array("h", [1200] * 4000).tobytes()
+    for src, dst in ((16000, 44100), (44100, 16000)):
+        resampler = Resampler(src, dst)
+        assert set(array("h", resampler.push(pcm) + resampler.finish())) == {1200}
+
+
+def test_pcm_and_wav_streams_are_resampled_incrementally():
+    chunks = [(22050, 2, 1, _ramp(2205)) for _ in range(10)]
+    pieces = list(encode_stream(iter(chunks), "pcm", target_rate=16000))
+    assert len(pieces) > 1
+    assert {ct for ct, _ in pieces} == {"audio/L16; rate=16000; channels=1; endianness=little-endian"}
+    assert sum(len(data) for _, data in pieces) // 2 == math.ceil(22050 * 16000 / 22050)
+
+    wav = b"".join(data for _, data in encode_stream(iter(chunks), "wav"))
+    rate, width, channels, pcm = parse_wav(wav)
+    assert (rate, width, channels, len(pcm)) == (22050, 2, 1, 22050 * 2)
+
+
+def test_transcode_wav_reencodes_and_seals_the_header():
+    blob = wav_header(22050, 1, 2, 22050 * 2) + _ramp(22050)
+    assert transcode_wav(blob, "wav") == (blob, "audio/wav")
+    data, content_type = transcode_wav(blob, "wav", target_rate=8000)
+    assert content_type == "audio/wav"
+    rate, _, _, pcm = parse_wav(data)
+    assert rate == 8000 and len(pcm) == 8000 * 2
+    assert int.from_bytes(data[4:8], "little") == len(data) - 8
+
+
+def test_format_and_rate_validation():
+    assert normalize_format(None) == "wav"
+    assert normalize_format(" MP3 ") == "mp3"
+    with pytest.raises(CodecError):
+        normalize_format("ogg")
+    assert parse_sample_rate("") is None
+    assert parse_sample_rate("24000") == 24000
+    for bad in ("fast", 4000, 10**6):
+        with pytest.raises(CodecError):
+            parse_sample_rate(bad)
+    with pytest.raises(CodecError):
+        require_encoder("opus", 22050)
+
+
+@pytest.mark.skipif(codecs._ffmpeg() is None, reason="ffmpeg not installed")
+def test_ffmpeg_encoder_streams_flac():
+    chunks = [(22050, 2, 1, _ramp(2205)) for _ in range(10)]
+    pieces = list(encode_stream(iter(chunks), "flac"))
+    assert pieces[0][0] == "audio/flac"
+    assert b"".join(data for _, data in pieces).startswith(b"fLaC")
@@ -0,0 +1,53 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BODY = bytes(range(256)) * 64
+
+
+class _IgnoresResumeRanges(BaseHTTPRequestHandler):
+    """Answers the one-byte range probe with 206, then sends every other request whole with 200."""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+
+    def do_GET(self):
+        if self.headers.get("Range") == "bytes=0-0":
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 0-0/{len(BODY)}")
+            self.send_header("Content-Length", "1")
+            self.end_headers()
+            self.wfile.write(BODY[:1])
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IgnoresResumeRanges)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/voice.onnx"
+    server.shutdown()
+    server.server_close()
+
+
+def test_resume_restarts_when_server_ignores_range(tmp_path, server_url):
+    from src.common.download_manager import fetch
+
+    dest = tmp_path / "voice.onnx"
+    dest.with_suffix(".onnx.part").write_bytes(BODY[:1000])
+
+    fetch(server_url, dest, sha256=hashlib.sha256(BODY).hexdigest(), connections=1)
+
+    assert dest.read_bytes() == BODY
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+import pytest
+
+
+def test_cancelled_call_stays_outstanding_until_its_worker_finishes(monkeypatch):
+    monkeypatch.setenv("ENGINE_WORKERS", "1")
+    monkeypatch.setenv("ENGINE_MAX_QUEUE", "0")
+    from src.streaming.executor import EngineBusy, EngineExecutor
+
+    executor = EngineExecutor(kinds=("piper",))
+    started, release = threading.Event(), threading.Event()
+
+    def blocking() -> str:
+        started.set()
+        release.wait(5)  # ignores cancellation, like a native inference call
+        return "done"
+
+    async def scenario():
+        task = asyncio.ensure_future(executor.run("piper", blocking))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The worker thread is still busy, so its slot is still taken
+        assert executor.stats()["piper"]["outstanding"] == 1
+        with pytest.raises(EngineBusy):
+            await executor.run("piper", blocking)
+        release.set()
+        for _ in range(100):
+            if executor.stats()["piper"]["outstanding"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor.stats()["piper"]["outstanding"] == 0
+        assert await executor.run("piper", lambda: "next") == "next"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
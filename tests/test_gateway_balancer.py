@@ -0,0 +1,137 @@
+import asyncio
+import collections
+import socket
+import ssl
+import time
+from pathlib import Path
+
+import pytest
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _engine(h3_server, port: int):
+    cfg = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
+    cfg.load_cert_chain(certfile=str(ROOT / "quic_cert.pem"), keyfile=str(ROOT / "quic_key.pem"))
+    return await h3_server._listen(cfg, "127.0.0.1", port, shared=False)
+
+
+def _balancer(ports: list[int]):
+    from src.gateway.balancer import EngineBalancer
+    from src.gateway.quic_pool import QuicConnectionPool
+
+    client = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN, verify_mode=ssl.CERT_NONE)
+
+    def pool(base: str) -> QuicConnectionPool:
+        return QuicConnectionPool("127.0.0.1", int(base.rsplit(":", 1)[1]), client, size=2, keepalive_seconds=0, connect_timeout=0.5)
+
+    bases = [f"https://127.0.0.1:{port}" for port in ports]
+    return EngineBalancer(bases, pool, health_interval=0, failure_threshold=2, open_seconds=1.0)
+
+
+async def _send(balancer, counts: collections.Counter) -> None:
+    """One request handled the way the gateway does, counted per backend that answered."""
+    try:
+        lease = await balancer.request("GET", "/health")
+    except ConnectionError:
+        return
+    try:
+        await lease.resp.wait_headers(timeout=2)
+        await lease.resp.read(timeout=2)
+    except Exception:
+        lease.cancel()
+        balancer.release(lease, failed=True)
+        return
+    balancer.headers_received(lease)
+    balancer.release(lease)
+    counts[lease.backend.index] += 1
+
+
+async def _burst(balancer, requests: int, concurrency: int) -> collections.Counter:
+    counts: collections.Counter = collections.Counter()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            await _send(balancer, counts)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return counts
+
+
+def test_requests_spread_evenly_and_breaker_ejects_and_readmits(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from src.gateway.balancer import CLOSED, OPEN
+    from src.streaming import h3_server
+
+    async def scenario():
+        ports = [_free_udp_port() for _ in range(3)]
+        transports = [await _engine(h3_server, port) for port in ports]
+        balancer = _balancer(ports)
+        try:
+            counts = await _burst(balancer, 300, concurrency=12)
+            assert sum(counts.values()) == 300
+            for index in range(3):
+                assert abs(counts[index] / 300 - 1 / 3) < 0.1, counts
+
+            # Stop engine 1: its connections close, reconnects time out, and the breaker opens
+            down = balancer.backends[1]
+            transports[1].get_protocol().close()
+            for _ in range(10):
+                await _burst(balancer, 3, concurrency=1)
+                if down.state == OPEN:
+                    break
+            assert down.state == OPEN
+            assert down.ejections == 1
+            sent = down.requests
+            counts = await _burst(balancer, 60, concurrency=6)
+            assert sum(counts.values()) == 60
+            assert counts[1] == 0
+            assert down.requests == sent  # not even tried while ejected
+
+            # Bring it back on the same port: after open_seconds a trial request readmits it
+            transports[1] = await _engine(h3_server, ports[1])
+            deadline = time.monotonic() + 15
+            while down.state != CLOSED and time.monotonic() < deadline:
+                await _burst(balancer, 3, concurrency=1)
+                await asyncio.sleep(0.1)
+            assert down.state == CLOSED
+            counts = await _burst(balancer, 150, concurrency=6)
+            assert sum(counts.values()) == 150
+            assert counts[1] > 150 / 3 * 0.5, counts
+        finally:
+            await balancer.close()
+            for transport in transports:
+                transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_engine_target_parses_ipv6_hosts():
+    pytest.importorskip("fastapi")
+    from src.gateway.main import _engine_target
+
+    assert _engine_target("https://localhost:9443") == ("localhost", 9443)
+    assert _engine_target("https://engine.internal") == ("engine.internal", 443)
+    assert _engine_target("https://[::1]:9443/") == ("::1", 9443)
+    assert _engine_target("https://[fd00::2]") == ("fd00::2", 443)
+    with pytest.raises(ValueError):
+        _engine_target("https://::1:9443")
+    with pytest.raises(ValueError):
+        _engine_target("http://localhost:9443")
+
+
+def test_pool_authority_brackets_ipv6_hosts():
+    from src.gateway.quic_pool import QuicConnectionPool
+
+    client = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN)
+    assert QuicConnectionPool("::1", 9443, client).authority == "[::1]:9443"
+    assert QuicConnectionPool("127.0.0.1", 9443, client).authority == "127.0.0.1:9443"
@@ -0,0 +1,58 @@
+import asyncio
+import socket
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_upload_labelled_json_is_still_sent_as_raw_audio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    port = _free_udp_port()
+    monkeypatch.setenv("STREAM_ENGINE_BASES", f"https://127.0.0.1:{port}")
+    from src.gateway import main as gateway
+    from src.streaming import h3_server
+
+    received = {}
+
+    def fake_transcribe(audio, model, language=None):
+        received["audio"] = Path(audio).read_bytes()
+        return {"text": "hello"}
+
+    monkeypatch.setattr(h3_server, "transcribe_with_whisper_cpp", fake_transcribe)
+    monkeypatch.setattr(gateway, "_engine_balancer", None)
+    audio = b"RIFF" + bytes(5000)
+
+    async def scenario():
+        cfg = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
+        cfg.load_cert_chain(certfile=str(ROOT / "quic_cert.pem"), keyfile=str(ROOT / "quic_key.pem"))
+        transport = await h3_server._listen(cfg, "127.0.0.1", port, shared=False)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=gateway.app), base_url="http://gw") as client:
+                resp = await client.post(
+                    "/v1/audio/transcriptions",
+                    files={"file": ("clip.wav", audio, "application/json")},
+                    data={"model": "ggml-test.bin"},
+                )
+        finally:
+            if gateway._engine_balancer is not None:
+                await gateway._engine_balancer.close()
+            transport.close()
+        return resp
+
+    resp = asyncio.run(scenario())
+    assert resp.status_code == 200, resp.text
+    assert resp.json() == {"text": "hello"}
+    assert received["audio"] == audio
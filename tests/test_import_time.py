@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.check_import_time import BUDGETS_MS, best_of, heavy_imports
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_entry_point_imports_within_budget(module, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    result = best_of(module, repeat=3)
+    heavy = heavy_imports(result)
+    assert not heavy, f"{module} imports {', '.join(heavy)} at startup"
+    if not result["ok"]:
+        if result["missing"]:
+            pytest.skip(f"{module} needs {result['missing']}, which is not installed")
+        pytest.fail(f"{module} failed to import: {result['error']}")
+    assert result["ms"] <= BUDGETS_MS[module], f"{module} took {result['ms']:.0f} ms to import, budget {BUDGETS_MS[module]} ms"
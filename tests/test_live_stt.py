@@ -0,0 +1,104 @@
+import asyncio
+import json
+import socket
+import ssl
+from pathlib import Path
+
+from aioquic.h3.connection import H3_ALPN, FrameUnexpected
+from aioquic.quic.configuration import QuicConfiguration
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_live_buffer_refuses_audio_past_its_bound():
+    from src.streaming.live_stt import LiveBuffer
+
+    async def scenario():
+        live = LiveBuffer(max_bytes=10)
+        assert live.put(b"x" * 6)
+        assert not live.put(b"x" * 6)
+        assert await live.get() == b"x" * 6
+        assert live.put(b"x" * 10)
+        live.end()
+        assert await live.get() == b"x" * 10
+        assert await live.get() is None
+        assert live.pending == 0
+
+    asyncio.run(scenario())
+
+
+async def _engine(tmp_path):
+    from src.gateway.quic_pool import QuicConnectionPool
+    from src.streaming import h3_server
+
+    port = _free_udp_port()
+    cfg = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
+    cfg.load_cert_chain(certfile=str(ROOT / "quic_cert.pem"), keyfile=str(ROOT / "quic_key.pem"))
+    transport = await h3_server._listen(cfg, "127.0.0.1", port, shared=False)
+    client = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN, verify_mode=ssl.CERT_NONE)
+    return transport, QuicConnectionPool("127.0.0.1", port, client, size=1, keepalive_seconds=0)
+
+
+def test_live_session_rejects_other_sample_rates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from src.streaming import h3_server
+
+    async def scenario():
+        transport, pool = await _engine(tmp_path)
+        try:
+            headers = [(b"x-sample-rate", b"44100")]
+            slot, _, resp = await pool.request("POST", h3_server.LIVE_TRANSCRIPTIONS_PATH, headers=headers, body=b"\0" * 8820)
+            await resp.wait_headers(timeout=10)
+            result = json.loads(await resp.read(timeout=10))
+            pool.release(slot)
+            assert resp.status == 400
+            assert "16000" in result["error"]
+        finally:
+            await pool.close()
+            transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_live_session_stops_reading_when_transcription_falls_behind(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LIVE_STT_BUFFER_SECONDS", "1")
+    from src.streaming import h3_server
+
+    async def stuck(self, model, wav, language):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(h3_server.EngineProtocol, "_transcribe_segment", stuck)
+    second = b"\0" * 32000  # 1 s of silent 16 kHz s16le, so a segment closes after 2 s
+
+    async def scenario():
+        transport, pool = await _engine(tmp_path)
+        try:
+            slot, stream_id, resp = await pool.request("POST", h3_server.LIVE_TRANSCRIPTIONS_PATH, end_stream=False)
+            await resp.wait_headers(timeout=10)
+            assert resp.status == 200
+            stopped = False
+            for _ in range(20):
+                try:
+                    slot.proto.send_body(stream_id, second)
+                except (FrameUnexpected, RuntimeError):
+                    # The engine's STOP_SENDING closed our side of the stream
+                    stopped = True
+                    break
+                await slot.proto.drain(stream_id, window=16000)
+            assert stopped
+            lines = [json.loads(line) for line in (await resp.read(timeout=10)).splitlines()]
+            pool.release(slot)
+            assert lines[-1]["type"] == "error"
+            assert "faster" in lines[-1]["error"]
+        finally:
+            await pool.close()
+            transport.close()
+
+    asyncio.run(scenario())
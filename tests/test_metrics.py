@@ -0,0 +1,20 @@
+from src.common import metrics
+from src.common.metrics import mark_model_known, model_label
+
+
+def test_model_label_only_names_known_models(monkeypatch):
+    monkeypatch.setattr(metrics, "_known_models", set())
+    assert model_label("") == ""
+    assert model_label("made-up-1") == "other"
+    assert model_label("en_US-amy-medium", resolve=lambda m: m.startswith("en_US-")) == "en_US-amy-medium"
+    # Once resolved, the name stays known without asking again
+    assert model_label("en_US-amy-medium") == "en_US-amy-medium"
+    mark_model_known("whisper-1")
+    assert model_label("whisper-1") == "whisper-1"
+
+
+def test_model_labels_are_capped(monkeypatch):
+    monkeypatch.setattr(metrics, "_known_models", set())
+    monkeypatch.setattr(metrics, "MAX_MODEL_LABELS", 3)
+    labels = {model_label(f"model-{i}", resolve=lambda m: True) for i in range(10)}
+    assert labels == {"model-0", "model-1", "model-2", "other"}
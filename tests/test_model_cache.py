@@ -0,0 +1,26 @@
+def test_model_cache_reads_its_settings_when_constructed(monkeypatch):
+    from api.models import model_cache
+
+    monkeypatch.setenv("MODEL_CACHE_MAX_MB", "3")
+    monkeypatch.setenv("MODEL_LOAD_WORKERS", "5")
+    cache = model_cache.ModelCacheLRU()
+    try:
+        assert cache.max_bytes == 3 * 1024 * 1024
+        assert cache._pool._max_workers == 5
+    finally:
+        cache._pool.shutdown()
+
+
+def test_model_cache_sizes_wrapped_models_with_the_shared_helper(tmp_path):
+    from api.models import model_cache
+    from src.streaming.engines import model_registry
+
+    assert model_cache.estimate_bytes is model_registry.estimate_bytes
+
+    class Wrapper:
+        def __init__(self, model_path):
+            self.model_path = model_path
+
+    weights = tmp_path / "voice.onnx"
+    weights.write_bytes(b"x" * 1234)
+    assert model_registry.estimate_bytes((Wrapper(str(weights)), None)) == 1234
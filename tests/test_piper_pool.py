@@ -0,0 +1,28 @@
+import pytest
+
+
+def test_failed_voice_loads_do_not_leave_load_locks_behind(tmp_path):
+    from src.streaming.engines.piper_pool import PiperVoicePool
+
+    class FlakyPool(PiperVoicePool):
+        attempts = 0
+
+        def _load_voice(self, model_path, config_path):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise RuntimeError("corrupt voice")
+            return object()
+
+    model = tmp_path / "voice.onnx"
+    model.write_bytes(b"x" * 100)
+    pool = FlakyPool(max_bytes=1 << 20, per_voice_concurrency=1)
+    with pytest.raises(RuntimeError):
+        with pool.session(model, tmp_path / "voice.onnx.json"):
+            pass
+    assert pool._load_locks == {}
+    assert pool.stats()["voices"] == []
+
+    with pool.session(model, tmp_path / "voice.onnx.json") as voice:
+        assert voice is not None
+    assert pool._load_locks == {}
+    assert pool.stats()["cold_loads"] == 1
@@ -0,0 +1,32 @@
+import json
+import sys
+import textwrap
+
+
+def test_long_text_streams_without_filling_both_pipes(tmp_path, monkeypatch):
+    # Stands in for `piper --output-raw`: audio for each line goes out before the next line is read
+    fake = tmp_path / "piper"
+    fake.write_text(
+        textwrap.dedent(
+            f"""\
+            #!{sys.executable}
+            import sys
+            for line in sys.stdin.buffer:
+                sys.stdout.buffer.write(b"\\0" * 4096)
+                sys.stdout.buffer.flush()
+            """
+        )
+    )
+    fake.chmod(0o755)
+    model = tmp_path / "voice.onnx"
+    cfg = tmp_path / "voice.onnx.json"
+    cfg.write_text(json.dumps({"audio": {"sample_rate": 16000}}))
+    monkeypatch.setenv("PIPER_BIN", str(fake))
+    from src.streaming.engines.tts_cli import _iter_subprocess
+
+    # Far more text than a pipe buffer holds, and far more audio than that back
+    text = "A sentence that piper reads one line at a time.\n" * 5000
+    chunks = list(_iter_subprocess(text, model, cfg))
+
+    assert {c[0] for c in chunks} == {16000}
+    assert sum(len(c[3]) for c in chunks) == 5000 * 4096
@@ -0,0 +1,93 @@
+import asyncio
+import socket
+import ssl
+from pathlib import Path
+
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _engine(h3_server, port: int):
+    cfg = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
+    cfg.load_cert_chain(certfile=str(ROOT / "quic_cert.pem"), keyfile=str(ROOT / "quic_key.pem"))
+    return await h3_server._listen(cfg, "127.0.0.1", port, shared=False)
+
+
+def _pool(port: int, size: int):
+    from src.gateway.quic_pool import QuicConnectionPool
+
+    client = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN, verify_mode=ssl.CERT_NONE)
+    return QuicConnectionPool("127.0.0.1", port, client, size=size, keepalive_seconds=0)
+
+
+def test_reconnect_resumes_tls_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from src.streaming import h3_server
+
+    async def scenario():
+        port = _free_udp_port()
+        transport = await _engine(h3_server, port)
+        pool = _pool(port, size=1)
+        resumed = h3_server.session_tickets.resumed
+        try:
+            slot = await pool._acquire()
+            assert not slot.resumed
+            # The engine sends its ticket right after the handshake
+            for _ in range(100):
+                if pool._session_ticket is not None:
+                    break
+                await asyncio.sleep(0.01)
+            assert pool._session_ticket is not None
+            await pool._drop(slot, failed=False)
+
+            slot = await pool._acquire()
+            assert slot.resumed
+            assert slot.proto._quic.tls.session_resumed
+            assert pool.stats()["resumptions"] == 1
+            assert h3_server.session_tickets.resumed == resumed + 1
+        finally:
+            await pool.close()
+            transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_slow_handshake_does_not_block_other_callers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from src.streaming import h3_server
+
+    async def scenario():
+        port = _free_udp_port()
+        transport = await _engine(h3_server, port)
+        pool = _pool(port, size=2)
+        try:
+            busy = await pool._acquire()
+            busy.outstanding = 1
+            gate = asyncio.Event()
+            real_open = pool._open
+
+            async def slow_open(slot):
+                await gate.wait()
+                await real_open(slot)
+
+            pool._open = slow_open
+            opening = asyncio.create_task(pool._acquire())
+            await asyncio.sleep(0.05)
+            assert pool.stats()["connections"][1]["connecting"]
+            # Served by the live connection while the other handshake is stuck
+            assert await asyncio.wait_for(pool._acquire(), timeout=0.5) is busy
+            gate.set()
+            assert (await asyncio.wait_for(opening, timeout=5)).index == 1
+        finally:
+            await pool.close()
+            transport.close()
+
+    asyncio.run(scenario())
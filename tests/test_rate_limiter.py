@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.common.rate_limiter import MemoryBackend, RateLimiter, client_key
+
+
+def _request(headers: dict, host: str = "203.0.113.7") -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw, "client": (host, 40000)})
+
+
+def test_unvalidated_tokens_share_the_callers_ip_bucket(monkeypatch):
+    monkeypatch.delenv("API_TOKENS", raising=False)
+    keys = {client_key(_request({"Authorization": f"Bearer random-{i}"})) for i in range(5)}
+    keys.add(client_key(_request({"X-API-Key": "another"})))
+    assert keys == {"ip:203.0.113.7"}
+
+    monkeypatch.setenv("API_TOKENS", "good-token")
+    assert client_key(_request({"Authorization": "Bearer forged"})) == "ip:203.0.113.7"
+    assert client_key(_request({"Authorization": "Bearer good-token"})).startswith("key:")
+
+
+def test_random_tokens_cannot_skip_the_ip_limit(monkeypatch):
+    monkeypatch.delenv("API_TOKENS", raising=False)
+    limiter = RateLimiter(max_requests=3, window_seconds=60, backend=MemoryBackend())
+
+    async def scenario():
+        for i in range(3):
+            await limiter.acquire(client_key(_request({"Authorization": f"Bearer fresh-{i}"})))
+        with pytest.raises(HTTPException) as exc:
+            await limiter.acquire(client_key(_request({"Authorization": "Bearer fresh-3"})))
+        assert exc.value.status_code == 429
+
+    asyncio.run(scenario())
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _backends(tmp_path):
+    from src.common.rate_limiter import SharedMemoryBackend
+
+    return {"memory": MemoryBackend(), "shm": SharedMemoryBackend(tmp_path / "rl.shm", 64)}
+
+
+@pytest.mark.parametrize("kind", ["memory", "shm"])
+def test_gcra_allows_a_burst_then_one_request_per_interval(tmp_path, monkeypatch, kind):
+    from src.common import rate_limiter
+
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter.time, "time", clock)
+    backend = _backends(tmp_path)[kind]
+
+    async def scenario():
+        for _ in range(5):
+            assert await backend.hit("a", 1.0, 5, 60) == (True, 0.0)
+        allowed, retry_after = await backend.hit("a", 1.0, 5, 60)
+        assert not allowed and retry_after == pytest.approx(12.0)
+        assert (await backend.hit("b", 1.0, 5, 60))[0]
+        clock.now += 12.0
+        assert (await backend.hit("a", 1.0, 5, 60))[0]
+        assert not (await backend.hit("a", 1.0, 5, 60))[0]
+        # Weighted calls spend the same budget faster
+        clock.now += 60.0
+        assert (await backend.hit("a", 2.5, 5, 60))[0]
+        assert (await backend.hit("a", 2.5, 5, 60))[0]
+        assert not (await backend.hit("a", 1.0, 5, 60))[0]
+
+    asyncio.run(scenario())
+
+
+def test_shm_table_is_shared_and_reclaims_expired_slots(tmp_path, monkeypatch):
+    from src.common import rate_limiter
+
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter.time, "time", clock)
+    first = rate_limiter.SharedMemoryBackend(tmp_path / "rl.shm", 8)
+    second = rate_limiter.SharedMemoryBackend(tmp_path / "rl.shm", 8)
+
+    async def scenario():
+        assert (await first.hit("a", 2.0, 2, 60))[0]
+        # Another worker mapping the same file sees the spent quota
+        assert not (await second.hit("a", 1.0, 2, 60))[0]
+        for i in range(6):
+            assert (await second.hit(f"k{i}", 1.0, 2, 60))[0]
+        assert first.stats()["active"] == 7
+        clock.now += 61.0
+        for i in range(8):
+            assert (await first.hit(f"n{i}", 1.0, 2, 60))[0]
+        assert first.stats()["active"] == 8
+
+    asyncio.run(scenario())
+
+
+def test_cost_is_capped_at_the_burst_and_routes_are_weighted():
+    limiter = RateLimiter(max_requests=3, window_seconds=60, backend=MemoryBackend(), route_costs={"/v1/audio/speech": 2, "/v1/models*": 0.5, "/health": 0})
+    assert limiter.cost_for("/v1/audio/speech") == 2
+    assert limiter.cost_for("/v1/models/download") == 0.5
+    assert limiter.cost_for("/v1/other") == 1.0
+
+    async def scenario():
+        # A call dearer than the whole burst still fits an idle quota, then spends all of it
+        await limiter.acquire("a", cost=10)
+        with pytest.raises(HTTPException) as exc:
+            await limiter.acquire("a", cost=1)
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+        await limiter.acquire("a", cost=limiter.cost_for("/health"))
+
+    asyncio.run(scenario())
+    assert limiter.stats()["allowed"] == 1 and limiter.stats()["rejected"] == 1
+
+
+def test_resp_backend_counts_a_sliding_window():
+    from src.common.rate_limiter import RespBackend
+
+    async def scenario():
+        store: dict[bytes, int] = {}
+
+        async def serve(reader, writer):
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:])):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                cmd = args[0].upper()
+                if cmd == b"INCRBY":
+                    store[args[1]] = store.get(args[1], 0) + int(args[2])
+                    writer.write(b":%d\r\n" % store[args[1]])
+                elif cmd == b"DECRBY":
+                    store[args[1]] = store.get(args[1], 0) - int(args[2])
+                    writer.write(b":%d\r\n" % store[args[1]])
+                elif cmd == b"GET":
+                    value = store.get(args[1])
+                    writer.write(b"$-1\r\n" if value is None else b"$%d\r\n%d\r\n" % (len(str(value)), value))
+                else:
+                    writer.write(b":1\r\n")
+                await writer.drain()
+
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        backend = RespBackend(f"redis://127.0.0.1:{port}/0")
+        try:
+            assert (await backend.hit("a", 1.0, 2, 3600))[0]
+            assert (await backend.hit("a", 1.0, 2, 3600))[0]
+            allowed, retry_after = await backend.hit("a", 1.0, 2, 3600)
+            assert not allowed and 0 < retry_after <= 3600
+            # The rejected call was given back
+            assert sum(store.values()) == 2000
+            assert backend.errors == 0
+        finally:
+            backend._writer.close()
+            server.close()
+
+    asyncio.run(scenario())
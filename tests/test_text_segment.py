@@ -0,0 +1,27 @@
+from src.common.text_segment import segment_text, split_sentences
+
+
+def test_sentences_skip_abbreviations_decimals_and_handle_cjk():
+    assert split_sentences("Dr. Smith paid 3.5 dollars. He left!") == ["Dr. Smith paid 3.5 dollars.", "He left!"]
+    assert split_sentences("J. R. R. Tolkien wrote it. Really?") == ["J. R. R. Tolkien wrote it.", "Really?"]
+    assert split_sentences("你好。再见！") == ["你好。", "再见！"]
+    assert split_sentences("  \n ") == []
+
+
+def test_segments_respect_max_chars_and_keep_every_word():
+    text = (
+        "This opening sentence is long enough to stand alone. "
+        "A much longer sentence follows, with several clauses, each adding a little more, "
+        "so that it cannot fit in one segment; the splitter has to cut it at a clause boundary. "
+        "Ok. Short ones merge."
+    )
+    segments = segment_text(text, max_chars=60, min_chars=20)
+    assert all(len(s) <= 60 for s in segments)
+    assert " ".join(segments).split() == text.split()
+    assert segments[1].endswith(",")
+    assert "Ok. Short ones merge." in segments[-1]
+
+
+def test_words_longer_than_max_chars_are_cut():
+    segments = segment_text("x" * 25, max_chars=10, min_chars=1)
+    assert segments == ["x" * 10, "x" * 10, "x" * 5]
@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import ssl
+from pathlib import Path
+
+from aioquic.h3.connection import H3_ALPN
+from aioquic.quic.configuration import QuicConfiguration
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_spool_writes_in_order_and_discard_removes_the_file(tmp_path):
+    from src.streaming.upload_spool import UploadSpool
+
+    async def scenario():
+        spool = UploadSpool(tmp_path)
+        for i in range(200):
+            spool.write(bytes([i]) * 1000)
+        path = await spool.finish()
+        assert path.read_bytes() == b"".join(bytes([i]) * 1000 for i in range(200))
+        spool.discard()
+        dropped = UploadSpool(tmp_path)
+        dropped.write(b"x" * 1000)
+        dropped.discard()
+        for _ in range(100):
+            if not os.listdir(tmp_path):
+                break
+            await asyncio.sleep(0.01)
+        assert os.listdir(tmp_path) == []
+
+    asyncio.run(scenario())
+
+
+def test_streamed_upload_reaches_the_engine_intact(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from src.gateway.quic_pool import QuicConnectionPool
+    from src.streaming import h3_server
+
+    def fake_transcribe(audio, model, language=None):
+        data = Path(audio).read_bytes()
+        return {"bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+    monkeypatch.setattr(h3_server, "transcribe_with_whisper_cpp", fake_transcribe)
+    body = os.urandom(3 << 20)
+
+    async def scenario():
+        port = _free_udp_port()
+        cfg = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
+        cfg.load_cert_chain(certfile=str(ROOT / "quic_cert.pem"), keyfile=str(ROOT / "quic_key.pem"))
+        transport = await h3_server._listen(cfg, "127.0.0.1", port, shared=False)
+        client = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN, verify_mode=ssl.CERT_NONE)
+        pool = QuicConnectionPool("127.0.0.1", port, client, size=1, keepalive_seconds=0)
+        try:
+            headers = [(b"content-type", b"application/octet-stream"), (b"x-model", b"ggml-test.bin")]
+            slot, stream_id, resp = await pool.request("POST", h3_server.TRANSCRIPTIONS_PATH, headers=headers, end_stream=False)
+            for offset in range(0, len(body), 64 << 10):
+                slot.proto.send_body(stream_id, body[offset : offset + (64 << 10)])
+                await slot.proto.drain(stream_id, window=256 << 10)
+            slot.proto.send_body(stream_id, b"", end_stream=True)
+            await resp.wait_headers(timeout=10)
+            result = json.loads(await resp.read(timeout=10))
+            pool.release(slot)
+            assert resp.status == 200, result
+            assert result == {"bytes": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+            spools = tmp_path / "data" / "tmp"
+            for _ in range(100):
+                if not list(spools.iterdir()):
+                    break
+                await asyncio.sleep(0.01)
+            assert list(spools.iterdir()) == []
+        finally:
+            await pool.close()
+            transport.close()
+
+    asyncio.run(scenario())